@@ -0,0 +1,64 @@
+import re
+import time
+from datetime import datetime
+
+import streamlit as st
+
+from cxproof import corpus
+
+
+st.set_page_config(
+    page_title="Case Study Search"
+)
+
+# Highlight markers that cannot occur in page text; replaced with ** after escaping
+HIGHLIGHT = ("\x02", "\x03")
+_MARKDOWN = re.compile(r'([\\`*_{}\[\]()#+\-.!|<>~$])')
+
+
+def escape_markdown(text):
+    """Scraped text as literal markdown: every character with a markdown meaning is escaped."""
+    return _MARKDOWN.sub(r'\\\1', text or "")
+
+
+def link_target(url):
+    """A URL that cannot end the markdown link it is put in."""
+    return url.replace(" ", "%20").replace("(", "%28").replace(")", "%29").replace("<", "%3C").replace(">", "%3E")
+
+
+st.title("Case Study Search 🔎")
+st.caption("Searches the case studies extracted so far, without visiting the company websites again.")
+
+stats = corpus.stats()
+if not stats['case_studies']:
+    st.info("The corpus is empty. Case studies found with the Case Study Scraper are added to it.")
+    st.stop()
+
+st.write(f"{stats['case_studies']} case studies of {len(stats['companies'])} companies")
+
+query = st.text_input("Search:", placeholder='snowflake, "data warehouse", migrat*, salesforce NOT hubspot')
+col1, col2, col3 = st.columns([2, 1, 1])
+with col1:
+    company = st.selectbox("Company:", ["All companies"] + list(stats['companies']))
+with col2:
+    language = st.selectbox("Language:", ["All languages"] + list(stats['languages']))
+with col3:
+    limit = st.number_input("Results:", min_value=1, max_value=200, value=20)
+
+if query:
+    start = time.perf_counter()
+    results = corpus.search(query, company=None if company == "All companies" else company,
+                            language=None if language == "All languages" else language, limit=int(limit),
+                            highlight=HIGHLIGHT)
+    elapsed = time.perf_counter() - start
+
+    st.write(f"**{len(results)} results** in {elapsed * 1000:.1f} ms")
+    for result in results:
+        st.markdown(f"#### [{escape_markdown(result['title'] or result['url'])}]({link_target(result['url'])})")
+        st.caption(f"{escape_markdown(result['company'])} · {result['language'] or 'Unknown language'} · "
+                   f"extracted {datetime.fromtimestamp(result['extracted_at']):%Y-%m-%d}")
+        snippet = escape_markdown(result['snippet'])
+        st.markdown(snippet.replace(HIGHLIGHT[0], "**").replace(HIGHLIGHT[1], "**"))
+        with st.expander("Full text"):
+            case_study = corpus.get_case_study(result['url'])
+            st.write(case_study['body'] if case_study else "")
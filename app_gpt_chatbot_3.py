@@ -1,5 +1,6 @@
 import streamlit as st
-from openai import OpenAI
+
+from cxproof.llm import format_metrics, get_openai_client, stream_chat_completion
 
 st.set_page_config(
     page_title="GPT 3"
@@ -15,8 +16,8 @@ api_key = st.secrets["openai"]["api_key3"] if "openai" in st.secrets else None
 if not api_key:
     st.error("API key not found. Please add your OpenAI API key in Streamlit secrets.")
 else:
-    # Initialize the OpenAI client safely
-    client = OpenAI(api_key=api_key) if api_key else None
+    # Reuse the process-wide OpenAI client instead of building one on every rerun
+    client = get_openai_client(api_key) if api_key else None
 
     models = [
         "gpt-3.5-turbo",
@@ -31,6 +32,7 @@ else:
 
     # Input: Big text box for the prompt
     prompt = st.text_area("Enter your prompt here", height=150)
+    use_cache = st.checkbox("Reuse cached answers", value=True)
 
     # Placeholder for the response
     response_placeholder = st.empty()
@@ -43,17 +45,21 @@ else:
             st.warning("Please enter a prompt.")
         else:
             try:
-                # Call OpenAI API with only the user's prompt
-                response = client.chat.completions.create(
+                # Call OpenAI API with only the user's prompt, rendering the answer as it streams in
+                response = stream_chat_completion(
+                    client,
+                    placeholder=response_placeholder,
+                    cache=use_cache,
                     model=selected_model,
                     messages=[{"role": "user", "content": prompt}]  # No system message
                 )
 
                 # Extract the response content
-                response_text = response.choices[0].message.content
+                response_text = response["text"]
 
                 # Display the response in the text area
                 response_placeholder.text_area("Response", value=response_text, height=150)
+                st.caption(format_metrics(response))
 
             except Exception as e:
                 st.error(f"An error occurred: {e}")
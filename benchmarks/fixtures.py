@@ -0,0 +1,547 @@
+"""
+Local fixture web servers for the scraper benchmarks.
+
+Every fixture site runs on its own port of 127.0.0.1 so the scrapers see a normal
+origin with its own robots.txt and sitemaps. Sites are generated from a seed, so
+every run serves the same content:
+
+    small         robots.txt -> one flat sitemap, 300 English pages
+    large         robots.txt -> nested sitemap indexes -> gzipped sitemaps, 100k URLs
+    multilingual  English, German, French and Spanish pages, half without a lang attribute
+    norobots      no robots.txt, sitemap only at /sitemap.xml
+    slow          every response delayed
+    ratelimited   every third request answered with 429 and Retry-After
+    localized     every case study also under /en-gb/ with small edits, and a listing page per section
+    noisy         case study sections full of pagination and tag pages, German copies and old stories,
+                  listed first in their sitemap with <lastmod> and <priority>
+    remote        responses compressed (br or gzip) when the client asks for it, and every new
+                  connection delayed like the TCP and TLS handshakes with a distant server
+
+A recorded site (a directory mirroring the URL paths of a real site, with the original
+origin in a file named ORIGIN) can be served too; the original origin is rewritten to
+the fixture's. Fake OpenAI (/v1/chat/completions, streaming or not) and S3 (PUT
+object) endpoints stand in for the paid services:
+
+    python benchmarks/fixtures.py          # serve until interrupted and print the origins
+"""
+import gzip
+import hashlib
+import importlib.util
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+URLS_PER_SITEMAP = 5000
+
+CASE_STUDY_SECTIONS = ["customers", "case-studies", "customer-stories", "success-stories"]
+OTHER_SECTIONS = ["blog", "products", "docs", "news", "careers", "pricing-plans"]
+
+WORDS = {
+    "en": ("the customer team used our platform to reduce their costs and improve the quality of "
+           "service with better data every week while the company grew faster than before and "
+           "managers could finally see which projects were working for them").split(),
+    "de": ("der kunde hat mit unserer plattform die kosten gesenkt und die qualität des services "
+           "verbessert während das unternehmen schneller wuchs als zuvor und die mitarbeiter "
+           "endlich sehen konnten welche projekte für sie funktionieren").split(),
+    "fr": ("le client a utilisé notre plateforme pour réduire ses coûts et améliorer la qualité du "
+           "service pendant que l'entreprise grandissait plus vite que jamais et les équipes "
+           "pouvaient enfin voir quels projets fonctionnaient pour elles").split(),
+    "es": ("el cliente utilizó nuestra plataforma para reducir sus costes y mejorar la calidad del "
+           "servicio mientras la empresa crecía más rápido que nunca y los equipos podían por fin "
+           "ver qué proyectos funcionaban para ellos").split(),
+}
+
+# Case study section pages of a noisy site, in the order of its sitemap
+NOISY_KINDS = ["pagination", "tag", "locale", "old", "story"]
+
+BOILERPLATE = ("Products Solutions Pricing Resources Company Contact sales Log in "
+               "Subscribe to our newsletter Privacy policy Terms of service Cookie settings")
+
+
+class FixtureSite:
+    """A deterministic synthetic website."""
+
+    def __init__(self, name, urls=300, case_study_share=0.1, languages=("en",), unlabelled_share=0.0,
+                 nested=False, gzipped=False, robots=True, delay=0.0, rate_limit_every=0, mirrored=False,
+                 localized=False, noisy=False, compressed=False, handshake_delay=0.0, seed=0):
+        self.name = name
+        self.urls = urls
+        self.case_study_share = case_study_share
+        self.languages = languages
+        self.unlabelled_share = unlabelled_share
+        self.nested = nested
+        self.gzipped = gzipped
+        self.robots = robots
+        self.delay = delay
+        self.rate_limit_every = rate_limit_every
+        self.mirrored = mirrored
+        self.localized = localized
+        self.noisy = noisy
+        self.compressed = compressed
+        self.handshake_delay = handshake_delay
+        self._paths = None
+        self.seed = seed
+        self.origin = None
+        self.requests = 0
+        self.connections = 0
+        self.bytes_sent = 0
+        # Bytes of the pages and sitemaps sent, before content encoding
+        self.bytes_uncompressed = 0
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    # Content
+
+    def _rng(self, *key):
+        digest = hashlib.sha256(repr((self.seed, self.name) + key).encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _section(self, i):
+        rng = self._rng("path", i)
+        if rng.random() < self.case_study_share:
+            return rng.choice(CASE_STUDY_SECTIONS)
+        return rng.choice(OTHER_SECTIONS)
+
+    def is_case_study_section(self, i):
+        return self._section(i) in CASE_STUDY_SECTIONS
+
+    def page_path(self, i):
+        section = self._section(i)
+        if self.noisy and section in CASE_STUDY_SECTIONS:
+            kind = self.page_kind(i)
+            rng = self._rng("slug", i)
+            slug = "-".join(rng.sample(WORDS["en"], 4)) + f"-{i}"
+            if kind == "pagination":
+                return f"/{section}/page/{i}"
+            if kind == "tag":
+                return f"/{section}/tag/{rng.choice(WORDS['en'])}-{i}"
+            if kind == "locale":
+                return f"/de/{section}/{slug}"
+            return f"/{section}/{slug}"
+        return f"/{section}/page-{i}"
+
+    def page_kind(self, i):
+        """Kind of a case study section page of a noisy site (one of NOISY_KINDS)."""
+        return self._rng("kind", i).choices(NOISY_KINDS, [15, 15, 20, 20, 30])[0]
+
+    def page_entry(self, i):
+        """<lastmod> and <priority> of a page in the sitemap."""
+        if not (self.noisy and self.is_case_study_section(i)):
+            return "2024-01-01", None
+        kind = self.page_kind(i)
+        rng = self._rng("entry", i)
+        year = rng.randint(2012, 2016) if kind == "old" else rng.randint(2024, 2026) if kind == "story" else 2026
+        # Like many sites, overview pages get the highest priority
+        priority = {"story": "0.7", "old": "0.7", "locale": "0.7"}.get(kind, "0.9")
+        return f"{year}-{rng.randint(1, 9):02d}-01", priority
+
+    def page_language(self, i):
+        if self.noisy and self.page_path(i).startswith("/de/"):
+            return "de"
+        return self._rng("lang", i).choice(self.languages)
+
+    def _sentences(self, rng, language, count):
+        words = WORDS[language]
+        sentences = []
+        for _ in range(count):
+            sentence = " ".join(rng.choice(words) for _ in range(rng.randint(8, 18)))
+            sentences.append(sentence.capitalize() + ".")
+        return sentences
+
+    def page(self, i, variant=False):
+        rng = self._rng("page", i)
+        language = self.page_language(i)
+        lang_attribute = "" if rng.random() < self.unlabelled_share else f' lang="{language}"'
+        title = " ".join(self._sentences(rng, language, 1))[:60]
+        paragraphs = [f"<p>{' '.join(self._sentences(rng, language, rng.randint(2, 5)))}</p>"
+                      for _ in range(rng.randint(6, 14))]
+        if variant:
+            # The regional copy of a page: same story, one paragraph replaced
+            paragraphs[-1] = f"<p>{' '.join(self._sentences(self._rng('variant', i), language, 2))}</p>"
+        paragraphs = "".join(paragraphs)
+        return (f"<!DOCTYPE html><html{lang_attribute}><head><title>{title}</title>"
+                f'<meta name="description" content="{title}">'
+                f"<script>window.dataLayer = [{{'page': {i}}}];</script><style>body{{margin:0}}</style></head>"
+                f"<body><header><nav>{BOILERPLATE}</nav></header>"
+                f'<main><article><h1>{title}</h1><div class="content">{paragraphs}</div></article></main>'
+                f"<footer>{BOILERPLATE}</footer></body></html>")
+
+    def listing(self, section):
+        links = "".join(f'<li><a href="{self.page_path(i)}">Story {i}</a></li>'
+                        for i in range(self.urls) if self.page_path(i).startswith(f"/{section}/"))
+        return (f"<!DOCTYPE html><html lang=\"en\"><head><title>Our {section}</title></head>"
+                f"<body><header><nav>{BOILERPLATE}</nav></header><main><h1>Our {section}</h1><ul>{links}</ul></main>"
+                f"<footer>{BOILERPLATE}</footer></body></html>")
+
+    def sitemap_count(self):
+        return max(1, -(-self.urls // URLS_PER_SITEMAP))
+
+    def _urlset(self, index):
+        start = index * URLS_PER_SITEMAP
+        indexes = range(start, min(start + URLS_PER_SITEMAP, self.urls))
+        if self.noisy:
+            # Overview pages and translations first, stories last
+            indexes = sorted(indexes, key=lambda i: NOISY_KINDS.index(self.page_kind(i))
+                             if self.is_case_study_section(i) else len(NOISY_KINDS))
+            entries = ""
+            for i in indexes:
+                lastmod, priority = self.page_entry(i)
+                entries += (f"<url><loc>{self.origin}{self.page_path(i)}</loc><lastmod>{lastmod}</lastmod>"
+                            + (f"<priority>{priority}</priority>" if priority else "") + "</url>")
+            return ('<?xml version="1.0" encoding="UTF-8"?>'
+                    f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>')
+        paths = [self.page_path(i) for i in indexes]
+        if self.localized:
+            # Listing pages first, and every case study followed by its regional copy
+            paths = ([f"/{section}/" for section in CASE_STUDY_SECTIONS] +
+                     [localized for path in paths for localized in
+                      ([path, f"/en-gb{path}"] if path.split("/")[1] in CASE_STUDY_SECTIONS else [path])])
+        entries = "".join(f"<url><loc>{self.origin}{path}</loc><lastmod>2024-01-01</lastmod></url>"
+                          for path in paths)
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>')
+
+    def _index(self, locations):
+        entries = "".join(f"<sitemap><loc>{self.origin}{location}</loc><lastmod>2024-01-01</lastmod></sitemap>"
+                          for location in locations)
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                f'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</sitemapindex>')
+
+    def _sitemap_location(self, index):
+        return f"/sitemaps/urls-{index}.xml" + (".gz" if self.gzipped else "")
+
+    def resolve(self, path):
+        """Return (status, content type, body bytes) for a path."""
+        count = self.sitemap_count()
+        if path == "/robots.txt":
+            if not self.robots:
+                return 404, "text/plain", b"Not found"
+            root = "/sitemap_index.xml" if self.nested else "/sitemap.xml"
+            # A mirrored site first lists a "latest" sitemap repeating some pages with tracking parameters
+            latest = f"Sitemap: {self.origin}/sitemap-latest.xml\n" if self.mirrored else ""
+            return 200, "text/plain", f"User-agent: *\nAllow: /\n{latest}Sitemap: {self.origin}{root}\n".encode()
+
+        if path == "/sitemap-latest.xml" and self.mirrored:
+            latest = self.case_study_urls()[:10]
+            entries = "".join(f"<url><loc>{url}?utm_source=latest</loc></url>" for url in latest)
+            return 200, "application/xml", ('<?xml version="1.0" encoding="UTF-8"?>'
+                                            f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                                            f'{entries}</urlset>').encode()
+
+        if path == "/sitemap.xml" and not self.nested:
+            return 200, "application/xml", self._urlset(0).encode()
+
+        if path == "/sitemap_index.xml" and self.nested:
+            # Two levels of indexes: root -> up to 4 sub-indexes -> URL sitemaps
+            groups = min(4, count)
+            return 200, "application/xml", self._index(f"/sitemaps/index-{g}.xml" for g in range(groups)).encode()
+
+        if path.startswith("/sitemaps/index-") and self.nested:
+            group = int(path[len("/sitemaps/index-"):-len(".xml")])
+            groups = min(4, count)
+            return 200, "application/xml", self._index(
+                self._sitemap_location(i) for i in range(group, count, groups)).encode()
+
+        if path.startswith("/sitemaps/urls-"):
+            index = int(path[len("/sitemaps/urls-"):].split(".")[0])
+            body = self._urlset(index).encode()
+            if path.endswith(".gz"):
+                return 200, "application/x-gzip", gzip.compress(body, compresslevel=6)
+            return 200, "application/xml", body
+
+        if self.localized and path.strip("/") in CASE_STUDY_SECTIONS:
+            return 200, "text/html; charset=utf-8", self.listing(path.strip("/")).encode()
+
+        if self.noisy:
+            if self._paths is None:
+                self._paths = {self.page_path(i): i for i in range(self.urls)}
+            i = self._paths.get(path)
+            if i is None:
+                return 404, "text/plain", b"Not found"
+            if self.is_case_study_section(i) and self.page_kind(i) in ("pagination", "tag"):
+                return 200, "text/html; charset=utf-8", self.listing(path.split("/")[1]).encode()
+            return 200, "text/html; charset=utf-8", self.page(i).encode()
+
+        variant = self.localized and path.startswith("/en-gb/")
+        if variant:
+            path = path[len("/en-gb"):]
+        if path.startswith("/") and path.rsplit("/page-", 1)[-1].isdigit():
+            i = int(path.rsplit("/page-", 1)[1])
+            if i < self.urls and self.page_path(i) == path:
+                return 200, "text/html; charset=utf-8", self.page(i, variant).encode()
+
+        return 404, "text/plain", b"Not found"
+
+    def respond(self, path, if_none_match=None, accept_encoding=""):
+        """Status, headers and body for a request, applying delay, rate limiting, sitemap ETags and compression."""
+        with self._lock:
+            self.requests += 1
+            count = self.requests
+        if self.delay:
+            time.sleep(self.delay)
+        if self.rate_limit_every and count % self.rate_limit_every == 0:
+            return 429, {"Content-Type": "text/plain", "Retry-After": "1"}, b"Too many requests"
+
+        cached = self._cache.get(path)
+        if cached is None:
+            cached = self.resolve(path)
+            if path.startswith("/sitemap"):
+                self._cache[path] = cached
+        status, content_type, body = cached
+        headers = {"Content-Type": content_type}
+        if status == 200 and path.startswith("/sitemap"):
+            headers["ETag"] = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+            if if_none_match == headers["ETag"]:
+                return 304, headers, b""
+        self.bytes_uncompressed += len(body)
+        if self.compressed and body and content_type != "application/x-gzip":
+            encoding = _content_encoding(accept_encoding)
+            if encoding:
+                headers["Content-Encoding"] = encoding
+                headers["Vary"] = "Accept-Encoding"
+                return status, headers, _compress(body, encoding)
+        return status, headers, body
+
+    def case_study_urls(self):
+        return [f"{self.origin}{self.page_path(i)}" for i in range(self.urls) if self.is_case_study_section(i)]
+
+
+def _content_encoding(accept_encoding):
+    """The encoding a web server would pick from an Accept-Encoding header: br, gzip or None."""
+    offered = {coding.split(";")[0].strip().lower() for coding in accept_encoding.split(",")}
+    if "br" in offered and importlib.util.find_spec("brotli"):
+        return "br"
+    return "gzip" if "gzip" in offered else None
+
+
+def _compress(body, encoding):
+    # The levels web servers typically use for on-the-fly compression
+    if encoding == "br":
+        import brotli
+
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+class RecordedSite(FixtureSite):
+    """Serves a recorded copy of a real site from a directory."""
+
+    def __init__(self, name, directory, delay=0.0):
+        super().__init__(name, urls=0, delay=delay)
+        self.directory = directory
+        with open(os.path.join(directory, "ORIGIN")) as f:
+            self.original_origin = f.read().strip()
+
+    def resolve(self, path):
+        file_path = os.path.abspath(os.path.join(self.directory, path.lstrip("/")))
+        if os.path.isdir(file_path):
+            file_path = os.path.join(file_path, "index.html")
+        if not file_path.startswith(os.path.abspath(self.directory) + os.sep) or not os.path.isfile(file_path):
+            return 404, "text/plain", b"Not found"
+        with open(file_path, "rb") as f:
+            body = f.read()
+        if file_path.endswith((".xml", ".txt", ".html")) or "." not in os.path.basename(file_path):
+            body = body.replace(self.original_origin.encode(), self.origin.encode())
+        content_type = ("application/xml" if file_path.endswith(".xml") else
+                        "text/plain" if file_path.endswith(".txt") else
+                        "application/x-gzip" if file_path.endswith(".gz") else "text/html; charset=utf-8")
+        return 200, content_type, body
+
+
+class FakeServices:
+    """OpenAI chat completions and S3 PUT stand-ins, with configurable latency."""
+
+    name = "services"
+
+    def __init__(self, ttft=0.05, token_delay=0.002, answer_tokens=150):
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.answer_tokens = answer_tokens
+        self.origin = None
+        self.requests = 0
+        self.bytes_received = 0
+        self.objects = {}
+
+    def completion_words(self, request):
+        seed = hashlib.sha256(json.dumps(request.get("messages"), sort_keys=True).encode()).digest()
+        rng = random.Random(seed)
+        count = min(self.answer_tokens, request.get("max_tokens") or self.answer_tokens)
+        return [rng.choice(WORDS["en"]) for _ in range(count)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    site = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        with self.site._lock:
+            self.site.connections += 1
+        if self.site.handshake_delay:
+            time.sleep(self.site.handshake_delay)
+        super().setup()
+
+    def _send(self, status, headers, body):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.site.bytes_sent += len(body)
+
+    def do_GET(self):
+        status, headers, body = self.site.respond(self.path.split("?", 1)[0], self.headers.get("If-None-Match"),
+                                                  self.headers.get("Accept-Encoding", ""))
+        self._send(status, headers, body)
+
+
+class _ServicesHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    site = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        self.site.bytes_received += len(body)
+        return body
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_PUT(self):
+        # S3 PutObject, path style: /<bucket>/<key>
+        body = self._body()
+        self.site.requests += 1
+        self.site.objects[self.path] = len(body)
+        self.send_response(200)
+        self.send_header("ETag", f'"{hashlib.md5(body).hexdigest()}"')
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        services = self.site
+        services.requests += 1
+        request = json.loads(self._body() or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": f"No route {self.path}"}})
+
+        prompt_tokens = len(json.dumps(request.get("messages"))) // 4
+        words = services.completion_words(request)
+        base = {"id": "chatcmpl-fixture", "created": int(time.time()), "model": request.get("model", "fixture")}
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                 "total_tokens": prompt_tokens + len(words)}
+        time.sleep(services.ttft)
+
+        if not request.get("stream"):
+            time.sleep(services.token_delay * len(words))
+            return self._send_json(200, {**base, "object": "chat.completion", "usage": usage, "choices": [{
+                "index": 0, "finish_reason": "stop",
+                "message": {"role": "assistant", "content": " ".join(words)}}]})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send_event(payload):
+            data = f"data: {payload if isinstance(payload, str) else json.dumps(payload)}\n\n".encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        chunk = {**base, "object": "chat.completion.chunk"}
+        for i, word in enumerate(words):
+            send_event({**chunk, "choices": [{"index": 0, "finish_reason": None,
+                                              "delta": {"role": "assistant", "content": word + " "} if i == 0
+                                              else {"content": word + " "}}]})
+            time.sleep(services.token_delay)
+        send_event({**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (request.get("stream_options") or {}).get("include_usage"):
+            send_event({**chunk, "choices": [], "usage": usage})
+        send_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def default_sites():
+    return [
+        FixtureSite("small", urls=300, case_study_share=0.1),
+        FixtureSite("large", urls=100_000, case_study_share=0.002, nested=True, gzipped=True),
+        FixtureSite("multilingual", urls=400, case_study_share=0.25, languages=("en", "de", "fr", "es"),
+                    unlabelled_share=0.5),
+        FixtureSite("norobots", urls=300, case_study_share=0.1, robots=False),
+        FixtureSite("slow", urls=300, case_study_share=0.1, delay=0.05),
+        FixtureSite("ratelimited", urls=300, case_study_share=0.1, rate_limit_every=3),
+        FixtureSite("mirrored", urls=300, case_study_share=0.1, mirrored=True),
+        FixtureSite("localized", urls=300, case_study_share=0.1, localized=True),
+        FixtureSite("noisy", urls=600, case_study_share=0.2, noisy=True),
+        FixtureSite("remote", urls=300, case_study_share=0.1, compressed=True, handshake_delay=0.03),
+    ]
+
+
+class FixtureServers:
+    """
+    Start the fixture sites and fake services on free local ports.
+
+    Used as a context manager; .sites maps site names to sites (with .origin set)
+    and .services is the FakeServices instance.
+    """
+
+    def __init__(self, sites=None, services=None):
+        self.sites = {site.name: site for site in (sites or default_sites())}
+        self.services = services or FakeServices()
+        self._servers = []
+
+    def _start(self, site, handler):
+        handler_class = type(f"{handler.__name__}_{site.name}", (handler,), {"site": site})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        server.daemon_threads = True
+        site.origin = f"http://127.0.0.1:{server.server_address[1]}"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self._servers.append(server)
+
+    def __enter__(self):
+        for site in self.sites.values():
+            self._start(site, _Handler)
+        self._start(self.services, _ServicesHandler)
+        return self
+
+    def __exit__(self, *exc):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+
+    def environment(self):
+        """Environment variables that point the OpenAI and S3 clients at the fake services."""
+        return {
+            "OPENAI_BASE_URL": f"{self.services.origin}/v1",
+            "OPENAI_API_KEY": "fixture",
+            "AWS_ENDPOINT_URL_S3": self.services.origin,
+            "AWS_ACCESS_KEY_ID": "fixture",
+            "AWS_SECRET_ACCESS_KEY": "fixture",
+        }
+
+
+if __name__ == "__main__":
+    with FixtureServers() as servers:
+        for site in servers.sites.values():
+            print(f"{site.name:<14} {site.origin}")
+        print(f"{'services':<14} {servers.services.origin}  (OpenAI: /v1/chat/completions, S3: PUT /<bucket>/<key>)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,553 @@
+"""
+Offline benchmarks of the scrapers.
+
+Runs the case study and product page scrapers against the local fixture sites and
+fake OpenAI/S3 services of benchmarks/fixtures.py, so results do not depend on live
+sites and can be compared between changes. Per-stage benchmarks time one step
+(sitemap parsing, language detection, body extraction...); end-to-end benchmarks
+time a whole discovery or pipeline run.
+
+For every benchmark it reports p50/p95 latency of one operation, throughput (items
+per second, e.g. sitemap URLs or pages) and peak Python memory of one run. Results
+are stored under <data_dir>/benchmarks/ and compared with the previous run (or
+--baseline) to flag regressions:
+
+    python benchmarks/scrapers.py
+    python benchmarks/scrapers.py --only sitemap --repeat 5
+    python benchmarks/scrapers.py --baseline .cxproof/benchmarks/20250101-120000.json --fail-on-regression
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import FixtureServers  # noqa: E402
+
+
+BENCHMARKS = {}
+
+
+def benchmark(name, stage):
+    """Register fn(servers) -> {'latencies': [seconds per operation], 'items': count, ...extra metrics}."""
+    def register(fn):
+        BENCHMARKS[name] = {"fn": fn, "stage": stage}
+        return fn
+    return register
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _scraper():
+    from cxproof import fetch
+
+    return fetch.create_scraper()
+
+
+def _discovery(site, max_results=5, incremental=False):
+    from cxproof.casestudies import CASE_STUDY_KEYWORDS, get_case_study_urls
+
+    urls, elapsed = _timed(lambda: list(get_case_study_urls(site.origin, CASE_STUDY_KEYWORDS, max_results,
+                                                            incremental=incremental)))
+    return {"latencies": [elapsed], "items": len(urls)}
+
+
+# Per-stage benchmarks
+
+@benchmark("sitemap.index_100k", stage="sitemap")
+def sitemap_index(servers):
+    """Download and parse the nested, gzipped sitemap index of 100k URLs."""
+    from cxproof.casestudies import CASE_STUDY_KEYWORDS, process_sitemap_and_yield_urls
+
+    site = servers.sites["large"]
+    scraper = _scraper()
+    matches, elapsed = _timed(lambda: list(process_sitemap_and_yield_urls(
+        scraper, f"{site.origin}/sitemap_index.xml", CASE_STUDY_KEYWORDS, set())))
+    return {"latencies": [elapsed], "items": site.urls, "matches": len(matches)}
+
+
+@benchmark("sitemap.single_5k", stage="sitemap")
+def sitemap_single(servers):
+    """Download and parse one gzipped sitemap of 5000 URLs."""
+    from cxproof.casestudies import CASE_STUDY_KEYWORDS, process_sitemap_and_yield_urls
+
+    site = servers.sites["large"]
+    scraper = _scraper()
+    latencies = []
+    for i in range(4):
+        _, elapsed = _timed(lambda: list(process_sitemap_and_yield_urls(
+            scraper, f"{site.origin}/sitemaps/urls-{i}.xml.gz", CASE_STUDY_KEYWORDS, set())))
+        latencies.append(elapsed)
+    return {"latencies": latencies, "items": 4 * 5000}
+
+
+@benchmark("language.detect", stage="language")
+def language_detection(servers):
+    """Detect the language of multilingual pages, half of them without a lang attribute."""
+    from cxproof.casestudies import detect_website_language
+
+    site = servers.sites["multilingual"]
+    latencies = []
+    correct = 0
+    pages = range(40)
+    for i in pages:
+        result, elapsed = _timed(detect_website_language, f"{site.origin}{site.page_path(i)}")
+        latencies.append(elapsed)
+        correct += result['code'] == site.page_language(i)
+    return {"latencies": latencies, "items": len(pages), "accuracy": correct / len(pages)}
+
+
+@benchmark("extract.parse", stage="parse")
+def extract_parse(servers):
+    """Title and body extraction from already downloaded HTML."""
+    from bs4 import BeautifulSoup
+
+    from cxproof.casestudies import extract_body, extract_title
+
+    site = servers.sites["small"]
+    pages = [site.page(i) for i in range(50)]
+    latencies = []
+    for html in pages:
+        def parse():
+            soup = BeautifulSoup(html, 'html.parser')
+            return extract_title(soup, "fixture"), extract_body(soup, "fixture")
+        _, elapsed = _timed(parse)
+        latencies.append(elapsed)
+    return {"latencies": latencies, "items": len(pages)}
+
+
+def _large_page_texts(site, count=20, paragraphs=400):
+    """Text of large pages: many paragraphs with links, punctuation and blank lines between them."""
+    from bs4 import BeautifulSoup
+
+    texts = []
+    for i in range(count):
+        text = BeautifulSoup(site.page(i), 'html.parser').get_text(separator="\n")
+        texts.append(("\n\n\n   ".join([text] * (paragraphs // 10)) + f" See https://example.com/story-{i}?a=1, too! ")
+                     * 10)
+    return texts
+
+
+def _regex_passes_clean(text):
+    # The former clean_content: two passes with uncompiled patterns
+    import re
+
+    return re.sub(r'\s{2,}', ' ', re.sub(r'\n{3,}', '\n\n', text)).strip()
+
+
+def _regex_passes_sample(text):
+    # The former language sampling: three passes over the whole text, then truncation
+    import re
+
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'https?://\S+', '', text)
+    return re.sub(r'[^\w\s]', '', text).strip()[:2000]
+
+
+@benchmark("text.clean_content", stage="text")
+def text_clean_content(servers):
+    """clean_content on large pages (throughput in pages); also times the former two regex passes."""
+    from cxproof.text_normalization import clean_content
+
+    texts = _large_page_texts(servers.sites["small"])
+    latencies = [_timed(clean_content, text)[1] for text in texts]
+    former = sum(_timed(_regex_passes_clean, text)[1] for text in texts)
+    return {"latencies": latencies, "items": len(texts), "page_kb": sum(map(len, texts)) / len(texts) / 1000,
+            "speedup_vs_regex_passes": former / sum(latencies)}
+
+
+@benchmark("text.language_sample", stage="text")
+def text_language_sample(servers):
+    """Language sample of large pages read from their strings; also times the former three passes."""
+    from bs4 import BeautifulSoup
+
+    from cxproof.text_normalization import language_sample
+
+    soups = [BeautifulSoup(f"<html><body><p>{text}</p><p>{text}</p></body></html>", 'html.parser')
+             for text in _large_page_texts(servers.sites["multilingual"], count=10)]
+    latencies = [_timed(lambda: language_sample(soup.strings))[1] for soup in soups]
+    former = sum(_timed(lambda: _regex_passes_sample(soup.get_text(separator=' ')))[1] for soup in soups)
+    return {"latencies": latencies, "items": len(soups), "speedup_vs_regex_passes": former / sum(latencies)}
+
+
+@benchmark("extract.fetch_and_parse", stage="fetch")
+def extract_fetch(servers):
+    """extract_case_study on case study pages (politeness delay disabled)."""
+    from cxproof.casestudies import extract_case_study
+
+    site = servers.sites["small"]
+    urls = site.case_study_urls()[:20]
+    latencies = []
+    failures = 0
+    for url in urls:
+        result, elapsed = _timed(extract_case_study, url)
+        latencies.append(elapsed)
+        failures += bool(result.get('error'))
+    return {"latencies": latencies, "items": len(urls), "failures": failures}
+
+
+@benchmark("product.page_metadata", stage="fetch")
+def page_metadata(servers):
+    """get_page_metadata (title, description and DOM fingerprint) of product pages."""
+    from cxproof.products import get_page_metadata
+
+    site = servers.sites["small"]
+    latencies = []
+    for i in range(20):
+        _, elapsed = _timed(get_page_metadata, f"{site.origin}{site.page_path(i)}")
+        latencies.append(elapsed)
+    return {"latencies": latencies, "items": 20}
+
+
+@benchmark("product.s3_upload", stage="upload")
+def s3_upload(servers):
+    """upload_to_s3 of screenshot sections to the fake S3."""
+    from PIL import Image, ImageDraw
+
+    from cxproof.products import upload_to_s3
+
+    latencies = []
+    with tempfile.TemporaryDirectory() as directory:
+        for i in range(10):
+            path = os.path.join(directory, f"section_{i}.png")
+            img = Image.new("RGB", (1280, 1080), "white")
+            ImageDraw.Draw(img).text((20, 20), f"Section {i} " * 40, fill="black")
+            img.save(path)
+            url, elapsed = _timed(upload_to_s3, path)
+            if url is None:
+                raise RuntimeError("Upload to the fake S3 failed")
+            latencies.append(elapsed)
+    return {"latencies": latencies, "items": 10}
+
+
+# End-to-end benchmarks
+
+@benchmark("discovery.small", stage="end-to-end")
+def discovery_small(servers):
+    """Find 5 English case studies: robots.txt -> flat sitemap -> language checks."""
+    return _discovery(servers.sites["small"])
+
+
+@benchmark("discovery.large_nested_gzip", stage="end-to-end")
+def discovery_large(servers):
+    """Find 5 case studies through nested, gzipped sitemap indexes of 100k URLs."""
+    return _discovery(servers.sites["large"])
+
+
+@benchmark("discovery.multilingual", stage="end-to-end")
+def discovery_multilingual(servers):
+    """Find 5 English case studies among pages in four languages."""
+    return _discovery(servers.sites["multilingual"])
+
+
+@benchmark("discovery.no_robots", stage="end-to-end")
+def discovery_no_robots(servers):
+    """Find 5 case studies with no robots.txt (default sitemap locations)."""
+    return _discovery(servers.sites["norobots"])
+
+
+@benchmark("discovery.slow_host", stage="end-to-end")
+def discovery_slow(servers):
+    """Find 5 case studies on a host that answers every request after 50ms."""
+    return _discovery(servers.sites["slow"])
+
+
+@benchmark("discovery.rate_limited", stage="end-to-end")
+def discovery_rate_limited(servers):
+    """Find 5 case studies on a host that answers every third request with 429."""
+    return _discovery(servers.sites["ratelimited"])
+
+
+@benchmark("discovery.duplicate_listings", stage="end-to-end")
+def discovery_duplicates(servers):
+    """Find 20 case studies on a site listing 10 of them in two sitemaps (one with tracking parameters)."""
+    from cxproof.casestudies import CASE_STUDY_KEYWORDS, get_case_study_urls
+    from cxproof.frontier import canonical_url
+
+    site = servers.sites["mirrored"]
+    before = site.requests
+    urls, elapsed = _timed(lambda: list(get_case_study_urls(site.origin, CASE_STUDY_KEYWORDS, 20)))
+    return {"latencies": [elapsed], "items": len(urls), "requests": site.requests - before,
+            "duplicates_returned": len(urls) - len({canonical_url(url) for url in urls})}
+
+
+@benchmark("discovery.near_duplicates", stage="end-to-end")
+def discovery_near_duplicates(servers):
+    """Collect 5 distinct case studies on a site listing every story twice (/en-gb/ copies) and listing pages."""
+    from cxproof.casestudies import CASE_STUDY_KEYWORDS, collect_case_studies
+
+    site = servers.sites["localized"]
+    before = site.requests
+    results, elapsed = _timed(lambda: list(collect_case_studies(site.origin, CASE_STUDY_KEYWORDS, 5)))
+    distinct = [case_study for case_study, duplicate_of in results if not duplicate_of and not case_study.get('error')]
+    return {"latencies": [elapsed], "items": len(distinct), "requests": site.requests - before,
+            "extracted": len(results), "duplicates_skipped": len(results) - len(distinct),
+            "regional_copies_kept": sum("/en-gb/" in case_study['url'] for case_study in distinct)}
+
+
+@benchmark("discovery.ranked_candidates", stage="end-to-end")
+def discovery_ranked(servers):
+    """Collect 5 case studies on a site whose sitemap lists overview pages, translations and old stories first."""
+    from cxproof.casestudies import CASE_STUDY_KEYWORDS, collect_case_studies
+
+    site = servers.sites["noisy"]
+    stories = {f"{site.origin}{site.page_path(i)}" for i in range(site.urls)
+               if site.is_case_study_section(i) and site.page_kind(i) == "story"}
+    before = site.requests
+    results, elapsed = _timed(lambda: list(collect_case_studies(site.origin, CASE_STUDY_KEYWORDS, 5)))
+    found = [case_study['url'] for case_study, duplicate_of in results if not duplicate_of]
+    return {"latencies": [elapsed], "items": len(found), "requests": site.requests - before,
+            "extracted": len(results), "recent_stories": sum(url in stories for url in found)}
+
+
+def _fetch_backend(servers, backend):
+    """Collect 5 case studies from the remote site with a fetch backend, from a cold start."""
+    from cxproof import fetch
+    from cxproof.casestudies import CASE_STUDY_KEYWORDS, collect_case_studies
+
+    site = servers.sites["remote"]
+    previous = os.environ.get("CXPROOF_FETCH_BACKEND")
+    os.environ["CXPROOF_FETCH_BACKEND"] = backend
+    try:
+        # No connections or DNS entries left over from an earlier run
+        fetch.reset()
+        before = (site.requests, site.connections, site.bytes_sent, site.bytes_uncompressed)
+        results, elapsed = _timed(lambda: list(collect_case_studies(site.origin, CASE_STUDY_KEYWORDS, 5)))
+    finally:
+        if previous is None:
+            del os.environ["CXPROOF_FETCH_BACKEND"]
+        else:
+            os.environ["CXPROOF_FETCH_BACKEND"] = previous
+    requests, connections, bytes_sent, bytes_uncompressed = (
+        after - start for after, start in zip((site.requests, site.connections, site.bytes_sent,
+                                               site.bytes_uncompressed), before))
+    return {"latencies": [elapsed], "items": len(results), "requests": requests, "connections": connections,
+            "bytes": bytes_sent, "bytes_uncompressed": bytes_uncompressed}
+
+
+@benchmark("fetch.cloudscraper", stage="fetch")
+def fetch_cloudscraper(servers):
+    """Discovery and extraction of 5 case studies with cloudscraper sessions, on a distant host compressing responses."""
+    return _fetch_backend(servers, "cloudscraper")
+
+
+@benchmark("fetch.httpx", stage="fetch")
+def fetch_httpx(servers):
+    """The same with the shared httpx client (HTTP/2 where offered, br/gzip, cached DNS), from a cold start."""
+    return _fetch_backend(servers, "httpx")
+
+
+@benchmark("frontier.million_urls", stage="frontier")
+def frontier_million(servers):
+    """Seen-checks of 1M sitemap URLs (half of them listed twice) in the scan frontier."""
+    from cxproof.frontier import Frontier
+
+    frontier = Frontier()
+    start = time.perf_counter()
+    for i in range(1_000_000):
+        frontier.first_visit(f"https://www.example.com/customers/story-{i % 500_000}?utm_source=sitemap-{i // 500_000}")
+    elapsed = time.perf_counter() - start
+    stats = frontier.stats()
+    return {"latencies": [elapsed], "items": 1_000_000, "duplicates": stats['duplicates'],
+            "missed": 1_000_000 - 500_000 - stats['duplicates'], "filter_mb": stats['filter_bytes'] / 1e6}
+
+
+@benchmark("discovery.incremental_rescan", stage="end-to-end")
+def discovery_incremental(servers):
+    """Rescan the 100k URL site with the crawl state of an earlier scan (unchanged sitemaps and pages)."""
+    site = servers.sites["large"]
+    if site.name not in _scanned:
+        _discovery(site, incremental=True)
+        _scanned.add(site.name)
+    return _discovery(site, incremental=True)
+
+
+_scanned = set()
+
+
+@benchmark("pipeline.case_study_analysis", stage="end-to-end")
+def case_study_pipeline(servers):
+    """Find and extract 5 case studies, then analyze them with the fake OpenAI endpoint."""
+    from cxproof.casestudies import CASE_STUDY_KEYWORDS, extract_case_study, get_case_study_urls
+    from cxproof.llm import get_openai_client, stream_chat_completion
+    from cxproof.prompt_packing import analyze_case_studies
+
+    start = time.perf_counter()
+    urls = list(get_case_study_urls(servers.sites["small"].origin, CASE_STUDY_KEYWORDS, 5))
+    case_studies = [extract_case_study(url) for url in urls]
+    client = get_openai_client("fixture")
+
+    def complete(content, max_tokens, question):
+        return stream_chat_completion(client, cache=False, model="gpt-4o", max_tokens=max_tokens,
+                                      messages=[{"role": "user", "content": content}])
+
+    analyze_case_studies(case_studies, "Summarize what these customers achieved.", complete, model="gpt-4o")
+    return {"latencies": [time.perf_counter() - start], "items": len(case_studies)}
+
+
+# Harness
+
+def percentile(values, q):
+    """Linear-interpolated percentile (q in 0..100) of a list of numbers."""
+    values = sorted(values)
+    if not values:
+        return None
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def run_benchmark(name, servers, repeat=3, warmup=1):
+    fn = BENCHMARKS[name]["fn"]
+    for _ in range(warmup):
+        fn(servers)
+
+    latencies = []
+    items = 0
+    wall = 0.0
+    extra = {}
+    for _ in range(repeat):
+        result, elapsed = _timed(fn, servers)
+        wall += elapsed
+        latencies += result.pop("latencies")
+        items += result.pop("items")
+        extra = result
+
+    # Peak memory in a separate run, since tracing slows everything down
+    tracemalloc.start()
+    try:
+        fn(servers)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "stage": BENCHMARKS[name]["stage"],
+        "operations": len(latencies),
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "throughput": items / wall if wall else None,
+        "items_per_run": items / repeat,
+        "peak_memory_mb": peak / 1e6,
+        **extra,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print the change against a baseline run; returns the names of regressed benchmarks."""
+    regressions = []
+    print(f"\nCompared with {baseline.get('revision') or '?'} ({baseline['started_at']}):")
+    for name, result in results.items():
+        before = baseline["benchmarks"].get(name)
+        if not before or "error" in result or "error" in before:
+            continue
+        p50_change = result["p50_s"] / before["p50_s"] - 1 if before["p50_s"] else 0.0
+        throughput_change = result["throughput"] / before["throughput"] - 1 if before["throughput"] else 0.0
+        memory_change = result["peak_memory_mb"] - before["peak_memory_mb"]
+        regressed = p50_change > threshold or throughput_change < -threshold
+        if regressed:
+            regressions.append(name)
+        print(f"  {name:<34} p50 {p50_change:+7.1%}  throughput {throughput_change:+7.1%}  "
+              f"memory {memory_change:+7.1f}MB{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline scraper benchmarks.")
+    parser.add_argument("names", nargs="*", help="Benchmarks to run (default: all)")
+    parser.add_argument("--only", help="Run the benchmarks whose name or stage contains this text")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--list", action="store_true", help="List the benchmarks and exit")
+    parser.add_argument("--baseline", help="Results file to compare with (default: the previous run)")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--no-save", action="store_true", help="Do not store the results")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, entry in BENCHMARKS.items():
+            print(f"{name:<34} {entry['stage']:<11} {entry['fn'].__doc__}")
+        return 0
+
+    names = args.names or list(BENCHMARKS)
+    if args.only:
+        names = [name for name in names if args.only in name or args.only in BENCHMARKS[name]["stage"]]
+
+    from cxproof.config import data_path
+
+    results_dir = os.path.abspath(data_path("benchmarks"))
+    os.makedirs(results_dir, exist_ok=True)
+    previous = sorted(glob.glob(os.path.join(results_dir, "*.json")))
+    baseline_path = args.baseline or (previous[-1] if previous else None)
+
+    run = {
+        "started_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "repeat": args.repeat,
+        "benchmarks": {},
+    }
+
+    with tempfile.TemporaryDirectory() as workdir, FixtureServers() as servers:
+        # Isolated state, no politeness delays, and clients pointed at the fake services
+        os.makedirs(os.path.join(workdir, ".streamlit"))
+        with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w") as f:
+            f.write('OPENAI_API_KEY = "fixture"\nAWS_ACCESS_KEY = "fixture"\nAWS_SECRET_KEY = "fixture"\n'
+                    'AWS_BUCKET_NAME = "fixture-bucket"\nAWS_REGION = "us-east-1"\n')
+        os.environ.update(servers.environment())
+        os.environ.update({"CXPROOF_DATA_DIR": os.path.join(workdir, "data"), "CXPROOF_CASE_STUDY_DELAY_MIN": "0",
+                           "CXPROOF_CASE_STUDY_DELAY_MAX": "0", "CXPROOF_LLM_CACHE_ENABLED": "false"})
+        os.chdir(workdir)
+
+        print(f"{'benchmark':<34} {'stage':<11} {'p50':>9} {'p95':>9} {'throughput':>14} {'memory':>9}")
+        for name in names:
+            try:
+                result = run_benchmark(name, servers, args.repeat, args.warmup)
+            except Exception as e:
+                result = {"stage": BENCHMARKS[name]["stage"], "error": f"{type(e).__name__}: {e}"}
+                print(f"{name:<34} {result['stage']:<11} failed: {result['error']}")
+            else:
+                print(f"{name:<34} {result['stage']:<11} {result['p50_s'] * 1000:>7.1f}ms "
+                      f"{result['p95_s'] * 1000:>7.1f}ms {result['throughput']:>10.1f}/s "
+                      f"{result['peak_memory_mb']:>7.1f}MB")
+            run["benchmarks"][name] = result
+
+    regressions = []
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(run["benchmarks"], json.load(f), args.threshold)
+
+    if not args.no_save:
+        path = os.path.join(results_dir, time.strftime("%Y%m%d-%H%M%S") + ".json")
+        with open(path, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"\nResults saved to {path}")
+
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
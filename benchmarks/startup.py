@@ -0,0 +1,124 @@
+"""
+Startup time of the Streamlit apps.
+
+Every app is run twice with Streamlit's AppTest in a fresh interpreter: the first
+run is a cold start that loads every module the app imports, the second is a rerun
+as triggered by a widget interaction. A second interpreter started with
+python -X importtime attributes the cold start's import time to top-level packages.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py app_productinfoscraper.py --repeat 5 --json startup.json
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MARKER = "--- app start ---"
+
+# Placeholder secrets so the apps can start without real credentials
+SECRETS = ["OPENAI_API_KEY", "AWS_ACCESS_KEY", "AWS_SECRET_KEY", "AWS_BUCKET_NAME", "AWS_REGION",
+           "SCREENSHOTONE_ACCESS_KEY", "SCREENSHOTONE_SECRET_KEY"]
+
+_DRIVER = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+
+app = AppTest.from_file(sys.argv[1], default_timeout=120)
+for name in json.loads(sys.argv[2]):
+    app.secrets[name] = "benchmark"
+sys.stderr.write("%s\\n")
+sys.stderr.flush()
+start = time.perf_counter()
+app.run()
+cold = time.perf_counter() - start
+start = time.perf_counter()
+app.run()
+rerun = time.perf_counter() - start
+print(json.dumps({"cold_s": cold, "rerun_s": rerun, "exceptions": [str(e.value) for e in app.exception]}))
+""" % MARKER
+
+
+def run_app(app, importtime=False):
+    """Run one app in a fresh interpreter; returns the driver's JSON output and its stderr."""
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", _DRIVER, app, json.dumps(SECRETS)]
+    completed = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def parse_importtime(stderr):
+    """
+    Import time of the modules loaded by the app, grouped by top-level package.
+
+    Returns:
+        dict: Package name -> cumulative import time in seconds, largest first
+    """
+    packages = {}
+    started = False
+    for line in stderr.splitlines():
+        if line == MARKER:
+            started = True
+            continue
+        if not started or not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        # Nested imports are indented; only count the imports done by the app itself
+        if name.startswith("  ") or not cumulative.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0.0) + int(cumulative) / 1e6
+    return dict(sorted(packages.items(), key=lambda item: -item[1]))
+
+
+def benchmark(app, repeat=3):
+    """Median cold start and rerun times of an app, plus its import breakdown."""
+    runs = [run_app(app)[0] for _ in range(repeat)]
+    result, stderr = run_app(app, importtime=True)
+    imports = parse_importtime(stderr)
+    return {
+        "app": app,
+        "cold_s": statistics.median(run["cold_s"] for run in runs),
+        "rerun_s": statistics.median(run["rerun_s"] for run in runs),
+        "import_s": sum(imports.values()),
+        "imports": imports,
+        "exceptions": result["exceptions"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold start and rerun time of the Streamlit apps.")
+    parser.add_argument("apps", nargs="*", help="App files (default: every app_*.py)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per app; the median is reported")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest imports listed per app")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    apps = args.apps or sorted(os.path.basename(path) for path in glob.glob(os.path.join(ROOT, "app_*.py")))
+    results = []
+    print(f"{'app':<36} {'cold':>8} {'rerun':>8} {'imports':>8}  heaviest imports")
+    for app in apps:
+        result = benchmark(app, args.repeat)
+        results.append(result)
+        heaviest = ", ".join(f"{name} {seconds * 1000:.0f}ms"
+                             for name, seconds in list(result["imports"].items())[:args.top])
+        print(f"{app:<36} {result['cold_s'] * 1000:>6.0f}ms {result['rerun_s'] * 1000:>6.0f}ms "
+              f"{result['import_s'] * 1000:>6.0f}ms  {heaviest}")
+        for exception in result["exceptions"]:
+            print(f"    raised: {exception}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
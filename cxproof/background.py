@@ -0,0 +1,210 @@
+"""
+Background execution of long scrapes in the Streamlit apps.
+
+Work started from a button runs on a thread pool shared by all sessions instead of
+inside the script run, so widget interactions (which rerun the script) no longer
+abort it. Tasks are kept in the session state of the session that started them,
+and a fragment polls and renders their progress until they finish; the whole
+page then reruns once so it can pick up the result:
+
+    if st.button("Find Case Studies"):
+        background.submit("case_studies", find_case_studies, company_url)
+    task = background.pop_finished("case_studies")
+    if task and task.status == background.SUCCEEDED:
+        st.session_state["case_studies"] = task.result
+    background.show_progress("case_studies", render_progress)
+
+The task function receives the Task as its first argument and reports through
+task.write(text) (it can stand in for a Streamlit placeholder) and task.progress().
+It must not call Streamlit UI functions itself.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from cxproof import tracing
+from cxproof.config import get_setting
+
+
+# Task states
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+_STATE_KEY = "_background_tasks"
+
+
+class TaskCancelled(Exception):
+    """Raised by Task.check_cancelled() once cancellation was requested."""
+
+
+class Task:
+    """A function running in the background, with its progress and outcome."""
+
+    def __init__(self, name, session_id):
+        self.name = name
+        self.session_id = session_id
+        self.status = RUNNING
+        self.messages = deque(maxlen=200)
+        self.fraction = None
+        self.result = None
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self.cancel_requested = False
+        self.rerun_requested = False
+        self.future = None
+        self.trace = None
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.status != RUNNING
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def last_message(self):
+        with self._lock:
+            return self.messages[-1] if self.messages else ""
+
+    def write(self, text, *args, **kwargs):
+        """Record a progress message."""
+        with self._lock:
+            self.messages.append(str(text))
+
+    def progress(self, fraction, text=None):
+        """Record the share of the work done (0 to 1), optionally with a message."""
+        self.fraction = max(0.0, min(1.0, fraction))
+        if text:
+            self.write(text)
+
+    def cancel(self):
+        """Ask the task to stop; it stops at its next check_cancelled() call."""
+        self.cancel_requested = True
+
+    def check_cancelled(self):
+        if self.cancel_requested:
+            raise TaskCancelled()
+
+    def _run(self, fn, args, kwargs):
+        try:
+            # The spans of the task make up one traced run, shown in the debug panel
+            with tracing.trace(self.name) as self.trace:
+                self.result = fn(self, *args, **kwargs)
+            self.status = SUCCEEDED
+        except TaskCancelled:
+            self.status = CANCELLED
+        except Exception as e:
+            logging.exception(f"Background task {self.name} of session {self.session_id} failed")
+            self.error = str(e)
+            self.status = FAILED
+        finally:
+            self.finished_at = time.time()
+            logging.info(f"Background task {self.name} {self.status} after {self.elapsed:.1f}s")
+
+
+@st.cache_resource(show_spinner=False)
+def get_executor():
+    """Thread pool shared by the background tasks of all sessions."""
+    return ThreadPoolExecutor(max_workers=get_setting('background_workers'), thread_name_prefix="background")
+
+
+def _tasks():
+    return st.session_state.setdefault(_STATE_KEY, {})
+
+
+def submit(name, fn, *args, **kwargs):
+    """
+    Start fn(task, *args, **kwargs) in the background for the current session.
+
+    A task of the same name that is still running is cancelled and replaced.
+
+    Args:
+        name (str): Name of the task within the session
+        fn (callable): The work; receives the Task first
+
+    Returns:
+        Task: The started task
+    """
+    tasks = _tasks()
+    previous = tasks.get(name)
+    if previous is not None and not previous.done:
+        previous.cancel()
+
+    ctx = get_script_run_ctx()
+    task = Task(name, ctx.session_id if ctx else None)
+    tasks[name] = task
+    task.future = get_executor().submit(task._run, fn, args, kwargs)
+    return task
+
+
+def get_task(name):
+    """The current session's task of that name, or None."""
+    return _tasks().get(name)
+
+
+def pop_finished(name):
+    """Remove and return the current session's task of that name if it has finished, else None."""
+    task = get_task(name)
+    if task is None or not task.done:
+        return None
+    del _tasks()[name]
+    return task
+
+
+def show_progress(name, render=None, interval=None):
+    """
+    Render the progress of a running task, refreshing it in a fragment until the task ends.
+
+    When the task finishes the whole app reruns once, so code calling pop_finished()
+    sees the result.
+
+    Args:
+        name (str): Name of the task
+        render (callable): render(task) draws the progress; defaults to a status line and progress bar
+        interval (float): Seconds between refreshes; defaults to the background_poll_interval setting
+    """
+    task = get_task(name)
+    if task is None:
+        return
+    if task.done:
+        # Finished after this run's pop_finished() call; rerun once to pick it up
+        _rerun_once(task)
+        return
+
+    render = render or render_progress
+
+    @st.fragment(run_every=interval or get_setting('background_poll_interval'))
+    def _poll():
+        current = get_task(name)
+        if current is None:
+            return
+        if current.done:
+            _rerun_once(current)
+        render(current)
+
+    _poll()
+
+
+def _rerun_once(task):
+    if not task.rerun_requested:
+        task.rerun_requested = True
+        st.rerun()
+
+
+def render_progress(task):
+    """Default progress display: progress bar, latest message, elapsed time and a cancel button."""
+    if task.fraction is not None:
+        st.progress(task.fraction)
+    st.caption(f"{task.last_message} ({task.elapsed:.0f}s)")
+    if st.button("Cancel", key=f"cancel_{task.name}", disabled=task.cancel_requested):
+        task.cancel()
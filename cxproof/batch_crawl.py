@@ -0,0 +1,291 @@
+"""
+Headless batch crawler for case studies.
+
+Reads a list of company URLs, finds and extracts their case studies with the same
+function as the case study scraper app (collect_case_studies, so listing pages and
+near-duplicate copies are left out) and writes one JSON line per case study.
+
+Companies are spread over a worker pool; all companies of one domain are handled
+by the same worker, one after the other, so a domain is never crawled
+concurrently and a failing site only affects its own companies. Progress is
+checkpointed to a SQLite file, so an interrupted run picks up where it stopped
+when started again with the same state file.
+
+Pages whose extraction failed (HTTP errors, timeouts) are not stored as case
+studies; they are kept in a separate table with their error and tried again
+the next time their company is crawled.
+
+Periodic refreshes use --refresh to crawl finished companies again and
+--incremental to only fetch what changed since the last scan: unchanged sitemaps
+are skipped or answered with 304, and pages whose sitemap <lastmod> did not
+change keep their language verdict and extracted content (see crawl_state).
+
+Usage:
+    python -m cxproof.batch_crawl companies.txt --output case_studies.jsonl --workers 8
+    python -m cxproof.batch_crawl companies.txt --output week-42.jsonl --refresh --incremental
+"""
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from cxproof import crawl_state
+from cxproof.casestudies import CASE_STUDY_KEYWORDS, collect_case_studies, extract_case_study
+from cxproof.config import data_path
+
+
+# Case study records that are not failed extractions (state files of earlier versions stored those too)
+_EXTRACTED = "json_extract(record, '$.error') IS NULL"
+
+
+@contextmanager
+def _connect(state_path):
+    connection = sqlite3.connect(state_path, timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    try:
+        yield connection
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def init_state(state_path, company_urls, refresh=False):
+    """
+    Create the checkpoint tables and register companies that are not known yet.
+
+    With refresh, the listed companies that were finished or failed in an earlier
+    run are crawled (and exported) again.
+    """
+    with _connect(state_path) as connection:
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS companies (
+                url TEXT PRIMARY KEY,
+                domain TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                case_studies INTEGER NOT NULL DEFAULT 0,
+                exported INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                finished_at REAL
+            )
+        """)
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS case_studies (
+                company TEXT NOT NULL,
+                url TEXT NOT NULL,
+                record TEXT NOT NULL,
+                PRIMARY KEY (company, url)
+            )
+        """)
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS page_errors (
+                company TEXT NOT NULL,
+                url TEXT NOT NULL,
+                error TEXT NOT NULL,
+                attempted_at REAL NOT NULL,
+                PRIMARY KEY (company, url)
+            )
+        """)
+        connection.executemany(
+            "INSERT OR IGNORE INTO companies (url, domain) VALUES (?, ?)",
+            [(url, company_domain(url)) for url in company_urls]
+        )
+        # Companies that were in progress when the last run stopped start over
+        connection.execute("UPDATE companies SET status = 'pending' WHERE status = 'running'")
+        if refresh:
+            connection.executemany(
+                "UPDATE companies SET status = 'pending', attempts = 0, exported = 0, error = NULL "
+                "WHERE url = ? AND status IN ('done', 'failed')",
+                [(url,) for url in company_urls]
+            )
+
+
+def company_domain(url):
+    """Host of a company URL without the www. prefix."""
+    if not url.startswith(("http://", "https://")):
+        url = "https://" + url
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def read_company_urls(path):
+    """Read company URLs, one per line; blank lines and # comments are ignored."""
+    urls = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                urls.append(line if line.startswith(("http://", "https://")) else "https://" + line)
+    return list(dict.fromkeys(urls))
+
+
+class BatchCrawler:
+    """Crawls case studies for many companies with checkpointing."""
+
+    def __init__(self, state_path, output_path, num_case_studies=5, workers=4, max_attempts=2,
+                 incremental=False):
+        self.state_path = state_path
+        self.output_path = output_path
+        self.num_case_studies = num_case_studies
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.incremental = incremental
+        self._output_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+
+    def crawl_company(self, company_url):
+        """
+        Find and extract the case studies of one company, checkpointing every extracted page.
+
+        Pages extracted before are not fetched again (in incremental mode only while their
+        sitemap <lastmod> is the one they were extracted at); their stored record still
+        takes part in the near-duplicate check. Near-duplicates of a case study kept
+        before are not stored.
+        """
+        with _connect(self.state_path) as connection:
+            connection.execute("UPDATE companies SET status = 'running', attempts = attempts + 1 WHERE url = ?",
+                               (company_url,))
+            done = {row[0]: json.loads(row[1]) for row in connection.execute(
+                f"SELECT url, record FROM case_studies WHERE company = ? AND {_EXTRACTED}", (company_url,))}
+        reused = set()
+
+        def extract(url):
+            lastmod = crawl_state.url_lastmod(url) if self.incremental else None
+            if url in done and (not self.incremental or done[url].get('lastmod') == lastmod):
+                reused.add(url)
+                return done[url]
+            return dict(extract_case_study(url), lastmod=lastmod)
+
+        for case_study, duplicate_of in collect_case_studies(company_url, CASE_STUDY_KEYWORDS, self.num_case_studies,
+                                                             incremental=self.incremental, extract=extract):
+            url = case_study['url']
+            if case_study.get('error'):
+                logging.warning(f"Extracting {url} failed: {case_study['error']}")
+                with _connect(self.state_path) as connection:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO page_errors (company, url, error, attempted_at) VALUES (?, ?, ?, ?)",
+                        (company_url, url, case_study['error'], time.time()))
+                continue
+            if duplicate_of:
+                logging.info(f"Skipping {url}: same case study as {duplicate_of}")
+                continue
+            if url in reused:
+                continue
+            record = dict(case_study, company=company_url, crawled_at=time.time())
+            with _connect(self.state_path) as connection:
+                connection.execute("INSERT OR REPLACE INTO case_studies (company, url, record) VALUES (?, ?, ?)",
+                                   (company_url, url, json.dumps(record)))
+                connection.execute("DELETE FROM page_errors WHERE company = ? AND url = ?", (company_url, url))
+
+        with _connect(self.state_path) as connection:
+            count = connection.execute(f"SELECT COUNT(*) FROM case_studies WHERE company = ? AND {_EXTRACTED}",
+                                       (company_url,)).fetchone()[0]
+            connection.execute(
+                "UPDATE companies SET status = 'done', case_studies = ?, error = NULL, finished_at = ? WHERE url = ?",
+                (count, time.time(), company_url)
+            )
+
+    def export_company(self, company_url):
+        """Append a finished company's case studies to the JSONL output."""
+        with _connect(self.state_path) as connection:
+            records = [row[0] for row in connection.execute(
+                f"SELECT record FROM case_studies WHERE company = ? AND {_EXTRACTED} ORDER BY rowid", (company_url,))]
+            with self._output_lock:
+                with open(self.output_path, "a", encoding="utf-8") as f:
+                    for record in records:
+                        f.write(record + "\n")
+            connection.execute("UPDATE companies SET exported = 1 WHERE url = ?", (company_url,))
+
+    def crawl_domain(self, company_urls):
+        """Worker task: crawl every company of one domain in turn."""
+        for company_url in company_urls:
+            try:
+                self.crawl_company(company_url)
+                self.export_company(company_url)
+                with self._stats_lock:
+                    self.completed += 1
+            except Exception as e:
+                logging.exception(f"Crawling {company_url} failed")
+                with _connect(self.state_path) as connection:
+                    connection.execute(
+                        "UPDATE companies SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                        "error = ? WHERE url = ?",
+                        (self.max_attempts, str(e), company_url)
+                    )
+                with self._stats_lock:
+                    self.failed += 1
+
+    def run(self, report_interval=30.0):
+        """
+        Crawl every pending company.
+
+        Returns:
+            dict: Counts of completed and failed companies and the throughput in companies per minute
+        """
+        with _connect(self.state_path) as connection:
+            # Finished companies whose output was not written before a crash
+            unexported = [row[0] for row in connection.execute(
+                "SELECT url FROM companies WHERE status = 'done' AND exported = 0")]
+            pending = connection.execute(
+                "SELECT url, domain FROM companies WHERE status = 'pending' ORDER BY rowid").fetchall()
+
+        for company_url in unexported:
+            self.export_company(company_url)
+
+        by_domain = {}
+        for url, domain in pending:
+            by_domain.setdefault(domain, []).append(url)
+
+        logging.info(f"Crawling {len(pending)} companies on {len(by_domain)} domains with {self.workers} workers")
+        start = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.crawl_domain, urls) for urls in by_domain.values()]
+            while wait(futures, timeout=report_interval).not_done:
+                self._report(len(pending), time.monotonic() - start)
+
+        elapsed = time.monotonic() - start
+        return self._report(len(pending), elapsed)
+
+    def _report(self, total, elapsed):
+        with self._stats_lock:
+            completed, failed = self.completed, self.failed
+        rate = completed / (elapsed / 60) if elapsed > 0 else 0.0
+        logging.info(f"{completed + failed}/{total} companies processed ({failed} failed), "
+                     f"{rate:.1f} companies/min")
+        return {'completed': completed, 'failed': failed, 'elapsed_s': elapsed, 'companies_per_minute': rate}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl case studies for a list of company URLs.")
+    parser.add_argument("companies", help="Text file with one company URL per line")
+    parser.add_argument("--output", default="case_studies.jsonl", help="JSONL file to append case studies to")
+    parser.add_argument("--state", default=None, help="SQLite checkpoint file (default: <data_dir>/batch_crawl.sqlite3)")
+    parser.add_argument("--workers", type=int, default=4, help="Number of domains crawled in parallel")
+    parser.add_argument("--num-case-studies", type=int, default=5, help="Case studies to extract per company")
+    parser.add_argument("--max-attempts", type=int, default=2, help="Attempts per company before giving up")
+    parser.add_argument("--refresh", action="store_true", help="Crawl companies finished in earlier runs again")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only fetch sitemaps and pages that changed since the last scan")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    state_path = args.state or data_path("batch_crawl.sqlite3")
+    init_state(state_path, read_company_urls(args.companies), refresh=args.refresh)
+
+    crawler = BatchCrawler(state_path, args.output, num_case_studies=args.num_case_studies,
+                           workers=args.workers, max_attempts=args.max_attempts, incremental=args.incremental)
+    summary = crawler.run()
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
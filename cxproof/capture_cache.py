@@ -0,0 +1,174 @@
+"""
+Cache of screenshot captures.
+
+A local SQLite index maps every captured URL to its latest capture: a fingerprint
+of the page's DOM, the content hashes of its sections and the finished result.
+If a URL is captured again within the TTL and its DOM fingerprint did not change,
+the previous result is returned as is.
+
+Otherwise every new section is fingerprinted with a content hash (SHA-256 of the
+file) and a perceptual hash (64-bit dHash). Only a section with a known content
+hash reuses the S3 object (and with it the cached AI results for that image)
+instead of being preprocessed, uploaded and analyzed again. The dHash does not
+notice small edits such as a changed price or product name, so a section that
+merely looks like one of the URL's previous capture is only reported as having
+an unchanged layout; it is analyzed again.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from cxproof.config import data_path, get_setting
+
+
+# Maximum Hamming distance between two dHashes of sections that look the same
+PERCEPTUAL_DISTANCE = 3
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+@contextmanager
+def _connect():
+    connection = sqlite3.connect(data_path('capture_cache.sqlite3'), timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS sections (
+            content_hash TEXT PRIMARY KEY,
+            phash INTEGER NOT NULL,
+            record TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    """)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS captures (
+            url TEXT PRIMARY KEY,
+            dom_hash TEXT,
+            section_hashes TEXT NOT NULL,
+            result TEXT NOT NULL,
+            captured_at REAL NOT NULL
+        )
+    """)
+    try:
+        yield connection
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def dom_fingerprint(soup):
+    """
+    Fingerprint of a parsed page: its visible text and image sources.
+
+    Scripts and styles are left out because they often carry per-request nonces.
+    The soup is modified.
+    """
+    for element in soup(['script', 'style', 'noscript', 'template']):
+        element.decompose()
+    text = _WHITESPACE.sub(' ', soup.get_text(' ')).strip()
+    images = " ".join(img.get('src', '') for img in soup.find_all('img'))
+    return hashlib.sha256(f"{text}\n{images}".encode()).hexdigest()
+
+
+def dhash(img, size=8):
+    """64-bit difference hash: compares neighbouring pixels of a tiny grayscale thumbnail."""
+    from PIL import Image
+
+    small = img.convert('L').resize((size + 1, size), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    # Stored in a signed SQLite INTEGER
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def hamming(a, b):
+    return bin((a ^ b) & ((1 << 64) - 1)).count('1')
+
+
+def section_fingerprint(path):
+    """
+    Content and perceptual hash of a section image.
+
+    Returns:
+        tuple: (content hash, dHash)
+    """
+    from PIL import Image
+
+    with open(path, 'rb') as f:
+        content_hash = hashlib.sha256(f.read()).hexdigest()
+    with Image.open(path) as img:
+        return content_hash, dhash(img)
+
+
+def find_section(content_hash):
+    """
+    Look up a previously uploaded section with exactly the same content, for any URL.
+
+    Returns:
+        dict: The stored section record (s3_url, detail, ocr...), or None
+    """
+    ttl = get_setting('capture_cache_ttl')
+    with _connect() as connection:
+        connection.execute("DELETE FROM sections WHERE created_at < ?", (time.time() - ttl,))
+        row = connection.execute("SELECT record FROM sections WHERE content_hash = ?", (content_hash,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def looks_unchanged(phash, url):
+    """
+    Whether a section looks like one of the previous capture of url (same layout).
+
+    Only for reporting: the content of such a section may still have changed.
+
+    Returns:
+        bool: True if a section of the previous capture is within PERCEPTUAL_DISTANCE
+    """
+    with _connect() as connection:
+        capture = connection.execute("SELECT section_hashes FROM captures WHERE url = ?", (url,)).fetchone()
+        if not capture:
+            return False
+        previous = json.loads(capture[0])
+        placeholders = ",".join("?" * len(previous))
+        rows = connection.execute(f"SELECT phash FROM sections WHERE content_hash IN ({placeholders})",
+                                  previous).fetchall()
+    return any(hamming(stored_phash, phash) <= PERCEPTUAL_DISTANCE for stored_phash, in rows)
+
+
+def store_section(content_hash, phash, record):
+    """Remember an uploaded section (record holds at least its s3_url)."""
+    with _connect() as connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO sections (content_hash, phash, record, created_at) VALUES (?, ?, ?, ?)",
+            (content_hash, phash, json.dumps(record), time.time())
+        )
+
+
+def get_capture(url, dom_hash):
+    """
+    Return the previous capture result of url if it is within the TTL and the DOM is unchanged.
+    """
+    if not dom_hash:
+        return None
+    with _connect() as connection:
+        row = connection.execute("SELECT dom_hash, result, captured_at FROM captures WHERE url = ?",
+                                 (url,)).fetchone()
+    if row and row[0] == dom_hash and time.time() - row[2] < get_setting('capture_cache_ttl'):
+        return json.loads(row[1])
+    return None
+
+
+def store_capture(url, dom_hash, section_hashes, result):
+    """Record the latest capture of url."""
+    with _connect() as connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO captures (url, dom_hash, section_hashes, result, captured_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (url, dom_hash, json.dumps(section_hashes), json.dumps(result), time.time())
+        )
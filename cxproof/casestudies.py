@@ -0,0 +1,824 @@
+"""
+Case study discovery and extraction.
+
+Finds case study URLs through a company's robots.txt and sitemaps, checks that the
+pages are in English and extracts their title and body. Used by the case study
+scraper app and the headless batch crawler.
+"""
+import gzip
+import itertools
+import re
+import time
+import random
+from urllib.parse import urljoin, urlparse
+
+from cxproof import corpus, crawl_state, fetch, ranking, tracing
+from cxproof.dedup import CaseStudyDeduplicator, is_listing_url
+from cxproof.frontier import Frontier
+from cxproof.text_normalization import clean_content, language_sample
+from cxproof.config import get_setting
+
+
+# Keywords that mark case study URLs
+CASE_STUDY_KEYWORDS = [
+    "customer-success-stories", "success-stories", "case-study", "case-studies",
+    "customers", "customer", "customer-success", "customer-stories", "client-stories",
+    "success-story", "customer-story"
+]
+
+
+class _NoStatus:
+    """Stand-in for a Streamlit placeholder when running headless."""
+
+    def write(self, *args, **kwargs):
+        pass
+
+
+def extract_case_study(url):
+    """
+    Extract the title and body content from a case study URL.
+
+    Args:
+        url (str): The URL of the case study to analyze
+
+    Returns:
+        dict: A dictionary containing the title, body and language of the case study; successful
+              extractions are also added to the local corpus (see corpus)
+              Example: {'title': 'Company X Success Story', 'body': 'Full text content...', 'language': 'English'}
+    """
+    from bs4 import BeautifulSoup
+
+    try:
+        # Create a session of the configured fetch backend (see fetch)
+        scraper = fetch.create_scraper()
+
+        # Add a small random delay to avoid being blocked
+        with tracing.span("case_study.delay"):
+            time.sleep(random.uniform(get_setting('case_study_delay_min'), get_setting('case_study_delay_max')))
+
+        with tracing.span("case_study.fetch", url=url) as span:
+            response = scraper.get(url, timeout=15)
+            span.set(status=response.status_code, bytes=len(response.content))
+
+        if response.status_code != 200:
+            return {'title': '', 'body': '', 'error': f"HTTP error {response.status_code}"}
+
+        with tracing.span("case_study.parse") as span:
+            # Parse HTML
+            soup = BeautifulSoup(response.content, 'html.parser')
+
+            # Extract domain for domain-specific parsing strategies
+            domain = urlparse(url).netloc
+
+            # Extract title - using multiple strategies to find the best match
+            title = extract_title(soup, domain)
+
+            # Extract body content - using multiple strategies to find the best match
+            body = extract_body(soup, domain)
+            span.set(chars=len(body))
+
+        if not title and not body:
+            return {'title': '', 'body': '', 'error': "No content extracted"}
+
+        case_study = {
+            'title': title,
+            'body': body,
+            'url': url,
+            'language': _case_study_language(response, soup, body)
+        }
+        corpus.store_case_study(case_study)
+        return case_study
+
+    except Exception as e:
+        return {'title': '', 'body': '', 'error': str(e)}
+
+
+def extract_title(soup, domain):
+    """
+    Extract the title of the case study using various strategies.
+
+    Args:
+        soup (BeautifulSoup): Parsed HTML
+        domain (str): Website domain for domain-specific strategies
+
+    Returns:
+        str: The extracted title
+    """
+    title = ""
+
+    # Strategy 1: Look for schema.org markup
+    schema_name = soup.find('meta', {'property': 'og:title'})
+    if schema_name and schema_name.get('content'):
+        title = schema_name.get('content').strip()
+        return title
+
+    # Strategy 2: Look for article headline schema
+    headline = soup.find('meta', {'property': 'article:title'})
+    if headline and headline.get('content'):
+        title = headline.get('content').strip()
+        return title
+
+    # Strategy 3: H1 tag is often the title
+    h1_tags = soup.find_all('h1')
+    if h1_tags:
+        # If multiple H1s, get the most prominent one (usually the first)
+        potential_titles = [h1.get_text().strip() for h1 in h1_tags if h1.get_text().strip()]
+        if potential_titles:
+            title = potential_titles[0]
+            return title
+
+    # Strategy 4: Look for common title class names
+    title_classes = ['title', 'article-title', 'entry-title', 'post-title', 'headline',
+                     'story-title', 'case-study-title', 'cs-title', 'customer-story-title',
+                     'success-story-title', 'page-title', 'main-title']
+
+    for cls in title_classes:
+        title_elem = soup.find(class_=re.compile(cls, re.I))
+        if title_elem:
+            title = title_elem.get_text().strip()
+            return title
+
+    # Strategy 5: Look for elements with ID that might be a title
+    title_ids = ['title', 'article-title', 'post-title', 'headline', 'page-title']
+    for id_value in title_ids:
+        title_elem = soup.find(id=re.compile(id_value, re.I))
+        if title_elem:
+            title = title_elem.get_text().strip()
+            return title
+
+    # Strategy 6: Fall back to page title if all else fails
+    if soup.title:
+        title = soup.title.get_text().strip()
+        # Try to clean up the title (often contains site name etc)
+        title = re.sub(r'\s*\|.*$', '', title)  # Remove pipe and everything after
+        title = re.sub(r'\s*-.*$', '', title)  # Remove dash and everything after
+        return title
+
+    return title
+
+
+def extract_body(soup, domain):
+    """
+    Extract the body content of the case study using various strategies.
+
+    Args:
+        soup (BeautifulSoup): Parsed HTML
+        domain (str): Website domain for domain-specific strategies
+
+    Returns:
+        str: The extracted body content
+    """
+    # First, remove elements that are unlikely to be part of the main content
+    for element in soup(['script', 'style', 'nav', 'header', 'footer', 'aside', 'form']):
+        element.extract()
+
+    body_content = ""
+
+    # Strategy 1: Look for schema.org markup for article body
+    article_body = soup.find('div', {'itemprop': 'articleBody'})
+    if article_body:
+        body_content = clean_content(article_body.get_text())
+        if len(body_content) > 200:  # Minimum size check
+            return body_content
+
+    # Strategy 2: Look for common content class names
+    content_classes = ['content', 'article-content', 'entry-content', 'post-content',
+                       'case-study-content', 'customer-story', 'success-story',
+                       'case-study-body', 'story-content', 'main-content', 'article-body',
+                       'story', 'customer-story-content', 'cs-content', 'post-body']
+
+    for cls in content_classes:
+        content_elem = soup.find(class_=re.compile(cls, re.I))
+        if content_elem:
+            content_text = clean_content(content_elem.get_text())
+            if len(content_text) > 200:  # Minimum size check
+                body_content = content_text
+                return body_content
+
+    # Strategy 3: Look for elements with ID that might be content
+    content_ids = ['content', 'article-content', 'post-content', 'main-content']
+    for id_value in content_ids:
+        content_elem = soup.find(id=re.compile(id_value, re.I))
+        if content_elem:
+            content_text = clean_content(content_elem.get_text())
+            if len(content_text) > 200:  # Minimum size check
+                body_content = content_text
+                return body_content
+
+    # Strategy 4: Look for article tag
+    article = soup.find('article')
+    if article:
+        content_text = clean_content(article.get_text())
+        if len(content_text) > 200:  # Minimum size check
+            body_content = content_text
+            return body_content
+
+    # Strategy 5: Look for main tag
+    main = soup.find('main')
+    if main:
+        content_text = clean_content(main.get_text())
+        if len(content_text) > 200:  # Minimum size check
+            body_content = content_text
+            return body_content
+
+    # Strategy 6: Look for largest text block (fallback)
+    paragraphs = soup.find_all('p')
+    if paragraphs:
+        # Get the parent that contains the most paragraphs
+        parents = {}
+        for p in paragraphs:
+            if p.parent:
+                parent_str = str(p.parent.name) + str(p.parent.get('class', '')) + str(p.parent.get('id', ''))
+                if parent_str in parents:
+                    parents[parent_str]['count'] += 1
+                    parents[parent_str]['parent'] = p.parent
+                else:
+                    parents[parent_str] = {'count': 1, 'parent': p.parent}
+
+        if parents:
+            # Find the parent with the most paragraphs
+            main_parent = max(parents.values(), key=lambda x: x['count'])
+            content_text = clean_content(main_parent['parent'].get_text())
+            if len(content_text) > 200:  # Minimum size check
+                body_content = content_text
+                return body_content
+
+    # Strategy 7: Just concatenate all paragraphs as a last resort
+    if not body_content:
+        all_paragraphs = [p.get_text().strip() for p in soup.find_all('p') if p.get_text().strip()]
+        if all_paragraphs:
+            body_content = "\n\n".join(all_paragraphs)
+            return body_content
+
+    return body_content
+
+
+def _case_study_language(response, soup, body):
+    """Language name of an extracted case study: from its headers or lang attribute, else detected in the body."""
+    import langdetect
+
+    declared = response.headers.get('Content-Language') or (soup.html.get('lang') if soup.html else None)
+    if declared:
+        return get_language_details(declared.split(',')[0].strip().split('-')[0].lower())['name']
+    try:
+        return get_language_details(langdetect.detect(language_sample(body)))['name']
+    except langdetect.lang_detect_exception.LangDetectException:
+        return None
+
+
+def detect_website_language(url):
+    import langdetect
+    from bs4 import BeautifulSoup
+
+    try:
+        scraper = fetch.create_scraper()
+
+        with tracing.span("language.fetch", url=url) as span:
+            response = scraper.get(url, timeout=15)
+            span.set(status=response.status_code, bytes=len(response.content))
+
+        if response.status_code != 200:
+            return {'code': 'unknown', 'name': 'Unknown', 'confidence': 0.0}
+
+        # Check HTTP headers for language info
+        content_language = response.headers.get('Content-Language')
+        if content_language:
+            # Extract the primary language if multiple are specified
+            primary_lang = content_language.split(',')[0].strip().split('-')[0].lower()
+            if primary_lang:
+                return get_language_details(primary_lang, confidence=0.9)
+
+        # Parse HTML
+        soup = BeautifulSoup(response.content, 'html.parser')
+
+        # Check HTML lang attribute
+        html_tag = soup.find('html')
+        if html_tag and html_tag.get('lang'):
+            html_lang = html_tag.get('lang').strip().split('-')[0].lower()
+            if html_lang:
+                return get_language_details(html_lang, confidence=0.85)
+
+        # Check meta tags
+        meta_lang = None
+        for meta in soup.find_all('meta'):
+            if meta.get('http-equiv', '').lower() == 'content-language' and meta.get('content'):
+                meta_lang = meta.get('content').strip().split('-')[0].lower()
+                if meta_lang:
+                    return get_language_details(meta_lang, confidence=0.8)
+
+        # Extract text content for language detection
+        # Remove script and style elements
+        for script in soup(['script', 'style', 'code', 'pre']):
+            script.extract()
+
+        # A sample of the visible text without URLs and punctuation (the first 2000 chars should be
+        # enough); the strings are read only up to there
+        sample_text = language_sample(soup.strings)
+
+        if not sample_text:
+            return {'code': 'unknown', 'name': 'Unknown', 'confidence': 0.0}
+
+        # Detect language
+        try:
+            # Get detailed language detection with probabilities
+            detection = langdetect.detect_langs(sample_text)
+
+            if detection:
+                primary_detection = detection[0]
+                lang_code = primary_detection.lang
+                confidence = primary_detection.prob
+
+                return get_language_details(lang_code, confidence)
+
+        except langdetect.lang_detect_exception.LangDetectException as e:
+            pass
+
+        return {'code': 'unknown', 'name': 'Unknown', 'confidence': 0.0}
+
+    except Exception as e:
+        return {'code': 'unknown', 'name': 'Unknown', 'confidence': 0.0}
+
+
+def get_language_details(lang_code, confidence=0.0):
+    """
+    Get full language name from language code.
+
+    Args:
+        lang_code (str): ISO 639-1 language code
+        confidence (float): Detection confidence
+
+    Returns:
+        dict: Language details including code, name and confidence
+    """
+    # Map of ISO 639-1 language codes to full names
+    language_map = {
+        'af': 'Afrikaans',
+        'ar': 'Arabic',
+        'bg': 'Bulgarian',
+        'bn': 'Bengali',
+        'ca': 'Catalan',
+        'cs': 'Czech',
+        'cy': 'Welsh',
+        'da': 'Danish',
+        'de': 'German',
+        'el': 'Greek',
+        'en': 'English',
+        'es': 'Spanish',
+        'et': 'Estonian',
+        'fa': 'Persian',
+        'fi': 'Finnish',
+        'fr': 'French',
+        'gu': 'Gujarati',
+        'he': 'Hebrew',
+        'hi': 'Hindi',
+        'hr': 'Croatian',
+        'hu': 'Hungarian',
+        'id': 'Indonesian',
+        'it': 'Italian',
+        'ja': 'Japanese',
+        'kn': 'Kannada',
+        'ko': 'Korean',
+        'lt': 'Lithuanian',
+        'lv': 'Latvian',
+        'mk': 'Macedonian',
+        'ml': 'Malayalam',
+        'mr': 'Marathi',
+        'ne': 'Nepali',
+        'nl': 'Dutch',
+        'no': 'Norwegian',
+        'pa': 'Punjabi',
+        'pl': 'Polish',
+        'pt': 'Portuguese',
+        'ro': 'Romanian',
+        'ru': 'Russian',
+        'sk': 'Slovak',
+        'sl': 'Slovenian',
+        'so': 'Somali',
+        'sq': 'Albanian',
+        'sv': 'Swedish',
+        'sw': 'Swahili',
+        'ta': 'Tamil',
+        'te': 'Telugu',
+        'th': 'Thai',
+        'tl': 'Tagalog',
+        'tr': 'Turkish',
+        'uk': 'Ukrainian',
+        'ur': 'Urdu',
+        'vi': 'Vietnamese',
+        'zh-cn': 'Chinese (Simplified)',
+        'zh-tw': 'Chinese (Traditional)',
+        'zh': 'Chinese'
+    }
+
+    language_name = language_map.get(lang_code.lower(), 'Unknown')
+
+    return {
+        'code': lang_code.lower(),
+        'name': language_name,
+        'confidence': confidence
+    }
+
+
+def get_case_study_urls(base_url, keywords, max_results, status_placeholder=None, incremental=False,
+                        skip_listings=False):
+    """
+    Find the URLs matching the keywords in the sitemaps and yield the ones in English.
+    Stops after yielding max_results VALID URLs.
+
+    With the rank_candidates setting, all candidates are read from the sitemaps first and
+    checked in the order of their relevance score (see ranking); otherwise in sitemap order,
+    as they are found.
+
+    Args:
+        base_url: The website base URL
+        keywords: List of keywords to match in URLs
+        max_results: Maximum number of VALID URLs to yield
+        status_placeholder: Streamlit placeholder for status updates (None when running headless)
+        incremental: Skip sitemaps and language checks of pages unchanged since the last scan
+        skip_listings: Leave out case study listing pages (see dedup.is_listing_url) before their
+                       language is checked, so they are never fetched
+
+    Yields:
+        Valid matching URLs as they are found, up to max_results
+    """
+
+    if status_placeholder is None:
+        status_placeholder = _NoStatus()
+
+    scraper = fetch.create_scraper()
+
+    # Get potential sitemap URLs
+    sitemap_urls = []
+
+    # First try to find sitemaps from robots.txt
+    try:
+        robots_url = urljoin(base_url, '/robots.txt')
+        status_placeholder.write("Checking robots.txt...")
+        with tracing.span("robots.fetch", url=robots_url) as span:
+            response = scraper.get(robots_url, timeout=10)
+            span.set(status=response.status_code, bytes=len(response.content))
+        if response.status_code == 200:
+            robots_text = response.text
+            status_placeholder.write("Successfully retrieved robots.txt")
+
+            # Look for sitemap entries in robots.txt
+            sitemap_urls = re.findall(r'(?i)sitemap:\s*(https?://[^\s]+)', robots_text)
+            status_placeholder.write(f"Found {len(sitemap_urls)} sitemaps in robots.txt")
+    except Exception as e:
+        status_placeholder.write(f"Error fetching robots.txt: {str(e)}")
+
+    # If no sitemaps found in robots.txt, try common locations
+    if not sitemap_urls:
+        sitemap_urls = [
+            urljoin(base_url, '/sitemap.xml'),
+            urljoin(base_url, '/sitemap_index.xml'),
+            urljoin(base_url, '/sitemap-index.xml')
+        ]
+        status_placeholder.write(f"Using default sitemap locations")
+
+    candidates = _candidate_urls(scraper, sitemap_urls, keywords, max_results, status_placeholder, incremental)
+    if get_setting('rank_candidates'):
+        # Score all candidates from their sitemap entries first, and check the best ones first
+        with tracing.span("candidates.rank") as span:
+            candidates = list(itertools.islice(candidates, get_setting('ranking_max_candidates')))
+            ranked = ranking.rank_candidates(candidates, keywords)
+            span.set(candidates=len(ranked))
+        status_placeholder.write(f"Ranked {len(ranked)} candidate URLs")
+        ordered = (url for _, url in ranked)
+    else:
+        ordered = (url for url, _, _ in candidates)
+
+    # Keep track of how many VALID URLs we've yielded
+    valid_url_count = 0
+    for url in ordered:
+        if skip_listings and is_listing_url(url, keywords):
+            status_placeholder.write(f"Skipping case study listing page: {url}")
+            continue
+
+        status_placeholder.write(f"Checking if URL is in English: {url}")
+        if check_url_is_english(url, incremental):
+            yield url
+            valid_url_count += 1
+            status_placeholder.write(f"Found case study {valid_url_count}/{max_results}: {url}")
+
+            # Stop if we've reached the maximum number of VALID results
+            if valid_url_count >= max_results:
+                status_placeholder.write(f"Found {valid_url_count} case studies - completed search")
+                break
+        else:
+            status_placeholder.write(f"Skipping non-English page: {url}")
+
+
+def _candidate_urls(scraper, sitemap_urls, keywords, max_results, status_placeholder, incremental):
+    """Yield (url, lastmod, priority) of the URLs matching the keywords in all sitemaps, each page once."""
+    # Sitemaps and pages seen in this scan; the same page is often listed in several sitemaps
+    frontier = Frontier()
+
+    # Process one sitemap at a time
+    for sitemap_url in sitemap_urls:
+        status_placeholder.write(f"Processing sitemap: {sitemap_url}")
+
+        # Process the main sitemap and yield results
+        for url, lastmod, priority in process_sitemap_and_yield_urls(
+                scraper, sitemap_url, keywords, frontier,
+                yield_matches=True, max_results=max_results,
+                status_placeholder=status_placeholder, incremental=incremental, with_metadata=True
+        ):
+            # Skip pages already found through another sitemap before fetching them again
+            if not frontier.first_visit(url):
+                status_placeholder.write(f"Skipping duplicate URL: {url}")
+                continue
+            yield url, lastmod, priority
+
+
+def collect_case_studies(base_url, keywords, num_case_studies, status_placeholder=None, incremental=False,
+                         extract=None, max_candidates=None):
+    """
+    Find and extract case studies until num_case_studies distinct ones are found.
+
+    Listing pages are skipped without fetching them, and extracted case studies
+    that tell the same story as one found before (see dedup) are set aside, so
+    candidates keep being fetched until enough distinct case studies are found or
+    max_candidates pages were extracted.
+
+    Args:
+        base_url: The website base URL
+        keywords: List of keywords to match in URLs
+        num_case_studies: Number of distinct case studies to find
+        status_placeholder: Streamlit placeholder for status updates (None when running headless)
+        incremental: Skip sitemaps and language checks of pages unchanged since the last scan
+        extract: extract(url) -> case study dict; defaults to extract_case_study
+        max_candidates: Pages extracted at most; defaults to the case_study_max_candidates setting
+
+    Yields:
+        tuple: (case_study, duplicate_of) for every extracted page; duplicate_of is None for a
+               distinct case study, else the URL of the case study it duplicates
+    """
+    if status_placeholder is None:
+        status_placeholder = _NoStatus()
+    extract = extract or extract_case_study
+    max_candidates = max(num_case_studies, max_candidates or get_setting('case_study_max_candidates'))
+
+    deduplicator = CaseStudyDeduplicator()
+    distinct = 0
+    for url in get_case_study_urls(base_url, keywords, max_candidates, status_placeholder, incremental=incremental,
+                                   skip_listings=True):
+        status_placeholder.write(f"Extracting content from: {url}")
+        case_study = dict(extract(url), url=url)
+        if case_study.get('error'):
+            yield case_study, None
+            continue
+
+        with tracing.span("case_study.dedup") as span:
+            duplicate_of = deduplicator.check(case_study)
+            span.set(duplicate=duplicate_of is not None)
+        if duplicate_of:
+            status_placeholder.write(f"Skipping {url}: same case study as {duplicate_of}")
+        else:
+            distinct += 1
+        yield case_study, duplicate_of
+
+        if distinct >= num_case_studies:
+            break
+
+
+def process_sitemap_and_yield_urls(scraper, sitemap_url, keywords, processed_sitemaps,
+                                   yield_matches=True, max_results=5, current_valid_count=0,
+                                   status_placeholder=None, incremental=False, lastmod=None, with_metadata=False):
+    """
+    Process a single sitemap and yield matching URLs as they're found.
+
+    Args:
+        scraper: The fetch session (see fetch.create_scraper)
+        sitemap_url: URL of the sitemap to process
+        keywords: List of keywords to match
+        processed_sitemaps: Set (or Frontier) of already processed sitemap URLs
+        yield_matches: Whether to yield matches (True) or collect and return them (False)
+        max_results: Maximum number of VALID URLs to process
+        current_valid_count: Current count of VALID URLs found
+        status_placeholder: Streamlit placeholder for status updates
+        incremental: Reuse the result of the last scan if the sitemap did not change (see crawl_state)
+        lastmod: <lastmod> of this sitemap in its parent sitemap index, if any
+        with_metadata: Yield (url, lastmod, priority) tuples with the sitemap entry of each URL
+
+    Yields:
+        Matching URLs as they are found (if yield_matches=True)
+    Returns:
+        List of matching URLs (if yield_matches=False)
+    """
+    if sitemap_url in processed_sitemaps:
+        if yield_matches:
+            return []  # Return empty iterable instead of None
+        else:
+            return []
+
+    processed_sitemaps.add(sitemap_url)
+    matching_urls = [] if not yield_matches else None
+    record = crawl_state.get_sitemap(sitemap_url) if incremental else None
+
+    try:
+        if record and lastmod and record['lastmod'] == lastmod:
+            # The parent index lists this sitemap as unchanged since the last scan: no need to fetch it
+            children, matches = record['children'], record['matches']
+            crawl_state.touch_sitemap(sitemap_url)
+            if status_placeholder:
+                status_placeholder.write(f"Sitemap unchanged since the last scan: {sitemap_url}")
+        else:
+            parsed = _fetch_sitemap(scraper, sitemap_url, keywords, record, status_placeholder)
+            if parsed is None:
+                return [] if not yield_matches else None
+            children, matches, response = parsed
+            if response.status_code == 304:
+                crawl_state.touch_sitemap(sitemap_url, lastmod)
+            elif incremental:
+                crawl_state.store_sitemap(sitemap_url, response.headers, lastmod, children, matches)
+
+        if children:
+            # This is a sitemap index, process each sitemap
+            if status_placeholder:
+                status_placeholder.write(f"Found sitemap index with {len(children)} child sitemaps")
+            for child_sitemap_url, child_lastmod in children:
+                if status_placeholder:
+                    status_placeholder.write(f"Processing child sitemap: {child_sitemap_url}")
+
+                # Recursively process child sitemap
+                if yield_matches:
+                    for url in process_sitemap_and_yield_urls(
+                            scraper, child_sitemap_url, keywords, processed_sitemaps,
+                            yield_matches=True, max_results=max_results,
+                            current_valid_count=current_valid_count,
+                            status_placeholder=status_placeholder,
+                            incremental=incremental, lastmod=child_lastmod, with_metadata=with_metadata
+                    ):
+                        # Just yield potential matches - validation is done in main function
+                        yield url
+                else:
+                    child_urls = process_sitemap_and_yield_urls(
+                        scraper, child_sitemap_url, keywords, processed_sitemaps,
+                        yield_matches=False, max_results=max_results,
+                        current_valid_count=current_valid_count,
+                        status_placeholder=status_placeholder,
+                        incremental=incremental, lastmod=child_lastmod
+                    )
+
+                    # No need to filter here - we'll collect all potential matches
+                    # and let the caller validate
+                    matching_urls.extend(child_urls)
+        else:
+            # This is a regular sitemap, go through its matching URLs
+            for url, url_lastmod, priority in matches:
+                if status_placeholder:
+                    status_placeholder.write(f"Found matching URL: {url}")
+                if yield_matches:
+                    # Just yield potential matches - validation is done in main function
+                    yield (url, url_lastmod, priority) if with_metadata else url
+                else:
+                    # For non-yielding case, collect all potential matches
+                    matching_urls.append(url)
+
+    except Exception as e:
+        if status_placeholder:
+            status_placeholder.write(f"Error processing sitemap {sitemap_url}: {str(e)}")
+
+    if not yield_matches:
+        if status_placeholder:
+            status_placeholder.write(f"Found {len(matching_urls)} potentially matching URLs in sitemap: {sitemap_url}")
+        return matching_urls
+
+
+def _fetch_sitemap(scraper, sitemap_url, keywords, record, status_placeholder):
+    """
+    Download and parse a sitemap, conditionally if there is a record of the last scan.
+
+    Returns:
+        tuple: (children, matches, response) with the (url, lastmod) of the child sitemaps (for an
+               index) and the (url, lastmod, priority) of the URLs matching the keywords; the record's lists if the
+               server answered 304. None if the sitemap could not be fetched or is not XML.
+    """
+    from lxml import etree
+
+    with tracing.span("sitemap.fetch", url=sitemap_url) as span:
+        response = scraper.get(sitemap_url, timeout=10, headers=crawl_state.conditional_headers(record))
+        span.set(status=response.status_code, bytes=len(response.content), cache_hit=response.status_code == 304)
+
+    if response.status_code == 304 and record:
+        if status_placeholder:
+            status_placeholder.write(f"Sitemap not modified since the last scan: {sitemap_url}")
+        return record['children'], record['matches'], response
+
+    if response.status_code != 200:
+        if status_placeholder:
+            status_placeholder.write(f"Failed to fetch sitemap: {sitemap_url}, Status: {response.status_code}")
+        return None
+
+    # Check if it's XML content (gzipped sitemaps such as sitemap.xml.gz are unpacked first)
+    content = response.content
+    content_type = response.headers.get('Content-Type', '')
+    if content[:2] == b'\x1f\x8b':
+        content = gzip.decompress(content)
+    elif 'xml' not in content_type.lower() and not sitemap_url.endswith('.xml'):
+        if status_placeholder:
+            status_placeholder.write(f"Not an XML sitemap: {sitemap_url}")
+        return None
+
+    # Parse XML content; lxml directly instead of BeautifulSoup, which is about 15 times slower on
+    # large sitemaps, and all of them are read before the candidates are ranked
+    with tracing.span("sitemap.parse", url=sitemap_url, bytes=len(content)) as span:
+        parser = etree.XMLParser(recover=True, huge_tree=True, resolve_entities=False, no_network=True)
+        try:
+            root = etree.fromstring(content, parser)
+        except etree.XMLSyntaxError:
+            root = None
+        if root is None:
+            if status_placeholder:
+                status_placeholder.write(f"Not an XML sitemap: {sitemap_url}")
+            return None
+
+        # Check if it's a sitemap index ({*} matches any namespace, or none)
+        children = []
+        for sitemap_tag in root.iter('{*}sitemap'):
+            loc = _tag_text(sitemap_tag.find('{*}loc'))
+            if loc:
+                children.append((loc, _tag_text(sitemap_tag.find('{*}lastmod'))))
+
+        # Otherwise it's a regular sitemap, check each URL against keywords
+        matches = []
+        url_count = 0
+        if not children:
+            for url_tag in root.iter('{*}url'):
+                url_count += 1
+                url = _tag_text(url_tag.find('{*}loc'))
+                if url and is_matching_url(url, keywords):
+                    matches.append((url, _tag_text(url_tag.find('{*}lastmod')),
+                                    _tag_text(url_tag.find('{*}priority'))))
+        span.set(sitemaps=len(children), urls=url_count, matches=len(matches))
+
+    if status_placeholder and not children:
+        status_placeholder.write(f"Processing regular sitemap with {url_count} URLs")
+    return children, matches, response
+
+
+def _tag_text(tag):
+    return tag.text.strip() if tag is not None and tag.text else None
+
+
+def is_matching_url(url, keywords):
+    """
+    Check if a URL strictly matches case study patterns.
+    Now checks for both:
+    1. companyurl.com/keyword/something
+    2. companyurl.com/something/case-study-details (only for specific case study indicators)
+    """
+    url_lower = url.lower()
+    min_segment_length = 5
+
+    # Split keywords into strong indicators vs generic terms
+    strong_indicators = ["case-study", "case-studies", "success-story", "success-stories",
+                         "customer-success-stories", "customer-story", "customer-stories","success"]
+    generic_terms = [k for k in keywords if k not in strong_indicators]
+
+    # PART 1: Original pattern check - apply to ALL keywords but with strict validation
+    for keyword in keywords:
+        keyword_lower = keyword.lower()
+        pattern = f"/{keyword_lower}/"
+
+        # Keep your original pattern check with all its validation logic
+        if pattern in url_lower:
+            # [Your existing validation logic here]
+            # ...
+            return True
+
+    # PART 2: Hyphenated pattern check - ONLY apply to strong indicators
+    for indicator in strong_indicators:
+        indicator_lower = indicator.lower()
+
+        # Check for indicator in hyphenated form
+        if f"/{indicator_lower}-" in url_lower or f"-{indicator_lower}-" in url_lower:
+            # For strong indicators, we can be more permissive
+            return True
+
+    # PART 3: Special case for URL paths that directly end with case study indicators
+    for indicator in strong_indicators:
+        indicator_lower = indicator.lower()
+        if f"/{indicator_lower}" == url_lower[-len(indicator_lower) - 1:]:
+            # URL path ends with /case-study or similar
+            return True
+
+    # No valid match found
+    return False
+
+def check_url_is_english(url, incremental=False):
+    with tracing.span("language.check", url=url) as span:
+        # In incremental scans the verdict of the last check is reused while the page is unchanged
+        language = crawl_state.known_language(url) if incremental else None
+        span.set(cache_hit=language is not None)
+        if language is None:
+            result = detect_website_language(url)
+            language = result['name']
+            if incremental and result['code'] != 'unknown':
+                crawl_state.store_language(url, language)
+        span.set(language=language)
+    if language == "English":
+        return True
+    else:
+        return False
@@ -0,0 +1,125 @@
+"""
+Runtime settings shared by the apps.
+
+Every setting can be overridden in the [cxproof] section of .streamlit/secrets.toml
+or with a CXPROOF_<NAME> environment variable (the environment wins).
+"""
+import os
+
+import streamlit as st
+
+
+DEFAULTS = {
+    # Directory for local state (caches, indexes); relative to the working directory
+    'data_dir': '.cxproof',
+    # OpenAI client: timeouts in seconds
+    'openai_timeout': 120.0,
+    'openai_connect_timeout': 10.0,
+    # Connection pool shared by all calls of a process
+    'openai_max_connections': 20,
+    'openai_max_keepalive_connections': 10,
+    'openai_keepalive_expiry': 300.0,
+    # Retries of rate limited / transient failures, with exponential backoff
+    'openai_max_retries': 5,
+    'openai_backoff_base': 1.0,
+    'openai_backoff_max': 30.0,
+    # Random pause in seconds before fetching each case study page, to avoid being blocked
+    'case_study_delay_min': 1.0,
+    'case_study_delay_max': 3.0,
+    # Case study candidates extracted at most per search while looking for distinct ones, and the
+    # share of word shingles two bodies have in common from which they count as the same story
+    'case_study_max_candidates': 40,
+    'near_duplicate_similarity': 0.5,
+    # Keep every extracted case study in the local full-text corpus (<data_dir>/corpus.sqlite3)
+    'corpus_enabled': True,
+    # Order candidate case study URLs by a relevance score from their sitemap entries before fetching
+    # them (see ranking), reading at most this many candidates; off checks them in sitemap order
+    'rank_candidates': True,
+    'ranking_max_candidates': 5000,
+    # Incremental scans: seconds a page language verdict is reused for pages without <lastmod>
+    'crawl_state_ttl': 30 * 24 * 3600.0,
+    # Visited-set of one scan: pages before its Bloom filter grows, and its false positive rate
+    'frontier_capacity': 1000000,
+    'frontier_error_rate': 0.001,
+    # Page fetching (see fetch): "cloudscraper" (a session per call, passes Cloudflare challenges) or
+    # "httpx" (one HTTP/2 connection pool per process, brotli/gzip responses, cached DNS); the httpx
+    # pool's limits, timeouts in seconds for fetches that set none, and the DNS cache lifetime in seconds
+    'fetch_backend': 'cloudscraper',
+    'fetch_max_connections': 50,
+    'fetch_keepalive_expiry': 60.0,
+    'fetch_timeout': 30.0,
+    'fetch_connect_timeout': 10.0,
+    'dns_cache_ttl': 300.0,
+    # Screenshot capture: "screenshotone" (API) or "selenium" (local headless Chrome pool)
+    'screenshot_backend': 'screenshotone',
+    'screenshot_timeout': 30.0,
+    'screenshot_width': 1280,
+    'selenium_pool_size': 2,
+    # Splitting of full-page screenshots: target tile height and maximum number of tiles
+    'screenshot_tile_height': 1080,
+    'screenshot_max_tiles': 16,
+    # Temporary files: directory for per-request scratch spaces (empty for the system
+    # temp directory, e.g. /dev/shm for tmpfs) and the size limit of one scratch space
+    'scratch_root': '',
+    'scratch_quota_mb': 512.0,
+    # Reuse of earlier captures of unchanged pages and sections, in seconds
+    'capture_cache_ttl': 24 * 3600.0,
+    # Background scrapes in the apps: threads shared by all sessions, seconds between progress refreshes
+    'background_workers': 4,
+    'background_poll_interval': 1.0,
+    # Local HTTP job API (python -m cxproof.job_api): bind address, jobs run at once,
+    # finished jobs kept in memory and an optional bearer token
+    'job_api_host': '127.0.0.1',
+    'job_api_port': 8765,
+    'job_api_workers': 4,
+    'job_api_max_jobs': 1000,
+    'job_api_token': '',
+    # Tracing of the scraper stages: append finished runs to <data_dir>/traces.jsonl,
+    # serve Prometheus metrics on a port (0 disables), show the debug panel by default
+    'tracing_json_log': False,
+    'tracing_prometheus_host': '127.0.0.1',
+    'tracing_prometheus_port': 0,
+    'debug_panel': False,
+    # Local LLM response cache
+    'llm_cache_enabled': True,
+    'llm_cache_ttl': 7 * 24 * 3600.0,
+    'llm_cache_max_entries': 5000,
+    'llm_cache_semantic': False,
+    'llm_cache_semantic_threshold': 0.97,
+}
+
+
+def get_setting(name):
+    """
+    Look up a setting, converted to the type of its default.
+
+    Args:
+        name (str): Setting name, one of DEFAULTS
+
+    Returns:
+        The configured value, or the default
+    """
+    default = DEFAULTS[name]
+
+    value = os.environ.get(f"CXPROOF_{name.upper()}")
+    if value is None:
+        try:
+            value = st.secrets["cxproof"][name] if "cxproof" in st.secrets else None
+        except Exception:
+            # No secrets file (e.g. headless runs) or no such key
+            value = None
+
+    if value is None:
+        return default
+    if isinstance(value, type(default)):
+        return value
+    if isinstance(default, bool):
+        return str(value).lower() in ("1", "true", "yes", "on")
+    return type(default)(value)
+
+
+def data_path(*parts):
+    """Path inside the local data directory, creating the directory if needed."""
+    directory = get_setting('data_dir')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, *parts)
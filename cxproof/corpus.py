@@ -0,0 +1,342 @@
+"""
+Local full-text corpus of extracted case studies.
+
+Every case study extract_case_study() returns is kept in a SQLite database with
+an FTS5 index over its title and body, so questions across companies ("which
+customers mention Snowflake?") are answered from disk in milliseconds instead
+of by scraping again:
+
+    corpus.search('snowflake NOT "data lake"', company="example.com")
+
+Queries use the FTS5 syntax (AND/OR/NOT, "phrases", prefix*); results are
+ranked by BM25 with the title weighted above the body, and come with a snippet
+of the best matching part of the body. A page extracted again replaces its
+earlier version.
+
+The company metadata and the screenshot (vision) analyses of the other apps are
+kept here too, so all scraped data can be exported from one place (see export).
+Every stored row gets a write sequence number (seq) inside its write transaction,
+so the numbers follow the order in which writes are committed; incremental exports
+continue from the last number they saw.
+"""
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from cxproof.config import data_path, get_setting
+from cxproof.crawl_state import url_domain
+
+
+# BM25 weights of the indexed columns (title, body)
+TITLE_WEIGHT = 5.0
+BODY_WEIGHT = 1.0
+
+SNIPPET_TOKENS = 24
+
+
+@contextmanager
+def _connect():
+    connection = sqlite3.connect(data_path('corpus.sqlite3'), timeout=30)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS case_studies (
+            id INTEGER PRIMARY KEY,
+            url TEXT NOT NULL UNIQUE,
+            company TEXT NOT NULL,
+            title TEXT NOT NULL,
+            body TEXT NOT NULL,
+            language TEXT,
+            extracted_at REAL NOT NULL,
+            seq INTEGER
+        )
+    """)
+    # External content index: the text is stored once, in case_studies, and kept in sync by triggers
+    connection.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS case_studies_fts USING fts5 (
+            title, body, content='case_studies', content_rowid='id', tokenize='porter unicode61'
+        )
+    """)
+    connection.execute("""
+        CREATE TRIGGER IF NOT EXISTS case_studies_insert AFTER INSERT ON case_studies BEGIN
+            INSERT INTO case_studies_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+        END
+    """)
+    connection.execute("""
+        CREATE TRIGGER IF NOT EXISTS case_studies_delete AFTER DELETE ON case_studies BEGIN
+            INSERT INTO case_studies_fts (case_studies_fts, rowid, title, body)
+            VALUES ('delete', old.id, old.title, old.body);
+        END
+    """)
+    connection.execute("""
+        CREATE TRIGGER IF NOT EXISTS case_studies_update AFTER UPDATE ON case_studies BEGIN
+            INSERT INTO case_studies_fts (case_studies_fts, rowid, title, body)
+            VALUES ('delete', old.id, old.title, old.body);
+            INSERT INTO case_studies_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+        END
+    """)
+    connection.execute("CREATE INDEX IF NOT EXISTS case_studies_company ON case_studies (company)")
+    connection.execute("CREATE INDEX IF NOT EXISTS case_studies_extracted_at ON case_studies (extracted_at)")
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS company_metadata (
+            url TEXT PRIMARY KEY,
+            company TEXT NOT NULL,
+            title TEXT,
+            meta_content TEXT,
+            linkedin_about TEXT,
+            extracted_at REAL NOT NULL,
+            seq INTEGER
+        )
+    """)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS vision_results (
+            url TEXT NOT NULL,
+            section INTEGER NOT NULL,
+            image_url TEXT,
+            route TEXT,
+            result TEXT,
+            text TEXT,
+            error TEXT,
+            model TEXT,
+            analyzed_at REAL NOT NULL,
+            seq INTEGER,
+            PRIMARY KEY (url, section)
+        )
+    """)
+    connection.execute("CREATE INDEX IF NOT EXISTS company_metadata_extracted_at ON company_metadata (extracted_at)")
+    connection.execute("CREATE INDEX IF NOT EXISTS vision_results_analyzed_at ON vision_results (analyzed_at)")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS write_sequence (id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER NOT NULL)"
+    )
+    if connection.execute("SELECT 1 FROM write_sequence").fetchone() is None:
+        connection.execute("INSERT OR IGNORE INTO write_sequence (id, value) VALUES (0, 0)")
+        connection.commit()
+    _add_sequence_columns(connection)
+    try:
+        yield connection
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _add_sequence_columns(connection):
+    """Give the tables of a corpus created before write sequence numbers a seq column, numbered in time order."""
+    def has_seq(table):
+        return any(row['name'] == 'seq' for row in connection.execute(f"PRAGMA table_info({table})"))
+
+    for table, (_, time_column) in DATASETS.items():
+        if not has_seq(table):
+            connection.execute("BEGIN IMMEDIATE")
+            # Checked again under the write lock, as another process may have added it meanwhile
+            if not has_seq(table):
+                connection.execute(f"ALTER TABLE {table} ADD COLUMN seq INTEGER")
+                connection.execute(
+                    f"UPDATE {table} SET seq = numbered.n + (SELECT value FROM write_sequence) FROM "
+                    f"(SELECT rowid AS id, ROW_NUMBER() OVER (ORDER BY {time_column}) AS n FROM {table}) "
+                    f"AS numbered WHERE {table}.rowid = numbered.id"
+                )
+                connection.execute(f"UPDATE write_sequence SET value = value + (SELECT COUNT(*) FROM {table})")
+            connection.commit()
+        connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_seq ON {table} (seq)")
+
+
+def _next_sequence(connection):
+    """
+    Take the next write sequence number.
+
+    Must be the first statement of the write transaction: it takes the database's
+    write lock, which is held until the commit, so numbers follow the commit order.
+    """
+    return connection.execute("UPDATE write_sequence SET value = value + 1 RETURNING value").fetchone()[0]
+
+
+def _company(company):
+    """Company key of a domain or URL: the host without the www. prefix."""
+    return url_domain(company if "://" in company else f"//{company}")
+
+
+def store_case_study(case_study, company=None):
+    """
+    Add an extracted case study to the corpus, replacing an earlier version of the page.
+
+    Failures are logged and do not fail the extraction; nothing is stored when the
+    corpus_enabled setting is off or the case study has an error.
+
+    Args:
+        case_study (dict): Extracted case study with 'url', 'title', 'body' and optionally 'language'
+        company (str): Company the case study belongs to; defaults to the domain of the URL
+    """
+    if not get_setting('corpus_enabled') or case_study.get('error') or not case_study.get('url'):
+        return
+    url = case_study['url']
+    try:
+        with _connect() as connection:
+            seq = _next_sequence(connection)
+            connection.execute(
+                "INSERT INTO case_studies (url, company, title, body, language, extracted_at, seq) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET company = excluded.company, title = excluded.title, "
+                "body = excluded.body, language = excluded.language, extracted_at = excluded.extracted_at, "
+                "seq = excluded.seq",
+                (url, _company(company or url), case_study.get('title') or '', case_study.get('body') or '',
+                 case_study.get('language'), time.time(), seq)
+            )
+    except sqlite3.Error:
+        logging.exception(f"Could not store case study {url} in the corpus")
+
+
+def store_company_metadata(url, title, meta_content, linkedin_about):
+    """Keep the company data extracted from a homepage, replacing an earlier extraction."""
+    if not get_setting('corpus_enabled'):
+        return
+    try:
+        with _connect() as connection:
+            seq = _next_sequence(connection)
+            connection.execute(
+                "INSERT OR REPLACE INTO company_metadata (url, company, title, meta_content, linkedin_about, "
+                "extracted_at, seq) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, _company(url), title, meta_content, linkedin_about, time.time(), seq)
+            )
+    except sqlite3.Error:
+        logging.exception(f"Could not store the company data of {url} in the corpus")
+
+
+def store_vision_results(url, section_results, model):
+    """
+    Keep the per-section results of a screenshot analysis, replacing an earlier analysis of the page.
+
+    Args:
+        url (str): Analyzed page
+        section_results (list): Section result dicts (see vision.SectionResult.to_dict)
+        model (str): Model that analyzed the sections
+    """
+    if not get_setting('corpus_enabled'):
+        return
+    now = time.time()
+    try:
+        with _connect() as connection:
+            seq = _next_sequence(connection)
+            connection.execute("DELETE FROM vision_results WHERE url = ?", (url,))
+            connection.executemany(
+                "INSERT INTO vision_results (url, section, image_url, route, result, text, error, model, analyzed_at, "
+                "seq) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(url, section['section'], section.get('image_url'), section.get('route'), section.get('result'),
+                  section.get('text'), section.get('error'), model, now, seq) for section in section_results]
+            )
+    except sqlite3.Error:
+        logging.exception(f"Could not store the screenshot analysis of {url} in the corpus")
+
+
+# Stored rows per dataset (with their write sequence number), and the column with their storage time
+DATASETS = {
+    'case_studies': ("SELECT url, company, title, body, language, extracted_at, seq FROM case_studies",
+                     'extracted_at'),
+    'company_metadata': ("SELECT url, company, title, meta_content, linkedin_about, extracted_at, seq "
+                         "FROM company_metadata", 'extracted_at'),
+    'vision_results': ("SELECT url, section, image_url, route, result, text, error, model, analyzed_at, seq "
+                       "FROM vision_results", 'analyzed_at'),
+}
+
+
+def iter_rows(dataset, since=None):
+    """
+    Stream the stored rows of a dataset in write order, without loading them all.
+
+    Args:
+        dataset (str): One of DATASETS
+        since (int): Only rows written after the row with this write sequence number
+
+    Yields:
+        dict: One row
+    """
+    select = DATASETS[dataset][0]
+    with _connect() as connection:
+        cursor = connection.execute(f"{select} WHERE seq > ? ORDER BY seq", (since or 0,))
+        for row in cursor:
+            yield dict(row)
+
+
+def sequence_at(dataset, until):
+    """Write sequence number of the last row of a dataset stored at or before a Unix time (0 if none)."""
+    time_column = DATASETS[dataset][1]
+    with _connect() as connection:
+        row = connection.execute(f"SELECT MAX(seq) FROM {dataset} WHERE {time_column} <= ?", (until,)).fetchone()
+    return row[0] or 0
+
+
+def _quoted(query):
+    """The query with every word quoted, for input that is not valid FTS5 syntax (e.g. "C++" or "ACME-corp")."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+
+def search(query, company=None, language=None, limit=20, highlight=("**", "**")):
+    """
+    Search the corpus.
+
+    Args:
+        query (str): FTS5 query; input that is not valid syntax is searched as plain words
+        company (str): Only case studies of this company (domain)
+        language (str): Only case studies in this language (e.g. "English")
+        limit (int): Maximum number of results
+        highlight (tuple): Markers placed around the matching words in the snippets
+
+    Returns:
+        list: Dicts with 'url', 'company', 'title', 'language', 'extracted_at', 'snippet' and 'score'
+              (BM25, lower is better), best match first
+    """
+    filters = ""
+    params = []
+    if company:
+        filters += " AND case_studies.company = ?"
+        params.append(_company(company))
+    if language:
+        filters += " AND case_studies.language = ?"
+        params.append(language)
+
+    sql = (
+        "SELECT case_studies.url, case_studies.company, case_studies.title, case_studies.language, "
+        "case_studies.extracted_at, "
+        f"snippet(case_studies_fts, 1, ?, ?, ' … ', {SNIPPET_TOKENS}) AS snippet, "
+        f"bm25(case_studies_fts, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score "
+        "FROM case_studies_fts JOIN case_studies ON case_studies.id = case_studies_fts.rowid "
+        f"WHERE case_studies_fts MATCH ?{filters} ORDER BY score LIMIT ?"
+    )
+    with _connect() as connection:
+        try:
+            rows = connection.execute(sql, [*highlight, query, *params, int(limit)]).fetchall()
+        except sqlite3.OperationalError:
+            rows = connection.execute(sql, [*highlight, _quoted(query), *params, int(limit)]).fetchall()
+    return [dict(row) for row in rows]
+
+
+def get_case_study(url):
+    """The stored case study of a URL, or None."""
+    with _connect() as connection:
+        row = connection.execute(
+            "SELECT url, company, title, body, language, extracted_at FROM case_studies WHERE url = ?", (url,)
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def stats():
+    """Number of case studies in the corpus, in total, per company and per language (most first)."""
+    with _connect() as connection:
+        companies = connection.execute(
+            "SELECT company, COUNT(*) AS case_studies FROM case_studies GROUP BY company ORDER BY case_studies DESC"
+        ).fetchall()
+        languages = connection.execute(
+            "SELECT language, COUNT(*) AS case_studies FROM case_studies WHERE language IS NOT NULL "
+            "GROUP BY language ORDER BY case_studies DESC"
+        ).fetchall()
+    return {
+        'case_studies': sum(row['case_studies'] for row in companies),
+        'companies': {row['company']: row['case_studies'] for row in companies},
+        'languages': {row['language']: row['case_studies'] for row in languages},
+    }
+
+
+def delete_company(company):
+    """Remove all case studies of a company; returns how many were removed."""
+    with _connect() as connection:
+        return connection.execute("DELETE FROM case_studies WHERE company = ?", (_company(company),)).rowcount
@@ -0,0 +1,183 @@
+"""
+Crawl state for incremental case study scans.
+
+A local SQLite index remembers, per sitemap, the validators of its last response
+(ETag, Last-Modified), the <lastmod> its parent index gave it, and what was
+found in it: the child sitemaps, or the candidate case study URLs with their
+<lastmod>. For every candidate it also keeps the language found by the last
+check, and the <lastmod> of the page at that time.
+
+With this state a later scan of the same company only does the work for what
+changed:
+
+- a child sitemap whose <lastmod> in the index is unchanged is not fetched,
+- other sitemaps are fetched conditionally; a 304 reuses the stored result,
+- a candidate page is only checked for its language again if its <lastmod>
+  changed, or (for pages without one) when the verdict is older than
+  crawl_state_ttl.
+"""
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from cxproof.config import data_path, get_setting
+
+
+@contextmanager
+def _connect():
+    connection = sqlite3.connect(data_path('crawl_state.sqlite3'), timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS sitemaps (
+            url TEXT PRIMARY KEY,
+            domain TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            lastmod TEXT,
+            children TEXT NOT NULL,
+            matches TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        )
+    """)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS urls (
+            url TEXT PRIMARY KEY,
+            domain TEXT NOT NULL,
+            lastmod TEXT,
+            language TEXT,
+            checked_lastmod TEXT,
+            checked_at REAL
+        )
+    """)
+    connection.execute("CREATE INDEX IF NOT EXISTS sitemaps_domain ON sitemaps (domain)")
+    connection.execute("CREATE INDEX IF NOT EXISTS urls_domain ON urls (domain)")
+    try:
+        yield connection
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def url_domain(url):
+    """Host of a URL without the www. prefix."""
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def get_sitemap(url):
+    """
+    The state of a sitemap from the last scan.
+
+    Returns:
+        dict: {'etag', 'last_modified', 'lastmod', 'children': [(url, lastmod)],
+              'matches': [(url, lastmod, priority)], 'fetched_at'}, or None if it was never fetched
+    """
+    with _connect() as connection:
+        row = connection.execute(
+            "SELECT etag, last_modified, lastmod, children, matches, fetched_at FROM sitemaps WHERE url = ?",
+            (url,)
+        ).fetchone()
+    if row is None:
+        return None
+    return {
+        'etag': row[0],
+        'last_modified': row[1],
+        'lastmod': row[2],
+        'children': [tuple(child) for child in json.loads(row[3])],
+        # Records of older scans have no priority
+        'matches': [(tuple(match) + (None,))[:3] for match in json.loads(row[4])],
+        'fetched_at': row[5],
+    }
+
+
+def conditional_headers(record):
+    """Request headers that let the server answer 304 if the sitemap did not change since the record."""
+    headers = {}
+    if record:
+        if record['etag']:
+            headers['If-None-Match'] = record['etag']
+        if record['last_modified']:
+            headers['If-Modified-Since'] = record['last_modified']
+    return headers
+
+
+def store_sitemap(url, headers, lastmod, children, matches):
+    """
+    Remember a freshly fetched sitemap and the <lastmod> of its candidate URLs.
+
+    Args:
+        url (str): Sitemap URL
+        headers: Response headers (for the ETag and Last-Modified validators)
+        lastmod (str): <lastmod> of the sitemap in its parent index, or None
+        children (list): (url, lastmod) of the child sitemaps of an index
+        matches (list): (url, lastmod, priority) of the candidate case study URLs
+    """
+    domain = url_domain(url)
+    with _connect() as connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO sitemaps (url, domain, etag, last_modified, lastmod, children, matches, fetched_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, domain, headers.get('ETag'), headers.get('Last-Modified'), lastmod,
+             json.dumps(children), json.dumps(matches), time.time())
+        )
+        connection.executemany(
+            "INSERT INTO urls (url, domain, lastmod) VALUES (?, ?, ?) "
+            "ON CONFLICT (url) DO UPDATE SET lastmod = excluded.lastmod",
+            [(match[0], url_domain(match[0]), match[1]) for match in matches]
+        )
+
+
+def touch_sitemap(url, lastmod=None):
+    """Record that a sitemap was found unchanged (a 304, or the same <lastmod>)."""
+    with _connect() as connection:
+        connection.execute("UPDATE sitemaps SET fetched_at = ?, lastmod = COALESCE(?, lastmod) WHERE url = ?",
+                           (time.time(), lastmod, url))
+
+
+def known_language(url):
+    """
+    The language name found by the last check of a page, if the page did not change since.
+
+    Returns:
+        str: Language name (e.g. "English"), or None if the page has to be checked again
+    """
+    with _connect() as connection:
+        row = connection.execute(
+            "SELECT lastmod, language, checked_lastmod, checked_at FROM urls WHERE url = ?", (url,)
+        ).fetchone()
+    if row is None or row[1] is None:
+        return None
+    lastmod, language, checked_lastmod, checked_at = row
+    if lastmod is not None:
+        return language if lastmod == checked_lastmod else None
+    # Without a <lastmod> the verdict is trusted for a while
+    return language if time.time() - checked_at < get_setting('crawl_state_ttl') else None
+
+
+def store_language(url, language):
+    """Remember the language of a page, together with its current <lastmod>."""
+    with _connect() as connection:
+        connection.execute(
+            "INSERT INTO urls (url, domain, language, checked_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (url) DO UPDATE SET language = excluded.language, checked_lastmod = lastmod, "
+            "checked_at = excluded.checked_at",
+            (url, url_domain(url), language, time.time())
+        )
+
+
+def url_lastmod(url):
+    """The <lastmod> of a page in the last sitemap that listed it, or None."""
+    with _connect() as connection:
+        row = connection.execute("SELECT lastmod FROM urls WHERE url = ?", (url,)).fetchone()
+    return row[0] if row else None
+
+
+def forget_domain(domain):
+    """Drop the state of a domain, so its next scan starts from zero."""
+    domain = domain.lower()
+    domain = domain[4:] if domain.startswith("www.") else domain
+    with _connect() as connection:
+        connection.execute("DELETE FROM sitemaps WHERE domain = ?", (domain,))
+        connection.execute("DELETE FROM urls WHERE domain = ?", (domain,))
@@ -0,0 +1,94 @@
+"""
+Debug panel of the Streamlit apps: a waterfall of the traced stages of recent runs.
+
+Apps hand the runs they traced to remember() and call show() at the end of the
+script; the panel is drawn when "Show debug timings" is ticked in the sidebar
+(default: the debug_panel setting).
+"""
+from collections import deque
+
+import streamlit as st
+
+from cxproof.config import get_setting
+
+
+# Runs kept per session
+MAX_RUNS = 5
+
+# Spans drawn per waterfall; the totals table still covers all of them
+MAX_WATERFALL_SPANS = 300
+
+_STATE_KEY = "_debug_traces"
+
+
+def remember(run):
+    """Keep a finished tracing.Trace for the panel of this session."""
+    if run is not None:
+        st.session_state.setdefault(_STATE_KEY, deque(maxlen=MAX_RUNS)).append(run)
+
+
+def show():
+    """Draw the panel if it is switched on in the sidebar."""
+    enabled = st.sidebar.checkbox("Show debug timings", value=get_setting('debug_panel'), key="_debug_panel")
+    if not enabled:
+        return
+
+    runs = st.session_state.get(_STATE_KEY)
+    st.divider()
+    st.subheader("Debug timings")
+    if not runs:
+        st.caption("No traced runs yet in this session.")
+        return
+    for i, run in enumerate(reversed(runs)):
+        with st.expander(f"{run.name}: {run.duration:.2f}s, {len(run.spans)} spans", expanded=i == 0):
+            render_waterfall(run)
+
+
+def render_waterfall(run):
+    """Waterfall chart of a run's spans and a table of time, bytes, cache hits and tokens per stage."""
+    spans = sorted(run.spans, key=lambda s: s.start)[:MAX_WATERFALL_SPANS]
+    occurrences = {}
+    rows = []
+    for span in spans:
+        occurrences[span.name] = occurrences.get(span.name, 0) + 1
+        start_ms = (span.start - run.start) * 1000
+        rows.append({
+            # One row per span, indented by nesting depth
+            'span': f"{'· ' * span.depth}{span.name} #{occurrences[span.name]}",
+            'stage': span.name.split('.')[0],
+            'start_ms': round(start_ms, 1),
+            'end_ms': round(start_ms + span.duration * 1000, 1),
+            'duration_ms': round(span.duration * 1000, 1),
+            'details': ", ".join(f"{key}={value}" for key, value in span.attributes.items()),
+        })
+
+    st.vega_lite_chart(rows, {
+        'height': max(120, 16 * len(rows)),
+        'mark': {'type': 'bar', 'cornerRadius': 2},
+        'encoding': {
+            'y': {'field': 'span', 'type': 'nominal', 'sort': None, 'title': None,
+                  'axis': {'labelLimit': 260}},
+            'x': {'field': 'start_ms', 'type': 'quantitative', 'title': 'ms since start'},
+            'x2': {'field': 'end_ms'},
+            'color': {'field': 'stage', 'type': 'nominal', 'legend': None},
+            'tooltip': [
+                {'field': 'span', 'type': 'nominal'},
+                {'field': 'duration_ms', 'type': 'quantitative', 'title': 'ms'},
+                {'field': 'details', 'type': 'nominal'},
+            ],
+        },
+    }, use_container_width=True)
+    if len(run.spans) > len(spans) or run.dropped:
+        st.caption(f"Showing the first {len(spans)} of {len(run.spans) + run.dropped} spans.")
+
+    st.table([
+        {
+            'Stage': name,
+            'Calls': entry['count'],
+            'Seconds': round(entry['seconds'], 3),
+            'KB': round(entry.get('bytes', 0) / 1024, 1),
+            'Cache hits': int(entry.get('cache_hit', 0)),
+            'Tokens': int(entry.get('prompt_tokens', 0) + entry.get('completion_tokens', 0)),
+        }
+        for name, entry in run.totals().items()
+    ])
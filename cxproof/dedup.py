@@ -0,0 +1,90 @@
+"""
+Near-duplicate detection of extracted case studies.
+
+Company sites often publish the same story under several URLs: locale variants
+(/en-us/ and /en-gb/), print or AMP versions, and copies in several sections.
+Every extracted body gets a MinHash signature over its word 3-shingles; the share
+of equal signature values estimates the share of shingles two bodies have in
+common (their Jaccard similarity). Bodies at least near_duplicate_similarity
+alike tell the same story.
+
+Listing pages (/customers/, /case-studies/) are not case studies themselves but
+match the case study keywords; is_listing_url() recognizes them by their URL.
+"""
+import hashlib
+import random
+import re
+from urllib.parse import urlparse
+
+from cxproof.config import get_setting
+
+
+SHINGLE_SIZE = 3
+
+# Signature length: similarities are estimated within about +-0.04
+NUM_PERMUTATIONS = 128
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(_PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+_WORD = re.compile(r"\w+")
+
+
+def shingles(text):
+    """Set of the 64-bit hashes of the word shingles of a text."""
+    words = _WORD.findall(text.lower())
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(words[i:i + SHINGLE_SIZE]).encode(), digest_size=8).digest(), "little")
+        for i in range(max(1, len(words) - SHINGLE_SIZE + 1))
+    }
+
+
+def minhash(text):
+    """MinHash signature of a text: the minimum of every permutation over its shingles."""
+    hashes = shingles(text)
+    return [min((a * value + b) % _PRIME for value in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the texts of two signatures."""
+    return sum(1 for x, y in zip(signature, other) if x == y) / NUM_PERMUTATIONS
+
+
+def is_listing_url(url, keywords):
+    """True for URLs of case study overview pages, such as https://example.com/en/customers/."""
+    segments = [segment for segment in urlparse(url).path.lower().split("/") if segment]
+    return bool(segments) and segments[-1] in {keyword.lower() for keyword in keywords}
+
+
+class CaseStudyDeduplicator:
+    """Remembers the case studies kept so far and recognizes near-duplicates of them."""
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold if threshold is not None else get_setting('near_duplicate_similarity')
+        self._kept = []
+
+    def check(self, case_study):
+        """
+        Compare a case study with the ones kept so far, and keep it if it is new.
+
+        Args:
+            case_study (dict): Extracted case study with 'url' and 'body'
+
+        Bodies shorter than a shingle (e.g. of pages whose story is rendered by JavaScript)
+        cannot be compared and always count as new.
+
+        Returns:
+            str: URL of the kept case study it duplicates, or None if it is new (and now kept)
+        """
+        body = case_study.get('body') or ''
+        if len(_WORD.findall(body)) < SHINGLE_SIZE:
+            return None
+
+        signature = minhash(body)
+        for url, kept in self._kept:
+            if similarity(signature, kept) >= self.threshold:
+                return url
+
+        self._kept.append((case_study.get('url'), signature))
+        return None
@@ -0,0 +1,286 @@
+"""
+Export of the scraped corpora for analytics jobs.
+
+Writes the case studies, company metadata and screenshot (vision) analyses kept
+in the local corpus to zstd-compressed JSON lines and/or Parquet files with a
+fixed schema per dataset (SCHEMAS), partitioned by the day the rows were stored:
+
+    exports/parquet/case_studies/date=2026-10-18/part-20261018T120000-1a2b3c4d.parquet
+    exports/jsonl/case_studies/date=2026-10-18/part-20261018T120000-1a2b3c4d.jsonl.zst
+
+Rows are streamed from the database and written in batches, so exports of any
+size run in constant memory. Every run appends new part files for the rows
+written since the last export of the format: the watermark (_watermark.json next
+to the partitions) is the write sequence number of the last exported row, which
+the corpus assigns in commit order, so rows committed by concurrent writers while
+an export runs are picked up by the next one; each dataset directory can be read as one hive-partitioned dataset
+by pyarrow, DuckDB, Spark or pandas. A page scraped again is exported
+again, so readers should keep the latest row per URL.
+
+Usage:
+    python -m cxproof.export --output exports
+    python -m cxproof.export case_studies --output exports --format parquet --full
+"""
+import argparse
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+from cxproof import corpus
+
+
+# Columns and types of every dataset; columns are only ever added at the end
+SCHEMA_VERSION = 1
+SCHEMAS = {
+    'case_studies': [
+        ('url', 'string'), ('company', 'string'), ('title', 'string'), ('body', 'string'),
+        ('language', 'string'), ('extracted_at', 'timestamp'),
+    ],
+    'company_metadata': [
+        ('url', 'string'), ('company', 'string'), ('title', 'string'), ('meta_content', 'string'),
+        ('linkedin_about', 'string'), ('extracted_at', 'timestamp'),
+    ],
+    'vision_results': [
+        ('url', 'string'), ('section', 'int32'), ('image_url', 'string'), ('route', 'string'),
+        ('result', 'string'), ('text', 'string'), ('error', 'string'), ('model', 'string'),
+        ('analyzed_at', 'timestamp'),
+    ],
+}
+
+FORMATS = ('jsonl', 'parquet')
+
+# Rows per Parquet row group
+BATCH_SIZE = 10000
+
+
+def arrow_schema(dataset):
+    """The pyarrow schema of a dataset, with the schema version in its metadata."""
+    import pyarrow as pa
+
+    types = {'string': pa.string(), 'int32': pa.int32(), 'timestamp': pa.timestamp('us', tz='UTC')}
+    return pa.schema([(name, types[kind]) for name, kind in SCHEMAS[dataset]],
+                     metadata={'cxproof.dataset': dataset, 'cxproof.schema_version': str(SCHEMA_VERSION)})
+
+
+def _conform(dataset, row):
+    """A row with exactly the columns of the dataset schema, in order; timestamps as aware datetimes."""
+    conformed = {}
+    for name, kind in SCHEMAS[dataset]:
+        value = row.get(name)
+        if value is not None:
+            if kind == 'timestamp':
+                value = datetime.fromtimestamp(value, timezone.utc)
+            elif kind == 'int32':
+                value = int(value)
+            else:
+                value = str(value)
+        conformed[name] = value
+    return conformed
+
+
+class _JsonlPart:
+    """One zstd-compressed JSON lines part file."""
+
+    def __init__(self, path, dataset):
+        import pyarrow as pa
+
+        self.stream = pa.CompressedOutputStream(path, 'zstd')
+
+    def write(self, row):
+        line = {name: value.isoformat() if isinstance(value, datetime) else value for name, value in row.items()}
+        self.stream.write((json.dumps(line, ensure_ascii=False) + "\n").encode())
+
+    def close(self):
+        self.stream.close()
+
+
+class _ParquetPart:
+    """One Parquet part file, written a row group at a time."""
+
+    def __init__(self, path, dataset):
+        import pyarrow.parquet as pq
+
+        self.schema = arrow_schema(dataset)
+        self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+        self.columns = {name: [] for name in self.schema.names}
+        self.buffered = 0
+
+    def write(self, row):
+        for name, value in row.items():
+            self.columns[name].append(value)
+        self.buffered += 1
+        if self.buffered >= BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        import pyarrow as pa
+
+        if self.buffered:
+            self.writer.write_batch(pa.record_batch(list(self.columns.values()), schema=self.schema))
+            self.columns = {name: [] for name in self.schema.names}
+            self.buffered = 0
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+
+_PART_TYPES = {'jsonl': (_JsonlPart, '.jsonl.zst'), 'parquet': (_ParquetPart, '.parquet')}
+
+
+class PartitionedWriter:
+    """
+    Streams rows of a dataset into date partitions of one format.
+
+    Part files are written under a name starting with "." (ignored by dataset
+    readers) and renamed when closed, so readers never see half-written files.
+    Rows come in write order, so only one partition is open at a time; a partition
+    reopened by a row written late around midnight gets another part file.
+    """
+
+    def __init__(self, directory, dataset, file_format):
+        self.directory = _dataset_directory(directory, dataset, file_format)
+        self.dataset = dataset
+        self.part_type, self.extension = _PART_TYPES[file_format]
+        self.part_name = f"part-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.time_column = corpus.DATASETS[dataset][1]
+        self.partition = None
+        self.part = None
+        self._pending = None
+        # Write sequence number of the last row written to the open part file
+        self._last_written = None
+        self.rows = 0
+        self.files = []
+        # Write sequence number of the last row in a finished part file
+        self.exported_seq = None
+
+    def write(self, row):
+        seq = row['seq']
+        row = _conform(self.dataset, row)
+        timestamp = row[self.time_column]
+        partition = f"date={timestamp:%Y-%m-%d}"
+        if partition != self.partition:
+            self._close_partition()
+            self._open_partition(partition)
+        self.part.write(row)
+        self._last_written = seq
+        self.rows += 1
+
+    def _open_partition(self, partition):
+        directory = os.path.join(self.directory, partition)
+        os.makedirs(directory, exist_ok=True)
+        self.partition = partition
+        name = self.part_name
+        if os.path.exists(os.path.join(directory, name + self.extension)):
+            name = f"{name}-{len(self.files)}"
+        path = os.path.join(directory, name + self.extension)
+        temporary = os.path.join(directory, "." + name + self.extension)
+        self.part = self.part_type(temporary, self.dataset)
+        self._pending = (temporary, path)
+
+    def _close_partition(self):
+        if self.part is None:
+            return
+        self.part.close()
+        os.replace(*self._pending)
+        self.files.append(self._pending[1])
+        self.exported_seq = self._last_written
+        self.part = None
+        self._pending = None
+
+    def close(self):
+        self._close_partition()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        elif self.part is not None:
+            # Leave no partial file behind
+            self.part.close()
+            os.remove(self._pending[0])
+
+
+def _dataset_directory(directory, dataset, file_format):
+    return os.path.join(directory, file_format, dataset)
+
+
+def _watermark_path(directory, dataset, file_format):
+    return os.path.join(_dataset_directory(directory, dataset, file_format), "_watermark.json")
+
+
+def read_watermark(directory, dataset, file_format):
+    """Write sequence number of the last row of the last export of a dataset in a format to a directory, or None."""
+    try:
+        with open(_watermark_path(directory, dataset, file_format)) as f:
+            watermark = json.load(f)
+    except FileNotFoundError:
+        return None
+    if 'exported_seq' not in watermark:
+        # Watermark of an export before write sequence numbers: the Unix time of its newest row
+        return corpus.sequence_at(dataset, watermark['exported_until'])
+    return watermark['exported_seq']
+
+
+def export_dataset(dataset, directory, formats=FORMATS, full=False):
+    """
+    Append the rows of a dataset stored since the last export to the export directory.
+
+    Every format is a separate pass over the rows with its own watermark, so formats
+    added to a later run start with all rows instead of the ones since the other formats.
+
+    Args:
+        dataset (str): One of SCHEMAS
+        directory (str): Export root; files go to <directory>/<format>/<dataset>/date=<day>/
+        formats (tuple): "jsonl" and/or "parquet"
+        full (bool): Export all rows instead of the ones written since the last export
+
+    Returns:
+        dict: {'dataset', 'rows': {format: rows}, 'files', 'seconds'}
+    """
+    start = time.perf_counter()
+    rows = {}
+    files = []
+    for file_format in formats:
+        since = None if full else read_watermark(directory, dataset, file_format)
+        writer = PartitionedWriter(directory, dataset, file_format)
+        try:
+            with writer:
+                for row in corpus.iter_rows(dataset, since=since):
+                    writer.write(row)
+        finally:
+            # Also after a failure, so the partitions finished before it are not exported twice
+            if writer.exported_seq is not None:
+                with open(_watermark_path(directory, dataset, file_format), "w") as f:
+                    json.dump({'exported_seq': writer.exported_seq, 'schema_version': SCHEMA_VERSION}, f)
+        rows[file_format] = writer.rows
+        files += writer.files
+    return {'dataset': dataset, 'rows': rows, 'files': files, 'seconds': round(time.perf_counter() - start, 3)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the scraped corpora to zstd JSON lines and Parquet.")
+    parser.add_argument("datasets", nargs="*", help=f"Datasets to export: {', '.join(SCHEMAS)} (default: all)")
+    parser.add_argument("--output", default="exports", help="Export directory (default: exports)")
+    parser.add_argument("--format", nargs="+", choices=FORMATS, default=list(FORMATS), dest="formats")
+    parser.add_argument("--full", action="store_true", help="Export all rows, not only the ones since the last export")
+    args = parser.parse_args(argv)
+    unknown = set(args.datasets) - set(SCHEMAS)
+    if unknown:
+        parser.error(f"unknown datasets: {', '.join(sorted(unknown))}")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    for dataset in args.datasets or list(SCHEMAS):
+        result = export_dataset(dataset, args.output, tuple(args.formats), args.full)
+        logging.info(f"Exported {dataset} rows {result['rows']} to {len(result['files'])} files "
+                     f"in {result['seconds']}s")
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
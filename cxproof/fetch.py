@@ -0,0 +1,153 @@
+"""
+Fetch backends of the scrapers.
+
+The scraper functions only call get(url, timeout=..., headers=...) on a session and
+read status_code, content, text and headers of the response; create_scraper()
+returns a session of the configured fetch_backend:
+
+- cloudscraper: a new cloudscraper session per call, over HTTP/1.1. It gets past
+  Cloudflare's JavaScript challenges.
+- httpx: one httpx client shared by all scraper functions, threads and sessions of
+  the process. Requests to a host reuse its open connections, over HTTP/2 where
+  the server offers it, so concurrent requests to one host are multiplexed on a
+  single connection; responses are asked for with Accept-Encoding: br, gzip; and
+  host names are resolved once per dns_cache_ttl seconds instead of for every new
+  connection (see http_transport). Sites behind a Cloudflare challenge answer it
+  with 403 or 503.
+"""
+import importlib.util
+import socket
+import threading
+import time
+
+import streamlit as st
+
+from cxproof.config import get_setting
+
+
+BACKENDS = ("cloudscraper", "httpx")
+
+# What the cloudscraper sessions of the scrapers present themselves as
+BROWSER = {'browser': 'chrome', 'platform': 'windows', 'desktop': True}
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                  'Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+# Host name -> (monotonic expiry time, IP addresses)
+_dns_cache = {}
+_dns_lock = threading.Lock()
+
+
+def resolve(host, port):
+    """
+    Addresses of a host, from the in-process DNS cache while they are younger than dns_cache_ttl.
+
+    Args:
+        host (str): Host name or IP address
+        port (int): Port, passed to getaddrinfo
+
+    Returns:
+        list: IP addresses, in the order getaddrinfo returned them
+    """
+    now = time.monotonic()
+    with _dns_lock:
+        cached = _dns_cache.get(host)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    addresses = list(dict.fromkeys(info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)))
+    with _dns_lock:
+        _dns_cache[host] = (now + get_setting('dns_cache_ttl'), addresses)
+    return addresses
+
+
+def forget(host=None):
+    """Drop a host (default: all hosts) from the DNS cache."""
+    with _dns_lock:
+        if host is None:
+            _dns_cache.clear()
+        else:
+            _dns_cache.pop(host, None)
+
+
+def _accept_encoding():
+    """br only if a brotli decoder is installed, since httpx can only decode br with one."""
+    return "br, gzip" if importlib.util.find_spec("brotli") else "gzip"
+
+
+@st.cache_resource(show_spinner=False)
+def get_http_client():
+    """
+    Return the process-wide httpx client of the httpx fetch backend.
+
+    The client is created once and reused across Streamlit reruns, sessions and apps,
+    so fetches share one keep-alive connection pool (HTTP/2 where the server supports
+    it) and one DNS cache.
+    """
+    import httpx
+
+    from cxproof.http_transport import CachedDNSTransport
+
+    transport = CachedDNSTransport(max_connections=get_setting('fetch_max_connections'),
+                                   keepalive_expiry=get_setting('fetch_keepalive_expiry'))
+    return httpx.Client(
+        transport=transport,
+        headers={**HEADERS, 'Accept-Encoding': _accept_encoding()},
+        follow_redirects=True,
+        timeout=httpx.Timeout(get_setting('fetch_timeout'), connect=get_setting('fetch_connect_timeout')),
+    )
+
+
+class HttpxScraper:
+    """A requests-style session on the shared httpx client."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, url, timeout=None, headers=None, allow_redirects=True):
+        """
+        Fetch a URL.
+
+        Args:
+            url (str): URL to fetch
+            timeout (float): Seconds, instead of the fetch_timeout setting
+            headers (dict): Headers to send in addition to (or instead of) the client's
+            allow_redirects (bool): Follow redirects
+
+        Returns:
+            httpx.Response: The response, with status_code, content, text and headers like a requests response
+        """
+        options = {} if timeout is None else {'timeout': timeout}
+        return self.client.get(url, headers=headers, follow_redirects=allow_redirects, **options)
+
+
+def create_scraper(browser=BROWSER, backend=None):
+    """
+    Return a session to fetch pages with.
+
+    Args:
+        browser (dict): Browser the cloudscraper session presents itself as (None for a random one)
+        backend (str): "cloudscraper" or "httpx"; defaults to the fetch_backend setting
+
+    Returns:
+        A session with a requests-style get()
+    """
+    backend = backend or get_setting('fetch_backend')
+    if backend == "httpx":
+        return HttpxScraper(get_http_client())
+    if backend == "cloudscraper":
+        import cloudscraper
+
+        return cloudscraper.create_scraper(browser=browser) if browser else cloudscraper.create_scraper()
+    raise ValueError(f"Unknown fetch backend: {backend}")
+
+
+def reset():
+    """Close the shared httpx client and empty the DNS cache, so the next fetch starts from scratch."""
+    get_http_client().close()
+    get_http_client.clear()
+    forget()
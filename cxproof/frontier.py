@@ -0,0 +1,180 @@
+"""
+Compact visited-set for sitemap crawls.
+
+Sitemaps of large sites list hundreds of thousands of URLs, and often list the
+same page in several sitemaps (per language, per section, "latest" sitemaps).
+The Frontier remembers what a scan has already seen without keeping URL strings:
+
+- URLs are canonicalized (scheme, default ports, fragments, tracking parameters,
+  parameter order and trailing slashes do not make a page different) and hashed
+  to 128 bits, with the host interned to a small integer,
+- pages go into a Bloom filter, so a million URLs take about 1.8 MB at the
+  default error rate; a false positive only means one candidate is skipped,
+- sitemaps (a few hundred at most) are kept exactly as 64-bit keys, since
+  skipping a whole sitemap by mistake would lose all of its URLs.
+
+    frontier = Frontier()
+    if frontier.first_visit(url):
+        check(url)
+"""
+import hashlib
+import math
+
+from cxproof.config import get_setting
+
+
+# Query parameters that do not change the page (besides all utm_* ones)
+TRACKING_PARAMETERS = frozenset({"gclid", "fbclid", "msclkid", "mc_cid", "mc_eid", "_ga", "_gl"})
+
+_DEFAULT_PORTS = {"http": ":80", "https": ":443"}
+
+
+def _is_tracking(parameter):
+    name = parameter.partition("=")[0].lower()
+    return name.startswith("utm_") or name in TRACKING_PARAMETERS
+
+
+def canonical_url(url):
+    """
+    The canonical form of a URL used for duplicate detection.
+
+    Plain string operations instead of urllib.parse, which is several times slower
+    and runs for every URL of every sitemap.
+
+    Returns:
+        tuple: (host, path with sorted query) with the host lowercased and without default port;
+               the scheme is left out, so http and https URLs of a page are the same
+    """
+    scheme, separator, rest = url.strip().partition("://")
+    if not separator:
+        scheme, rest = "", scheme
+    rest = rest.partition("#")[0]
+    rest, _, query = rest.partition("?")
+    host, _, path = rest.partition("/")
+
+    host = host.rpartition("@")[2].lower()
+    default_port = _DEFAULT_PORTS.get(scheme.lower())
+    if default_port and host.endswith(default_port):
+        host = host[:-len(default_port)]
+
+    path = "/" + path.rstrip("/")
+    if query:
+        params = sorted(parameter for parameter in query.split("&") if parameter and not _is_tracking(parameter))
+        if params:
+            path = f"{path}?{'&'.join(params)}"
+    return host, path
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 128-bit keys."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        bits = -capacity * math.log(error_rate) / (math.log(2) ** 2)
+        # A power of two, so positions are found with a mask instead of a modulo
+        self.num_bits = 1 << max(6, math.ceil(math.log2(bits)))
+        self.num_hashes = max(1, round(bits / capacity * math.log(2)))
+        self.bits = bytearray(self.num_bits // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: the two halves of the key give all k positions
+        mask = self.num_bits - 1
+        h1 = key & 0xFFFFFFFFFFFFFFFF
+        h2 = (key >> 64) | 1
+        return [(h1 + i * h2) & mask for i in range(self.num_hashes)]
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def add(self, key):
+        """Add a key; returns True if it was (probably) not in the filter yet."""
+        new = False
+        bits = self.bits
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+
+class Frontier:
+    """
+    Seen-checks for the sitemaps and pages of one scan.
+
+    Supports `url in frontier` and `frontier.add(url)` for sitemaps, so it can be
+    passed where a set of processed sitemap URLs is expected, and first_visit()
+    for candidate pages.
+    """
+
+    def __init__(self, capacity=None, error_rate=None):
+        self.capacity = capacity or get_setting('frontier_capacity')
+        self.error_rate = error_rate or get_setting('frontier_error_rate')
+        # Scalable Bloom filter: when one is full, a twice as large one with half the error rate is added,
+        # so the overall false positive rate stays below 2 * error_rate
+        self._filters = [BloomFilter(self.capacity, self.error_rate / 2)]
+        self._sitemaps = set()
+        self._hosts = {}
+        self.pages_seen = 0
+        self.duplicates = 0
+
+    def _key(self, url):
+        host, path = canonical_url(url)
+        # Hosts are interned: every URL of a host hashes the same small id instead of the host name
+        host_id = self._hosts.setdefault(host, len(self._hosts))
+        digest = hashlib.blake2b(path.encode(), digest_size=16, salt=host_id.to_bytes(8, "little")).digest()
+        return int.from_bytes(digest, "little")
+
+    # Sitemaps (exact)
+
+    def __contains__(self, sitemap_url):
+        return self._key(sitemap_url) >> 64 in self._sitemaps
+
+    def add(self, sitemap_url):
+        self._sitemaps.add(self._key(sitemap_url) >> 64)
+
+    # Pages (probabilistic)
+
+    def first_visit(self, url):
+        """
+        Record a page; True the first time it is seen in this scan.
+
+        Equivalent URLs (see canonical_url) count as the same page. With probability of
+        about error_rate a page never seen before is reported as seen.
+        """
+        key = self._key(url)
+        filters = self._filters
+        for bloom in filters[:-1]:
+            if key in bloom:
+                self.duplicates += 1
+                return False
+
+        current = filters[-1]
+        if current.count >= current.capacity:
+            if key in current:
+                self.duplicates += 1
+                return False
+            current = BloomFilter(current.capacity * 2, current.error_rate / 2)
+            filters.append(current)
+
+        # Test and insert in one pass: the key is new if any of its bits was not set
+        if not current.add(key):
+            self.duplicates += 1
+            return False
+        self.pages_seen += 1
+        return True
+
+    def stats(self):
+        """Pages seen, duplicates skipped, hosts and bytes used by the filters."""
+        return {
+            'pages_seen': self.pages_seen,
+            'duplicates': self.duplicates,
+            'sitemaps': len(self._sitemaps),
+            'hosts': len(self._hosts),
+            'filter_bytes': sum(len(bloom.bits) for bloom in self._filters),
+        }
@@ -0,0 +1,125 @@
+"""
+httpx transport of the httpx fetch backend (see fetch).
+
+An httpcore connection pool whose network backend connects to the addresses of
+the in-process DNS cache, behind httpx's public transport interface. Imported
+only when the httpx backend is used.
+"""
+import contextlib
+
+import httpcore
+import httpx
+
+from cxproof.fetch import forget, resolve
+
+
+# httpcore errors and the httpx errors they are raised as, most specific first
+_EXCEPTIONS = (
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.ProxyError, httpx.ProxyError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+)
+
+
+@contextlib.contextmanager
+def _httpx_errors(request):
+    """Raise httpcore errors as the matching httpx errors, as httpx's own transport does."""
+    try:
+        yield
+    except Exception as e:
+        for core_error, httpx_error in _EXCEPTIONS:
+            if isinstance(e, core_error):
+                raise httpx_error(str(e), request=request) from e
+        raise
+
+
+class CachedDNSBackend(httpcore.NetworkBackend):
+    """
+    httpcore network backend connecting to the addresses of the DNS cache.
+
+    Only the TCP connection goes to the cached address; TLS still verifies the
+    certificate against the host name. A host none of whose cached addresses
+    accepts the connection is resolved again by the next connection.
+    """
+
+    def __init__(self):
+        self._backend = httpcore.SyncBackend()
+
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            addresses = resolve(host, port)
+        except OSError as e:
+            raise httpcore.ConnectError(str(e)) from e
+
+        error = httpcore.ConnectError(f"No addresses for {host}")
+        for address in addresses:
+            try:
+                return self._backend.connect_tcp(address, port, timeout=timeout, local_address=local_address,
+                                                 socket_options=socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        forget(host)
+        raise error
+
+    def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    def sleep(self, seconds):
+        self._backend.sleep(seconds)
+
+
+class _ResponseStream(httpx.SyncByteStream):
+    def __init__(self, stream, request):
+        self._stream = stream
+        self._request = request
+
+    def __iter__(self):
+        with _httpx_errors(self._request):
+            for part in self._stream:
+                yield part
+
+    def close(self):
+        if hasattr(self._stream, "close"):
+            self._stream.close()
+
+
+class CachedDNSTransport(httpx.BaseTransport):
+    """HTTP/1.1 and HTTP/2 transport over an httpcore connection pool that uses the DNS cache."""
+
+    def __init__(self, max_connections, keepalive_expiry, http2=True):
+        self._pool = httpcore.ConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+            http1=True,
+            http2=http2,
+            network_backend=CachedDNSBackend(),
+        )
+
+    def handle_request(self, request):
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(scheme=request.url.raw_scheme, host=request.url.raw_host, port=request.url.port,
+                             target=request.url.raw_path),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        with _httpx_errors(request):
+            response = self._pool.handle_request(core_request)
+        return httpx.Response(status_code=response.status, headers=response.headers,
+                              stream=_ResponseStream(response.stream, request), extensions=response.extensions)
+
+    def close(self):
+        self._pool.close()
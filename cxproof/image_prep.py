@@ -0,0 +1,161 @@
+"""
+Preprocessing of screenshot sections before they are sent to a vision model.
+
+Every section is resized to the size the model would scale it to anyway (and a
+little further when that saves a whole row or column of 512px tiles), reduced to
+grayscale or a palette when that loses no information, and given a detail level:
+sections that are nearly empty are sent with detail "low".
+"""
+import math
+import os
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from cxproof.tiling import BLANK_THRESHOLD, cut_scores, row_variance
+
+
+# OpenAI vision pricing model for gpt-4o class models
+TILE_SIZE = 512
+MAX_SIDE = 2048
+SHORT_SIDE = 768
+BASE_TOKENS = 85
+TILE_TOKENS = 170
+
+# Never shrink below this scale to save a tile, so small print stays legible
+MIN_TILE_SCALE = 0.85
+
+# Sections whose share of non-blank rows is below this are sent with detail "low"
+LOW_DETAIL_CONTENT_RATIO = 0.08
+
+# Largest per-channel difference of any pixel for which an image counts as gray
+GRAYSCALE_TOLERANCE = 8
+
+# Gray levels kept when a section is reduced to grayscale
+GRAY_LEVELS = 32
+
+
+def model_scaled_size(width, height):
+    """Size the API scales an image to for detail "high": fit in 2048x2048, then shortest side 768."""
+    scale = min(1.0, MAX_SIDE / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, SHORT_SIDE / min(width, height))
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def estimate_tokens(width, height, detail="high"):
+    """Estimated input tokens of an image of the given size."""
+    if detail == "low":
+        return BASE_TOKENS
+    width, height = model_scaled_size(width, height)
+    return BASE_TOKENS + TILE_TOKENS * math.ceil(width / TILE_SIZE) * math.ceil(height / TILE_SIZE)
+
+
+def optimal_size(width, height, min_scale=MIN_TILE_SCALE):
+    """
+    Target size for an image: the model's own scaled size, shrunk a little more
+    when that drops a row or column of tiles without going below min_scale.
+    """
+    width, height = model_scaled_size(width, height)
+    scales = []
+    for side in (width, height):
+        tiles = math.ceil(side / TILE_SIZE)
+        if tiles > 1 and (tiles - 1) * TILE_SIZE / side >= min_scale:
+            scales.append((tiles - 1) * TILE_SIZE / side)
+    # The mildest shrink that still saves a row or column of tiles
+    best = max(scales) if scales else 1.0
+    return max(1, int(width * best)), max(1, int(height * best))
+
+
+def content_ratio(img):
+    """Share of rows that are not blank."""
+    scores = cut_scores(row_variance(img))
+    return float(np.count_nonzero(scores > BLANK_THRESHOLD)) / max(1, len(scores))
+
+
+def reduce_colors(img):
+    """Convert to a palette or grayscale image when that keeps the content readable."""
+    colors = img.getcolors(256)
+    if colors is not None:
+        # 256 colors or fewer: a palette keeps every pixel exact
+        return img.convert('P', palette=Image.Palette.ADAPTIVE, colors=max(2, len(colors)))
+
+    pixels = np.asarray(img.convert('RGB'), dtype=np.int16)
+    spread = pixels.max(axis=2) - pixels.min(axis=2)
+    if spread.max() <= GRAYSCALE_TOLERANCE:
+        # Gray content (e.g. anti-aliased text after resizing): 32 gray levels are plenty to read it.
+        # A single colored pixel (badges, charts, brand colors) keeps the image in color
+        return img.convert('L').quantize(colors=GRAY_LEVELS)
+    return img
+
+
+def prepare_image(path):
+    """
+    Downscale and re-encode one section image in place and pick its detail level.
+
+    The file is only rewritten when the new version is smaller or cheaper in tokens.
+
+    Args:
+        path (str): PNG file of the section
+
+    Returns:
+        dict: {'path', 'detail', 'original_bytes', 'bytes', 'original_tokens', 'tokens', 'size'}
+    """
+    original_bytes = os.path.getsize(path)
+    img = Image.open(path)
+    img.load()
+    original_size = img.size
+    original_tokens = estimate_tokens(img.width, img.height)
+
+    detail = "low" if content_ratio(img) < LOW_DETAIL_CONTENT_RATIO else "high"
+    if detail == "low":
+        # The model sees low detail images at 512x512 at most
+        img.thumbnail((TILE_SIZE, TILE_SIZE), Image.Resampling.LANCZOS)
+    else:
+        size = optimal_size(img.width, img.height)
+        if size != img.size:
+            img = img.resize(size, Image.Resampling.LANCZOS)
+
+    img = reduce_colors(img.convert('RGB'))
+    encoded = BytesIO()
+    img.save(encoded, format='PNG', optimize=True)
+    tokens = estimate_tokens(img.width, img.height, detail)
+
+    if encoded.tell() < original_bytes or tokens < original_tokens:
+        with open(path, 'wb') as f:
+            f.write(encoded.getvalue())
+        size, file_bytes = img.size, encoded.tell()
+    else:
+        # Re-encoding did not pay off; send the original (the API scales it the same way)
+        size, file_bytes = original_size, original_bytes
+        tokens = estimate_tokens(*original_size, detail)
+
+    return {
+        'path': path,
+        'detail': detail,
+        'original_bytes': original_bytes,
+        'bytes': file_bytes,
+        'original_tokens': original_tokens,
+        'tokens': tokens,
+        'size': size,
+    }
+
+
+def prepare_images(paths):
+    """
+    Prepare every section image.
+
+    Returns:
+        tuple: (list of per-image results, totals dict with bytes and tokens saved)
+    """
+    results = [prepare_image(path) for path in paths]
+    totals = {
+        'original_bytes': sum(r['original_bytes'] for r in results),
+        'bytes': sum(r['bytes'] for r in results),
+        'original_tokens': sum(r['original_tokens'] for r in results),
+        'tokens': sum(r['tokens'] for r in results),
+    }
+    totals['bytes_saved'] = totals['original_bytes'] - totals['bytes']
+    totals['tokens_saved'] = totals['original_tokens'] - totals['tokens']
+    return results, totals
@@ -0,0 +1,425 @@
+"""
+Local HTTP job API for the scrapers.
+
+Runs the scraper functions as background jobs on a worker pool, so pipelines can
+use them without driving the Streamlit apps and several jobs run at once:
+
+    python -m cxproof.job_api --port 8765
+
+    POST   /jobs              {"type": "screenshot", "params": {"url": "https://..."}}  -> 202 {"id", "status"}
+    GET    /jobs              Summary of all known jobs
+    GET    /jobs/<id>         Status, and the result or error once finished
+    GET    /jobs/<id>/events  Progress events as newline-delimited JSON, streamed until the job ends
+    DELETE /jobs/<id>         Cancel a job that has not started yet
+    GET    /health            Worker pool and queue state
+    GET    /metrics           Stage timings, bytes, cache hits and tokens in the Prometheus text format
+    GET    /search?q=...      Full-text search of the case study corpus (optional company, language, limit)
+    GET    /corpus            Number of case studies in the corpus, per company
+
+Job types and their params are listed in JOB_TYPES. The server uses asyncio from the
+standard library; jobs run in threads because the scrapers do blocking I/O. When the
+job_api_token setting is set, requests need an "Authorization: Bearer <token>" header.
+"""
+import argparse
+import asyncio
+import inspect
+import itertools
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs
+
+from cxproof import corpus, tracing
+from cxproof.config import get_setting
+
+
+MAX_BODY_BYTES = 1024 * 1024
+
+# Job states
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class _EventWriter:
+    """Placeholder-like object the scraper functions write their progress to."""
+
+    def __init__(self, job):
+        self.job = job
+
+    def write(self, text, *args, **kwargs):
+        self.job.publish({"type": "status", "text": str(text)})
+
+    def markdown(self, text, *args, **kwargs):
+        self.job.publish({"type": "partial", "text": text})
+
+
+def _case_study_urls(job, base_url, keywords=None, max_results=5, incremental=False):
+    from cxproof.casestudies import CASE_STUDY_KEYWORDS, get_case_study_urls
+
+    urls = []
+    for url in get_case_study_urls(base_url, keywords or CASE_STUDY_KEYWORDS, int(max_results),
+                                   status_placeholder=_EventWriter(job), incremental=bool(incremental)):
+        urls.append(url)
+        job.publish({"type": "url", "url": url})
+    return urls
+
+
+def _case_study(job, url):
+    from cxproof.casestudies import extract_case_study
+
+    return extract_case_study(url)
+
+
+def _screenshot(job, url, use_ocr=False, backend=None):
+    from cxproof.products import take_screenshot
+
+    result = take_screenshot(url, use_ocr, backend)
+    if result is None:
+        raise RuntimeError(f"Screenshot capture of {url} failed")
+    return result
+
+
+def _product_analysis(job, image_urls, page_metadata, prompt, model="gpt-4o", use_cache=True, structured=True,
+                      image_details=None, ocr_results=None):
+    from cxproof.products import process_multiple_images_with_ai
+
+    return process_multiple_images_with_ai(image_urls, page_metadata, prompt, model, placeholder=_EventWriter(job),
+                                           use_cache=use_cache, structured=structured, image_details=image_details,
+                                           ocr_results=ocr_results)
+
+
+def _linkedin_about(job, website_url):
+    from cxproof.company_data import find_linkedin_about_section, normalize_url
+
+    return find_linkedin_about_section(normalize_url(website_url))
+
+
+# Job type -> function(job, **params); the params of each type are the function's keyword arguments
+JOB_TYPES = {
+    "case_study_urls": _case_study_urls,
+    "case_study": _case_study,
+    "screenshot": _screenshot,
+    "product_analysis": _product_analysis,
+    "linkedin_about": _linkedin_about,
+}
+
+
+class Job:
+    """A submitted job and the events it published."""
+
+    def __init__(self, job_type, params, loop):
+        self.id = uuid.uuid4().hex
+        self.type = job_type
+        self.params = params
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.events = []
+        self.future = None
+        self.trace = None
+        self._loop = loop
+        self._waiters = []
+        self._lock = threading.Lock()
+
+    def publish(self, event):
+        """Record an event (callable from any thread) and wake up the streams waiting for it."""
+        with self._lock:
+            event = {"seq": len(self.events), "time": time.time(), **event}
+            self.events.append(event)
+        self._loop.call_soon_threadsafe(self._notify)
+
+    def _notify(self):
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def wait_for_events(self, cursor):
+        """Return once there are events after cursor or the job finished (event loop only)."""
+        if len(self.events) > cursor or self.status in FINISHED:
+            return
+        waiter = self._loop.create_future()
+        self._waiters.append(waiter)
+        await waiter
+
+    def run(self):
+        """Run the job in a worker thread."""
+        with self._lock:
+            if self.status != PENDING:
+                return
+            self.status = RUNNING
+            self.started_at = time.time()
+        self.publish({"type": "started"})
+        try:
+            with tracing.trace(self.type) as self.trace:
+                self.result = JOB_TYPES[self.type](self, **self.params)
+            self.status = SUCCEEDED
+        except Exception as e:
+            logging.exception(f"Job {self.id} ({self.type}) failed")
+            self.error = str(e)
+            self.status = FAILED
+        self.finished_at = time.time()
+        self.publish({"type": "finished", "status": self.status})
+
+    def cancel(self):
+        """Cancel the job if it has not started. Returns True if it was cancelled."""
+        with self._lock:
+            if self.status != PENDING:
+                return False
+            self.status = CANCELLED
+            self.finished_at = time.time()
+        self.future.cancel()
+        self.publish({"type": "finished", "status": CANCELLED})
+        return True
+
+    def to_dict(self, include_result=True):
+        job = {
+            "id": self.id,
+            "type": self.type,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "events": len(self.events),
+        }
+        if include_result:
+            job["params"] = self.params
+            job["result"] = self.result
+            job["error"] = self.error
+            job["timings"] = self.trace.totals() if self.trace else None
+        return job
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class JobServer:
+    """Job registry, worker pool and the HTTP front end."""
+
+    def __init__(self, workers=None, max_jobs=None, token=None):
+        self.workers = workers or get_setting('job_api_workers')
+        self.max_jobs = max_jobs or get_setting('job_api_max_jobs')
+        self.token = token if token is not None else get_setting('job_api_token')
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        self.jobs = OrderedDict()
+        self.loop = None
+
+    # Jobs
+
+    def submit(self, job_type, params):
+        if not isinstance(job_type, str) or job_type not in JOB_TYPES:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Unknown job type {job_type!r}; one of {', '.join(JOB_TYPES)}")
+        if not isinstance(params, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "params must be an object")
+        try:
+            inspect.signature(JOB_TYPES[job_type]).bind(None, **params)
+        except TypeError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid params for {job_type}: {e}")
+
+        job = Job(job_type, params, self.loop)
+        self.jobs[job.id] = job
+        self._prune()
+        job.future = self.executor.submit(job.run)
+        return job
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_jobs."""
+        excess = len(self.jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED]
+        for job_id in finished[:excess]:
+            del self.jobs[job_id]
+
+    def get_job(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No job {job_id}")
+        return job
+
+    def health(self):
+        counts = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": self.workers, "jobs": counts}
+
+    # HTTP
+
+    async def handle(self, reader, writer):
+        try:
+            method, path, headers, body = await self._read_request(reader)
+            if self.token and headers.get("authorization") != f"Bearer {self.token}":
+                raise HTTPError(HTTPStatus.UNAUTHORIZED, "Missing or wrong bearer token")
+            path, _, query = path.partition("?")
+            await self._route(method, path.rstrip("/"), parse_qs(query), body, writer)
+        except HTTPError as e:
+            await self._send_json(writer, e.status, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logging.exception("Job API request failed")
+            await self._send_json(writer, HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        try:
+            method, path, _ = request_line.split(" ", 2)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1")
+            if line in ("\r\n", "\n", ""):
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), path, headers, body
+
+    async def _route(self, method, path, query, body, writer):
+        parts = [part for part in path.split("/") if part]
+
+        if parts == ["health"] and method == "GET":
+            return await self._send_json(writer, HTTPStatus.OK, self.health())
+
+        if parts == ["metrics"] and method == "GET":
+            body = tracing.prometheus_text().encode()
+            writer.write(self._status_line(HTTPStatus.OK, {
+                "Content-Type": "text/plain; version=0.0.4",
+                "Content-Length": str(len(body)),
+            }) + body)
+            return await writer.drain()
+
+        if parts == ["search"] and method == "GET":
+            text = query.get("q", [""])[0].strip()
+            if not text:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Missing query parameter q")
+            try:
+                limit = int(query.get("limit", ["20"])[0])
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "limit must be an integer")
+            start = time.perf_counter()
+            results = await asyncio.to_thread(
+                corpus.search, text, company=query.get("company", [None])[0],
+                language=query.get("language", [None])[0], limit=limit,
+                highlight=(query.get("highlight_start", ["<b>"])[0], query.get("highlight_end", ["</b>"])[0])
+            )
+            return await self._send_json(writer, HTTPStatus.OK, {
+                "query": text, "results": results, "seconds": round(time.perf_counter() - start, 4),
+            })
+
+        if parts == ["corpus"] and method == "GET":
+            return await self._send_json(writer, HTTPStatus.OK, await asyncio.to_thread(corpus.stats))
+
+        if parts == ["jobs"]:
+            if method == "GET":
+                return await self._send_json(writer, HTTPStatus.OK,
+                                             {"jobs": [job.to_dict(False) for job in self.jobs.values()]})
+            if method == "POST":
+                try:
+                    request = json.loads(body or b"{}")
+                except json.JSONDecodeError as e:
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {e}")
+                if not isinstance(request, dict):
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, "The request body must be a JSON object")
+                job = self.submit(request.get("type"), request.get("params", {}))
+                return await self._send_json(writer, HTTPStatus.ACCEPTED, {"id": job.id, "status": job.status})
+
+        if len(parts) == 2 and parts[0] == "jobs":
+            job = self.get_job(parts[1])
+            if method == "GET":
+                return await self._send_json(writer, HTTPStatus.OK, job.to_dict())
+            if method == "DELETE":
+                if not job.cancel():
+                    raise HTTPError(HTTPStatus.CONFLICT, f"Job {job.id} is {job.status} and cannot be cancelled")
+                return await self._send_json(writer, HTTPStatus.OK, job.to_dict(False))
+
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events" and method == "GET":
+            return await self._stream_events(self.get_job(parts[1]), writer)
+
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {method} {path or '/'}")
+
+    async def _send_json(self, writer, status, payload):
+        body = json.dumps(payload, default=str).encode()
+        writer.write(self._status_line(status, {
+            "Content-Type": "application/json",
+            "Content-Length": str(len(body)),
+        }) + body)
+        await writer.drain()
+
+    @staticmethod
+    def _status_line(status, headers):
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        lines.append("Connection: close")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _stream_events(self, job, writer):
+        """Send the job's events as NDJSON chunks, from the first one until the job ends."""
+        writer.write(self._status_line(HTTPStatus.OK, {
+            "Content-Type": "application/x-ndjson",
+            "Transfer-Encoding": "chunked",
+            "Cache-Control": "no-cache",
+        }))
+        for cursor in itertools.count():
+            await job.wait_for_events(cursor)
+            if cursor >= len(job.events):
+                # Finished with nothing left to send
+                break
+            chunk = (json.dumps(job.events[cursor], default=str) + "\n").encode()
+            writer.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            await writer.drain()
+            if job.events[cursor]["type"] == "finished":
+                break
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def serve(self, host, port):
+        self.loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self.handle, host, port)
+        logging.info(f"Job API listening on http://{host}:{port} with {self.workers} workers")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the scrapers as a local HTTP job API.")
+    parser.add_argument("--host", default=get_setting('job_api_host'))
+    parser.add_argument("--port", type=int, default=get_setting('job_api_port'))
+    parser.add_argument("--workers", type=int, default=None, help="Jobs run at once (default: job_api_workers)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(JobServer(workers=args.workers).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Helpers for calling OpenAI chat completions from the Streamlit apps.
+"""
+import logging
+import random
+import time
+from collections import deque
+
+import streamlit as st
+
+from cxproof import llm_cache, tracing
+from cxproof.config import get_setting
+from cxproof.prompt_packing import count_tokens
+
+
+# Minimum seconds between two re-renders of a streaming placeholder
+RENDER_INTERVAL = 0.05
+
+# Metrics of the most recent model calls in this process
+recent_metrics = deque(maxlen=200)
+
+
+@st.cache_resource(show_spinner=False)
+def get_openai_client(api_key):
+    """
+    Return the process-wide OpenAI client for an API key.
+
+    The client is created once per key and reused across Streamlit reruns, sessions
+    and apps, so calls share one keep-alive connection pool instead of opening a new
+    connection (and TLS handshake) per call. Retries are done by create_with_retries,
+    so the SDK's own retries are disabled.
+    """
+    import importlib
+
+    import openai
+    from openai import DefaultHttpxClient, OpenAI
+
+    # The SDK's http client is built on its own httpx package (httpx2 in newer releases),
+    # whose Limits type it needs; the httpx pinned for the fetch backend may not be it
+    sdk_httpx = importlib.import_module(DefaultHttpxClient.__mro__[1].__module__.split('.')[0])
+    http_client = DefaultHttpxClient(
+        limits=sdk_httpx.Limits(
+            max_connections=get_setting('openai_max_connections'),
+            max_keepalive_connections=get_setting('openai_max_keepalive_connections'),
+            keepalive_expiry=get_setting('openai_keepalive_expiry'),
+        ),
+        timeout=openai.Timeout(get_setting('openai_timeout'), connect=get_setting('openai_connect_timeout')),
+    )
+    return OpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+
+
+def _retry_delay(error, attempt):
+    """Seconds to wait before the next attempt: Retry-After if the API sent one, else exponential backoff."""
+    response = getattr(error, 'response', None)
+    if response is not None:
+        retry_after = response.headers.get('retry-after')
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), get_setting('openai_backoff_max'))
+        except ValueError:
+            pass
+    delay = get_setting('openai_backoff_base') * (2 ** attempt)
+    # Full jitter so parallel callers do not retry in lockstep
+    return random.uniform(0, min(delay, get_setting('openai_backoff_max')))
+
+
+def create_with_retries(client, **kwargs):
+    """
+    Call client.chat.completions.create, retrying rate limits and transient errors.
+
+    Retries 429s, 5xx responses, timeouts and connection errors with exponential
+    backoff (honouring Retry-After); other errors are raised immediately.
+    """
+    import openai
+
+    retryable = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                 openai.InternalServerError)
+    max_retries = get_setting('openai_max_retries')
+
+    for attempt in range(max_retries + 1):
+        try:
+            return client.chat.completions.create(**kwargs)
+        except retryable as e:
+            if attempt >= max_retries:
+                raise
+            delay = _retry_delay(e, attempt)
+            logging.warning(f"OpenAI call failed ({type(e).__name__}), retry {attempt + 1}/{max_retries} "
+                            f"in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def render_markdown(placeholder, text, done):
+    """Default renderer: markdown with a cursor while the answer is still streaming."""
+    placeholder.markdown(text if done else text + " ▌")
+
+
+def stream_chat_completion(client, placeholder=None, render=render_markdown, cache=True, cache_question=None,
+                           **kwargs):
+    """
+    Run a streaming chat completion and render the answer as it arrives.
+
+    Answers are served from the local response cache when the same request (model,
+    parameters, normalized messages and image contents) was answered before.
+
+    Args:
+        client (OpenAI): The OpenAI client
+        placeholder: Streamlit placeholder (st.empty()) to render into, or None
+        render (callable): render(placeholder, text, done) used to draw the partial answer
+        cache (bool): Set to False to bypass the response cache for this call
+        cache_question (str): The question part of a prompt that also carries documents; near-duplicate
+                              answers from the cache are then only matched on it, over the same documents
+        **kwargs: Arguments for client.chat.completions.create (model, messages, max_tokens...)
+
+    Returns:
+        dict: {'text', 'prompt_tokens', 'completion_tokens', 'ttft_s', 'total_s', 'tokens_per_s', 'cache_hit'}
+    """
+    model = kwargs.get('model', '')
+    start = time.perf_counter()
+
+    with tracing.span("llm.completion", model=model) as span:
+        if cache:
+            cached = llm_cache.get(kwargs, question=cache_question)
+            if cached is not None:
+                if placeholder is not None:
+                    render(placeholder, cached['text'], True)
+                elapsed = time.perf_counter() - start
+                metrics = dict(cached, ttft_s=elapsed, total_s=elapsed, cache_hit=True)
+                recent_metrics.append({key: value for key, value in metrics.items() if key != 'text'})
+                logging.info(f"LLM call {model}: served from cache in {elapsed:.3f}s")
+                span.set(cache_hit=True)
+                return metrics
+        stream = create_with_retries(
+            client,
+            stream=True,
+            stream_options={"include_usage": True},
+            **kwargs
+        )
+
+        parts = []
+        ttft = None
+        usage = None
+        last_render = 0.0
+
+        for chunk in stream:
+            if getattr(chunk, 'usage', None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+
+            now = time.perf_counter()
+            if ttft is None:
+                ttft = now - start
+            parts.append(delta)
+
+            if placeholder is not None and now - last_render >= RENDER_INTERVAL:
+                render(placeholder, "".join(parts), False)
+                last_render = now
+
+        total = time.perf_counter() - start
+        text = "".join(parts).strip()
+        if placeholder is not None:
+            render(placeholder, text, True)
+
+        completion_tokens = usage.completion_tokens if usage else count_tokens(text, model)
+        generation_time = total - (ttft or 0.0)
+        metrics = {
+            'model': model,
+            'prompt_tokens': usage.prompt_tokens if usage else None,
+            'completion_tokens': completion_tokens,
+            'ttft_s': ttft if ttft is not None else total,
+            'total_s': total,
+            'tokens_per_s': completion_tokens / generation_time if generation_time > 0 else 0.0,
+            'cache_hit': False,
+        }
+        recent_metrics.append(metrics)
+        span.set(cache_hit=False, prompt_tokens=metrics['prompt_tokens'] or 0,
+                 completion_tokens=completion_tokens, ttft_s=metrics['ttft_s'])
+        logging.info(f"LLM call {model}: TTFT {metrics['ttft_s']:.2f}s, "
+                     f"{completion_tokens} tokens at {metrics['tokens_per_s']:.1f} tokens/s")
+
+        result = dict(metrics, text=text)
+        if cache and text:
+            llm_cache.put(kwargs, result, question=cache_question)
+        return result
+
+
+def format_metrics(metrics):
+    """One-line summary of a call's latency metrics for st.caption."""
+    if metrics.get('cache_hit'):
+        return f"⚡ Served from the response cache in {metrics['total_s']:.3f}s"
+    return (f"⏱️ First token after {metrics['ttft_s']:.2f}s · {metrics['completion_tokens']} tokens "
+            f"in {metrics['total_s']:.2f}s ({metrics['tokens_per_s']:.1f} tokens/s)")
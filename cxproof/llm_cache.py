@@ -0,0 +1,246 @@
+"""
+Local cache of LLM responses.
+
+Responses are stored in a SQLite database under the data directory, keyed on the
+model, the request parameters and the normalized messages. Images are keyed on a
+hash of their content (registered at upload time for S3 URLs), so re-captured
+screenshots of an unchanged page hit the cache even though they get new URLs.
+
+Entries expire after a TTL and the least recently used ones are evicted once the
+cache holds more than llm_cache_max_entries. Optionally, a prompt that is not an
+exact match can be answered from a near-duplicate prompt over the same images,
+using a local hashed n-gram embedding. When the caller names the question of a
+prompt that also carries documents (such as case study texts), only the question
+is embedded and the documents must be exactly the same, so the long shared text
+does not make different questions look alike.
+"""
+import base64
+import hashlib
+import json
+import math
+import re
+import sqlite3
+import struct
+import time
+from array import array
+from contextlib import contextmanager
+
+from cxproof.config import data_path, get_setting
+
+
+EMBEDDING_DIMENSIONS = 512
+
+# Parameters that change the answer and therefore belong in the cache key
+KEY_PARAMETERS = ('max_tokens', 'temperature', 'top_p', 'response_format', 'seed')
+
+_WHITESPACE = re.compile(r'\s+')
+_WORD = re.compile(r'\w+')
+
+
+@contextmanager
+def _connect():
+    """Open the cache database, commit on success and always close it."""
+    connection = sqlite3.connect(data_path('llm_cache.sqlite3'), timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            scope TEXT NOT NULL,
+            prompt TEXT NOT NULL,
+            embedding BLOB,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+    """)
+    connection.execute("CREATE INDEX IF NOT EXISTS responses_scope ON responses (scope)")
+    connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS image_hashes (
+            url TEXT PRIMARY KEY,
+            digest TEXT NOT NULL
+        )
+    """)
+    try:
+        yield connection
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def hash_bytes(data):
+    """Content hash used for images."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def register_image_hash(url, digest):
+    """Remember the content hash of an uploaded image so prompts referencing its URL can be cached."""
+    with _connect() as connection:
+        connection.execute("INSERT OR REPLACE INTO image_hashes (url, digest) VALUES (?, ?)", (url, digest))
+
+
+def _image_key(url, connection):
+    """Content hash of an image URL: decoded data URLs are hashed, other URLs use the registered hash."""
+    if url.startswith('data:'):
+        _, _, payload = url.partition(',')
+        try:
+            return 'sha256:' + hash_bytes(base64.b64decode(payload))
+        except ValueError:
+            return 'sha256:' + hash_bytes(payload.encode())
+    row = connection.execute("SELECT digest FROM image_hashes WHERE url = ?", (url,)).fetchone()
+    return 'sha256:' + row[0] if row else url
+
+
+def _normalize_messages(messages, connection):
+    """
+    Normalize messages for keying.
+
+    Returns:
+        tuple: (normalized messages, prompt text, image keys)
+    """
+    normalized = []
+    texts = []
+    images = []
+    for message in messages:
+        content = message.get('content')
+        if isinstance(content, str):
+            text = _WHITESPACE.sub(' ', content).strip()
+            texts.append(text)
+            normalized.append({'role': message.get('role'), 'content': text})
+            continue
+
+        parts = []
+        for part in content or []:
+            if part.get('type') == 'text':
+                text = _WHITESPACE.sub(' ', part.get('text', '')).strip()
+                texts.append(text)
+                parts.append({'type': 'text', 'text': text})
+            elif part.get('type') == 'image_url':
+                image = part.get('image_url', {})
+                image_key = _image_key(image.get('url', ''), connection)
+                images.append(image_key)
+                parts.append({'type': 'image', 'image': image_key, 'detail': image.get('detail', 'auto')})
+            else:
+                parts.append(part)
+        normalized.append({'role': message.get('role'), 'content': parts})
+
+    return normalized, "\n".join(texts), images
+
+
+def embed(text):
+    """
+    Local text embedding: word and character trigram features hashed into a fixed-size unit vector.
+
+    Cheap and dependency free; good enough to spot the same prompt with small edits.
+    """
+    vector = [0.0] * EMBEDDING_DIMENSIONS
+    text = text.lower()
+    features = _WORD.findall(text)
+    features += [text[i:i + 3] for i in range(max(0, len(text) - 2))]
+    for feature in features:
+        digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+        bucket, sign = struct.unpack('<IxxxB', digest)
+        vector[bucket % EMBEDDING_DIMENSIONS] += 1.0 if sign & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return array('f', (v / norm for v in vector))
+
+
+def _cosine(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+def _request_key(kwargs, connection, question=None):
+    """
+    Return (exact key, semantic scope, text to embed) for a chat completion request.
+
+    With a question, the text to embed is the question alone and the scope includes a
+    hash of the rest of the prompt, so near-duplicate questions only match over the same documents.
+    """
+    messages, prompt, images = _normalize_messages(kwargs.get('messages', []), connection)
+    parameters = {name: kwargs[name] for name in KEY_PARAMETERS if name in kwargs}
+    scope = {'model': kwargs.get('model'), 'parameters': parameters, 'images': images}
+    if question:
+        question = _WHITESPACE.sub(' ', question).strip()
+        scope['documents'] = hash_bytes(prompt.replace(question, '', 1).encode())
+        prompt = question
+    scope_source = json.dumps(scope, sort_keys=True, default=str)
+    key_source = json.dumps({'scope': scope_source, 'messages': messages}, sort_keys=True, default=str)
+    return (hashlib.sha256(key_source.encode()).hexdigest(),
+            hashlib.sha256(scope_source.encode()).hexdigest(),
+            prompt)
+
+
+def get(kwargs, semantic=None, question=None):
+    """
+    Look up a cached response for a chat completion request.
+
+    Args:
+        kwargs (dict): Arguments of the chat.completions.create call
+        semantic (bool): Also accept near-duplicate prompts; defaults to the llm_cache_semantic setting
+        question (str): The question part of a prompt that also carries documents, if any
+
+    Returns:
+        dict: The cached response (as stored by put), or None
+    """
+    if not get_setting('llm_cache_enabled'):
+        return None
+    if semantic is None:
+        semantic = get_setting('llm_cache_semantic')
+
+    now = time.time()
+    with _connect() as connection:
+        key, scope, prompt = _request_key(kwargs, connection, question)
+        connection.execute("DELETE FROM responses WHERE created_at < ?", (now - get_setting('llm_cache_ttl'),))
+
+        row = connection.execute("SELECT key, response FROM responses WHERE key = ?", (key,)).fetchone()
+
+        if row is None and semantic:
+            query = embed(prompt)
+            threshold = get_setting('llm_cache_semantic_threshold')
+            best = None
+            for candidate_key, blob, response in connection.execute(
+                    "SELECT key, embedding, response FROM responses WHERE scope = ?", (scope,)):
+                similarity = _cosine(query, array('f', blob))
+                if similarity >= threshold and (best is None or similarity > best[0]):
+                    best = (similarity, candidate_key, response)
+            if best:
+                row = (best[1], best[2])
+
+        if row is None:
+            return None
+
+        connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, row[0]))
+        return json.loads(row[1])
+
+
+def put(kwargs, response, question=None):
+    """
+    Store the response of a chat completion request and evict the least recently used entries.
+
+    Args:
+        kwargs (dict): Arguments of the chat.completions.create call
+        response (dict): JSON-serializable response (text and metrics)
+        question (str): The question part of a prompt that also carries documents, if any
+    """
+    if not get_setting('llm_cache_enabled'):
+        return
+
+    now = time.time()
+    with _connect() as connection:
+        key, scope, prompt = _request_key(kwargs, connection, question)
+        connection.execute(
+            "INSERT OR REPLACE INTO responses (key, scope, prompt, embedding, response, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, scope, prompt, embed(prompt).tobytes(), json.dumps(response), now, now)
+        )
+        connection.execute("""
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        """, (get_setting('llm_cache_max_entries'),))
+
+
+def clear():
+    """Remove every cached response."""
+    with _connect() as connection:
+        connection.execute("DELETE FROM responses")
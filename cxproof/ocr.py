@@ -0,0 +1,109 @@
+"""
+Optional local OCR of screenshot sections.
+
+Sections that are plain text (high OCR confidence and nearly all of their
+content covered by recognized words) can be analyzed with a cheap text-only
+prompt instead of a vision call. Needs pytesseract and the tesseract binary;
+without them every section goes through the vision path.
+"""
+import logging
+import time
+
+
+# Thresholds for sending a section as text
+MIN_CONFIDENCE = 80.0
+MIN_WORDS = 15
+MIN_TEXT_COVERAGE = 0.85
+
+_available = None
+
+
+def is_available():
+    """True if pytesseract and the tesseract binary can be used."""
+    global _available
+    if _available is None:
+        try:
+            import pytesseract
+            pytesseract.get_tesseract_version()
+            _available = True
+        except Exception:
+            _available = False
+    return _available
+
+
+def ocr_section(path):
+    """
+    Run OCR on one section and decide how it should be analyzed.
+
+    Args:
+        path (str): Image file of the section
+
+    Returns:
+        dict: {'route': 'text' or 'vision', 'text', 'confidence', 'words', 'coverage', 'latency_s'}
+    """
+    import numpy as np
+    import pytesseract
+    from PIL import Image
+
+    from cxproof.tiling import BLANK_THRESHOLD, cut_scores, row_variance
+
+    start = time.perf_counter()
+    img = Image.open(path)
+    data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT)
+
+    lines = {}
+    confidences = []
+    covered = np.zeros(img.height, dtype=bool)
+    for i, word in enumerate(data['text']):
+        confidence = float(data['conf'][i])
+        if not word.strip() or confidence < 0:
+            continue
+        confidences.append(confidence)
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        lines.setdefault(key, []).append(word)
+        top = data['top'][i]
+        covered[top:top + data['height'][i]] = True
+
+    # Share of the section's non-blank rows that hold recognized words
+    content = cut_scores(row_variance(img)) > BLANK_THRESHOLD
+    coverage = float(np.count_nonzero(covered & content) / max(1, np.count_nonzero(content)))
+    confidence = float(np.mean(confidences)) if confidences else 0.0
+
+    is_text = (confidence >= MIN_CONFIDENCE and len(confidences) >= MIN_WORDS
+               and coverage >= MIN_TEXT_COVERAGE)
+
+    return {
+        'route': 'text' if is_text else 'vision',
+        'text': "\n".join(" ".join(words) for words in lines.values()),
+        'confidence': confidence,
+        'words': len(confidences),
+        'coverage': coverage,
+        'latency_s': time.perf_counter() - start,
+    }
+
+
+def route_sections(paths):
+    """
+    OCR every section and log the routing decision.
+
+    Returns:
+        list: One ocr_section result per path (route 'vision' for all when OCR is unavailable)
+    """
+    if not is_available():
+        logging.info("Local OCR unavailable, all sections use the vision path")
+        return [{'route': 'vision', 'text': '', 'confidence': 0.0, 'words': 0, 'coverage': 0.0, 'latency_s': 0.0}
+                for _ in paths]
+
+    results = []
+    for i, path in enumerate(paths, 1):
+        try:
+            result = ocr_section(path)
+        except Exception as e:
+            logging.warning(f"OCR of section {i} failed: {e}")
+            result = {'route': 'vision', 'text': '', 'confidence': 0.0, 'words': 0, 'coverage': 0.0,
+                      'latency_s': 0.0}
+        logging.info(f"Section {i}: route={result['route']} confidence={result['confidence']:.0f} "
+                     f"words={result['words']} coverage={result['coverage']:.2f} "
+                     f"ocr={result['latency_s'] * 1000:.0f}ms")
+        results.append(result)
+    return results
@@ -0,0 +1,403 @@
+"""
+Product page capture and analysis.
+
+Captures a full-page screenshot of a product page, splits it into sections,
+uploads them to S3 and extracts the product text from every section with a
+vision (or, for OCR-read text sections, text-only) model. Used by the product
+info scraper app and the job API.
+"""
+import logging
+import os
+import uuid
+
+import streamlit as st
+
+from cxproof import capture_cache, fetch, llm_cache, tracing
+from cxproof.config import get_setting
+from cxproof.llm import get_openai_client, stream_chat_completion
+from cxproof.scratch import scratch_space
+from cxproof.screenshot_backends import get_screenshot_backend
+from cxproof.vision import PRODUCT_TEXT_RESPONSE_FORMAT, SectionResult, combine_sections, parse_section_output
+
+
+def _s3_settings():
+    """AWS credentials and bucket, read from the secrets when first needed so importing needs no secrets."""
+    return {
+        'access_key': st.secrets["AWS_ACCESS_KEY"],
+        'secret_key': st.secrets["AWS_SECRET_KEY"],
+        'bucket': st.secrets["AWS_BUCKET_NAME"],
+        'region': st.secrets["AWS_REGION"],
+    }
+
+
+def _parse_page_metadata(content):
+    """Title, description and DOM fingerprint of an HTML page, or None if it has neither title nor description"""
+    with tracing.span("metadata.parse", bytes=len(content)):
+        return _extract_page_metadata(content)
+
+
+def _extract_page_metadata(content):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, 'html.parser')
+    title = soup.title.string.strip() if soup.title and soup.title.string else ""
+
+    description = ""
+    meta_desc = soup.find("meta", attrs={"name": "description"})
+    if meta_desc and meta_desc.get("content"):
+        description = meta_desc.get("content").strip()
+
+    if not description:
+        og_desc = soup.find("meta", attrs={"property": "og:description"})
+        if og_desc and og_desc.get("content"):
+            description = og_desc.get("content").strip()
+
+    if title or description:
+        return {"title": title, "description": description, "dom_hash": capture_cache.dom_fingerprint(soup)}
+    return None
+
+
+def get_page_metadata(url):
+    """Extract title, metadata and a DOM fingerprint from a webpage with multiple request strategies"""
+    logging.info(f"Starting metadata extraction for: {url}")
+
+    # Strategy 1: Standard session of the configured fetch backend (cloudscraper by default)
+    try:
+        scraper = fetch.create_scraper()
+
+        with tracing.span("metadata.fetch", url=url, strategy=1) as span:
+            response = scraper.get(url, timeout=15, allow_redirects=True)
+            span.set(status=response.status_code, bytes=len(response.content))
+        logging.info(f"Strategy 1 status code: {response.status_code}")
+
+        if response.status_code == 200:
+            metadata = _parse_page_metadata(response.content)
+            if metadata:
+                return metadata
+    except Exception as e:
+        logging.error(f"Strategy 1 failed: {str(e)}")
+
+    # Strategy 2: Try with standard requests library and different user agent
+    if "strategy_1_failed" or response.status_code != 200:
+        try:
+            import requests
+            headers = {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                'Accept': 'text/html,application/xhtml+xml',
+                'Accept-Language': 'en-US,en;q=0.9',
+                'Referer': 'https://www.google.com/'  # Sometimes helps bypass restrictions
+            }
+
+            with tracing.span("metadata.fetch", url=url, strategy=2) as span:
+                response = requests.get(url, headers=headers, timeout=15, allow_redirects=True)
+                span.set(status=response.status_code, bytes=len(response.content))
+            logging.info(f"Strategy 2 status code: {response.status_code}")
+
+            if response.status_code == 200:
+                metadata = _parse_page_metadata(response.content)
+                if metadata:
+                    return metadata
+        except Exception as e:
+            logging.error(f"Strategy 2 failed: {str(e)}")
+
+    # Strategy 3: Try mobile user agent
+    try:
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Mobile/15E148 Safari/604.1',
+            'Accept': 'text/html,application/xhtml+xml',
+            'Accept-Language': 'en-US,en;q=0.9'
+        }
+
+        import requests
+        with tracing.span("metadata.fetch", url=url, strategy=3) as span:
+            response = requests.get(url, headers=headers, timeout=15, allow_redirects=True)
+            span.set(status=response.status_code, bytes=len(response.content))
+        logging.info(f"Strategy 3 status code: {response.status_code}")
+
+        if response.status_code == 200:
+            metadata = _parse_page_metadata(response.content)
+            if metadata:
+                return metadata
+    except Exception as e:
+        logging.error(f"Strategy 3 failed: {str(e)}")
+
+    # If all strategies fail, return error
+    return {
+        "title": "Unable to access page content",
+        "description": "This page appears to be blocking automated access",
+        "error": "All access strategies failed"
+    }
+
+
+# Function to split long screenshot into multiple images
+def split_long_screenshot(input_image, scratch):
+    from PIL import Image
+
+    from cxproof.tiling import find_cut_points
+
+    page_height = get_setting('screenshot_tile_height')  # Target height of each page in pixels
+    unique_id = str(uuid.uuid4())
+    image_files = []
+
+    # Open the image
+    img = Image.open(input_image)
+    print(f"Processing image: {img.width}x{img.height} pixels")
+
+    # Find cut points at blank rows so no text line is sliced
+    cuts = find_cut_points(img, tile_height=page_height, max_tiles=get_setting('screenshot_max_tiles'))
+    num_pages = len(cuts) - 1
+    print(f"Splitting into {num_pages} pages...")
+
+    # Split into pages
+    for i in range(num_pages):
+        # Crop the image between two cut points
+        page = img.crop((0, cuts[i], img.width, cuts[i + 1]))
+
+        # Convert to RGB mode if necessary
+        if page.mode != 'RGB':
+            page = page.convert('RGB')
+
+        # Save each page as a separate image with a unique filename
+        page_filename = scratch.path(f"screenshot_part_{unique_id}_{i + 1}.png")
+        page.save(page_filename)
+        scratch.check_quota()
+        image_files.append(page_filename)
+        print(f"Created image: {page_filename}")
+
+    # Clean up the original screenshot
+    os.remove(input_image)
+
+    return image_files
+
+
+# Function to take screenshot
+def take_screenshot(url, use_ocr=False, backend=None):
+    from cxproof.image_prep import prepare_images
+    from cxproof.ocr import route_sections
+
+    try:
+        # Fetch the page first: if its DOM is unchanged since the last capture, reuse that capture
+        metadata = get_page_metadata(url)
+        dom_hash = metadata.pop("dom_hash", None)
+        with tracing.span("capture_cache.lookup") as span:
+            cached = capture_cache.get_capture(url, dom_hash)
+            if cached and use_ocr and not all(cached["ocr"]):
+                # Captured without OCR; capture again to read the text sections
+                cached = None
+            span.set(cache_hit=cached is not None)
+        if cached:
+            logging.info(f"Page unchanged since last capture, reusing {len(cached['image_urls'])} sections")
+            cached["metadata"] = metadata
+            cached["cached"] = True
+            return cached
+
+        # All temporary files live in a scratch directory that is removed however the capture ends
+        with scratch_space() as scratch:
+            # Capture with the configured backend (ScreenshotOne API or local headless Chrome)
+            with tracing.span("screenshot.capture", backend=backend or get_setting('screenshot_backend')) as span:
+                screenshot_bytes = get_screenshot_backend(backend).capture(url)
+                span.set(bytes=len(screenshot_bytes))
+
+            # Generate a temporary filename for the screenshot
+            temp_screenshot = scratch.path(f"temp_screenshot_{str(uuid.uuid4())}.png")
+
+            with open(temp_screenshot, 'wb') as f:
+                f.write(screenshot_bytes)
+            scratch.check_quota()
+
+            # Call the split_long_screenshot function to create multiple images
+            with tracing.span("screenshot.split") as span:
+                image_files = split_long_screenshot(temp_screenshot, scratch)
+                span.set(sections=len(image_files))
+
+            # Sections already uploaded with the same bytes reuse their S3 object; only new
+            # sections are processed and uploaded (even if they look like the last capture's)
+            with tracing.span("sections.lookup", sections=len(image_files)) as span:
+                fingerprints = [capture_cache.section_fingerprint(image) for image in image_files]
+                known = [capture_cache.find_section(content_hash) for content_hash, _ in fingerprints]
+                new_files = [image for image, record in zip(image_files, known)
+                             if not record or (use_ocr and not record.get("ocr"))]
+                layout_unchanged = sum(capture_cache.looks_unchanged(phash, url)
+                                       for (_, phash), record in zip(fingerprints, known) if not record)
+                span.set(cache_hit=len(image_files) - len(new_files), layout_unchanged=layout_unchanged)
+            logging.info(f"{len(image_files) - len(new_files)} of {len(image_files)} sections reused from earlier captures, "
+                         f"{layout_unchanged} new sections with an unchanged layout")
+
+            # Optionally OCR the full-resolution sections to find plain text ones
+            if use_ocr:
+                with tracing.span("ocr.route", sections=len(new_files)):
+                    ocr_results = route_sections(new_files)
+            else:
+                ocr_results = [None] * len(new_files)
+
+            # Downscale and re-encode the sections for the vision model
+            with tracing.span("images.prepare", sections=len(new_files)) as span:
+                prepared, preprocessing = prepare_images(new_files)
+                span.set(bytes=preprocessing['bytes'], bytes_saved=preprocessing['bytes_saved'],
+                         vision_tokens=preprocessing['tokens'])
+            logging.info(f"Preprocessing saved {preprocessing['bytes_saved']} bytes and "
+                         f"~{preprocessing['tokens_saved']} vision tokens")
+            processed = {image['path']: (image, ocr) for image, ocr in zip(prepared, ocr_results)}
+
+            # Upload the new images to S3 and assemble all sections in page order
+            s3_urls = []
+            image_details = []
+            section_ocr = []
+            section_hashes = []
+            for image_file, (content_hash, phash), record in zip(image_files, fingerprints, known):
+                if image_file in processed:
+                    image, ocr = processed[image_file]
+                    s3_url = upload_to_s3(image['path'])
+                    if not s3_url:
+                        continue
+                    record = {"s3_url": s3_url, "detail": image['detail'], "ocr": ocr, "tokens": image['tokens']}
+                    capture_cache.store_section(content_hash, phash, record)
+                else:
+                    preprocessing['original_tokens'] += record.get("tokens", 0)
+                    preprocessing['tokens'] += record.get("tokens", 0)
+                s3_urls.append(record["s3_url"])
+                image_details.append(record["detail"])
+                section_ocr.append(record["ocr"])
+                section_hashes.append(content_hash)
+            preprocessing['reused_sections'] = len(image_files) - len(new_files)
+            preprocessing['layout_unchanged_sections'] = layout_unchanged
+            preprocessing['scratch_peak_bytes'] = scratch.peak_bytes
+
+            # Store metadata in the result
+            result = {
+                "image_urls": s3_urls,
+                "image_details": image_details,
+                "ocr": section_ocr,
+                "preprocessing": preprocessing,
+                "metadata": metadata
+            }
+
+        if not s3_urls:
+            return None
+        capture_cache.store_capture(url, dom_hash, section_hashes, result)
+        return result
+
+
+    except Exception as e:
+        print(f"❌ Screenshot capture failed: {e}")
+        return None
+
+
+# Function to upload file to AWS S3
+def upload_to_s3(file_name):
+    import boto3
+
+    try:
+        aws = _s3_settings()
+        s3_client = boto3.client('s3', aws_access_key_id=aws['access_key'], aws_secret_access_key=aws['secret_key'],
+                                 region_name=aws['region'])
+
+        # Hash the content so AI results for this image can be cached across captures
+        with open(file_name, 'rb') as f:
+            digest = llm_cache.hash_bytes(f.read())
+
+        # The local file lives in a scratch space and is removed with it
+        key = os.path.basename(file_name)
+        with tracing.span("s3.upload", bytes=os.path.getsize(file_name)):
+            s3_client.upload_file(file_name, aws['bucket'], key)
+        s3_url = f"https://{aws['bucket']}.s3.{aws['region']}.amazonaws.com/{key}"
+        llm_cache.register_image_hash(s3_url, digest)
+        return s3_url
+    except Exception as e:
+        print(f"❌ S3 upload failed: {e}")
+        return None
+
+# Function to process multiple images with AI
+def process_multiple_images_with_ai(image_urls, page_metadata, prompt, model="gpt-4o", placeholder=None,
+                                    use_cache=True, structured=True, image_details=None, ocr_results=None):
+    client = get_openai_client(st.secrets["OPENAI_API_KEY"])  # Shared, long-lived client
+
+    all_results = []
+
+    total_images = len(image_urls)
+
+    # Determine how many images to process based on the new logic
+    if total_images >= 9:
+        # If 9+ images, process half
+        images_to_process = total_images // 2
+    elif total_images >= 6:
+        # If 6-8 images, process exactly 6
+        images_to_process = 6
+    else:
+        # If 5 or fewer, process all of them
+        images_to_process = total_images
+
+    # Use only the determined number of images for processing
+    images_to_process_list = image_urls[:images_to_process]
+
+    # Add metadata to the start of each prompt
+    metadata_text = f"Page Title: {page_metadata['title']}\nPage Description: {page_metadata['description']}\n\n"
+
+    # In structured mode the model must answer with {"product_raw_text": ...}
+    extra_options = {"response_format": PRODUCT_TEXT_RESPONSE_FORMAT} if structured else {}
+
+    for i, img_url in enumerate(images_to_process_list):
+        try:
+            # Create a modified prompt to indicate which section it is
+            section_prompt = f"{metadata_text}{prompt}\n\n(This is section {i + 1} of {images_to_process} from the webpage screenshot.)"
+
+
+            # Text-heavy sections that were read with local OCR are sent as text only
+            ocr = ocr_results[i] if ocr_results else None
+            if ocr and ocr["route"] == "text":
+                route = "text"
+                content = f"{section_prompt}\n\nText of this section (read with OCR):\n{ocr['text']}"
+            else:
+                route = "vision"
+                content = [
+                    {"type": "text", "text": section_prompt},
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": img_url,
+                                      "detail": image_details[i] if image_details else "auto"}
+                    }
+                ]
+
+            # Make API call for this section, streaming the answer into the placeholder
+            if placeholder is not None:
+                placeholder.markdown(f"**Section {i + 1} of {images_to_process}**")
+            response = stream_chat_completion(
+                client,
+                placeholder=placeholder,
+                cache=use_cache,
+                render=lambda ph, text, done, section=i + 1: ph.markdown(
+                    f"**Section {section} of {images_to_process}**\n\n{text}" + ("" if done else " ▌")),
+                model=model,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": content
+                    }
+                ],
+                max_tokens=1500,
+                **extra_options
+            )
+            logging.info(f"Section {i + 1}: {route} call took {response['total_s']:.2f}s")
+
+            result_text = response["text"]
+
+            all_results.append(SectionResult(
+                section=i + 1,
+                image_url=img_url,
+                result=result_text,
+                text=parse_section_output(result_text),
+                route=route,
+                metrics={key: value for key, value in response.items() if key != "text"}
+            ))
+
+        except Exception as e:
+            all_results.append(SectionResult(section=i + 1, image_url=img_url, error=str(e)))
+
+    # Merge the sections once, without the text repeated by overlapping sections
+    combined_text, duplicates_removed = combine_sections(all_results)
+
+    return {
+        "combined_result": combined_text,
+        "duplicate_sentences_removed": duplicates_removed,
+        "section_results": [record.to_dict() for record in all_results]
+    }
@@ -0,0 +1,357 @@
+"""
+Token-aware prompt packing for the case study analysis.
+
+Case study bodies are measured with a local tokenizer, stripped of boilerplate
+that is shared across documents (cookie notices, CTAs, "related stories"...) when
+they do not fit the budget as they are, and trimmed to a fair per-document token budget. Large sets are handled with a
+map-reduce pass: chunks of case studies are summarized in parallel and the
+summaries are combined with the user's prompt in a final call. A chunk whose
+summary fails is left out of the final call (which is told so) instead of
+failing the whole analysis.
+"""
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cxproof import tracing
+
+
+# Context window sizes for the models offered in the apps
+MODEL_CONTEXT_TOKENS = {
+    'gpt-4o': 128000,
+    'gpt-4o-mini': 128000,
+    'gpt-3.5-turbo': 16385,
+}
+
+# Input tokens we are willing to spend on case study content in a single request
+DEFAULT_INPUT_BUDGET = 24000
+
+# Sets larger than this always go through map-reduce
+MAP_REDUCE_MIN_DOCUMENTS = 8
+
+# Boilerplate must appear in at least this many documents, and sentences shorter than this
+# many words (headings like "The Challenge", short results) are never taken for boilerplate
+BOILERPLATE_MIN_DOCUMENTS = 3
+BOILERPLATE_MIN_WORDS = 6
+
+MAP_PROMPT = ("Summarize the following case studies. Keep every concrete fact about the company: "
+              "products used, customer names, industries, use cases, metrics and quotes. "
+              "Be concise and do not add information that is not in the text.")
+
+_encodings = {}
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+_NORMALIZE = re.compile(r'[\W_]+')
+
+
+def _get_encoding(model):
+    """Return a tiktoken encoding for the model, or None if it is unavailable offline."""
+    if model not in _encodings:
+        try:
+            import tiktoken
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encodings[model] = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            # tiktoken missing or its BPE file could not be loaded
+            _encodings[model] = None
+    return _encodings[model]
+
+
+def count_tokens(text, model="gpt-4o"):
+    """
+    Count the tokens of a text for the given model.
+
+    Falls back to a ~4 characters per token estimate when no tokenizer is available.
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text, max_tokens, model="gpt-4o"):
+    """Cut a text down to at most max_tokens tokens."""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def strip_shared_boilerplate(bodies, min_share=0.5, min_documents=BOILERPLATE_MIN_DOCUMENTS,
+                             min_words=BOILERPLATE_MIN_WORDS):
+    """
+    Remove sentences that appear in many of the documents.
+
+    Bodies are cleaned line by line, so their paragraphs and list items stay on separate
+    lines; lines left without any sentence are dropped.
+
+    Args:
+        bodies (list): Case study body texts
+        min_share (float): Fraction of documents a sentence must appear in to count as boilerplate
+        min_documents (int): Documents a sentence must appear in at least to count as boilerplate
+        min_words (int): Sentences with fewer words are always kept
+
+    Returns:
+        tuple: (list of cleaned bodies, number of sentences removed)
+    """
+    if len(bodies) < min_documents:
+        return list(bodies), 0
+
+    split_bodies = [[_SENTENCE_SPLIT.split(line) for line in body.split("\n")] for body in bodies]
+
+    # Count in how many documents each normalized sentence appears
+    document_counts = {}
+    for lines in split_bodies:
+        for key in {_NORMALIZE.sub(' ', s).strip().lower() for sentences in lines for s in sentences}:
+            if len(key.split()) >= min_words:
+                document_counts[key] = document_counts.get(key, 0) + 1
+
+    threshold = max(min_documents, int(len(bodies) * min_share + 0.5))
+    boilerplate = {key for key, count in document_counts.items() if count >= threshold}
+
+    cleaned = []
+    removed = 0
+    for lines in split_bodies:
+        kept_lines = []
+        for sentences in lines:
+            kept = []
+            for sentence in sentences:
+                if _NORMALIZE.sub(' ', sentence).strip().lower() in boilerplate:
+                    removed += 1
+                else:
+                    kept.append(sentence)
+            # Blank lines (paragraph breaks) are kept, lines that only held boilerplate are not
+            if kept or not any(sentence.strip() for sentence in sentences):
+                kept_lines.append(" ".join(kept))
+        cleaned.append("\n".join(kept_lines).strip("\n"))
+
+    return cleaned, removed
+
+
+def allocate_budget(token_counts, total_budget):
+    """
+    Split a token budget between documents.
+
+    Short documents keep all their tokens, the remaining budget is shared evenly
+    between the longer ones.
+
+    Args:
+        token_counts (list): Token count of every document
+        total_budget (int): Tokens available for all documents together
+
+    Returns:
+        list: Token budget per document, in the same order
+    """
+    budgets = [0] * len(token_counts)
+    remaining = sorted(range(len(token_counts)), key=lambda i: token_counts[i])
+    budget_left = total_budget
+
+    while remaining:
+        fair_share = budget_left // len(remaining)
+        index = remaining[0]
+        if token_counts[index] <= fair_share:
+            budgets[index] = token_counts[index]
+            budget_left -= token_counts[index]
+            remaining.pop(0)
+        else:
+            # Every remaining document is longer than the fair share
+            for index in remaining:
+                budgets[index] = fair_share
+            break
+
+    return budgets
+
+
+def format_case_studies(case_studies, bodies, header="Here are the case studies I found:"):
+    """Format case studies into the prompt layout used by the case study scraper."""
+    parts = [f"{header}\n\n"]
+    for i, (case_study, body) in enumerate(zip(case_studies, bodies), 1):
+        parts.append(f"--- Case Study {i} ---\n")
+        parts.append(f"Title: {case_study['title']}\n")
+        parts.append(f"URL: {case_study['url']}\n")
+        parts.append(f"Content:\n{body}\n\n")
+    return "".join(parts)
+
+
+def pack_case_studies(case_studies, model="gpt-4o", input_budget=DEFAULT_INPUT_BUDGET):
+    """
+    Prepare case study bodies for a prompt.
+
+    Args:
+        case_studies (list): List of case study dictionaries
+        model (str): Model used for token counting
+        input_budget (int): Tokens available for all case study bodies
+
+    Returns:
+        dict: The trimmed bodies, the full bodies (without shared boilerplate if they did not fit
+            the budget), token counts and packing statistics
+    """
+    bodies = [case_study.get('body') or '' for case_study in case_studies]
+    original_tokens = sum(count_tokens(body, model) for body in bodies)
+
+    removed_sentences = 0
+    if original_tokens > input_budget:
+        bodies, removed_sentences = strip_shared_boilerplate(bodies)
+    token_counts = [count_tokens(body, model) for body in bodies]
+    budgets = allocate_budget(token_counts, input_budget)
+
+    return {
+        'bodies': [fit_to_budget(body, count, budget, model)
+                   for body, count, budget in zip(bodies, token_counts, budgets)],
+        'full_bodies': bodies,
+        'token_counts': token_counts,
+        'stats': {
+            'original_tokens': original_tokens,
+            'boilerplate_sentences_removed': removed_sentences,
+            'tokens_after_boilerplate': sum(token_counts),
+            'packed_tokens': sum(min(c, b) for c, b in zip(token_counts, budgets)),
+        }
+    }
+
+
+def fit_to_budget(body, token_count, budget, model="gpt-4o"):
+    """Return the body unchanged if it fits in the budget, truncated otherwise."""
+    if token_count <= budget:
+        return body
+    return truncate_to_tokens(body, budget, model)
+
+
+def chunk_documents(token_counts, chunk_budget, max_documents=MAP_REDUCE_MIN_DOCUMENTS // 2):
+    """Group document indexes into consecutive chunks that fit in chunk_budget tokens."""
+    chunks = []
+    current = []
+    current_tokens = 0
+    for i, count in enumerate(token_counts):
+        if current and (current_tokens + count > chunk_budget or len(current) >= max_documents):
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(i)
+        current_tokens += count
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def analyze_case_studies(case_studies, prompt, complete, model="gpt-4o",
+                         input_budget=DEFAULT_INPUT_BUDGET, max_output_tokens=2000,
+                         map_output_tokens=600, max_workers=4, final_complete=None):
+    """
+    Run the prompt over the case studies, using map-reduce for large sets.
+
+    Small sets are sent in one request with every body trimmed to its share of
+    input_budget. Large sets (many documents, or far more text than the budget)
+    are summarized chunk by chunk in parallel and the summaries are combined.
+
+    Args:
+        case_studies (list): List of case study dictionaries
+        prompt (str): Prompt for the AI
+        complete (callable): complete(content, max_tokens, question) -> dict with 'text', 'prompt_tokens'
+                             and 'completion_tokens'; performs one model call. question is the
+                             instruction at the end of content (e.g. for the response cache)
+        model (str): OpenAI model, used for token counting and context limits
+        input_budget (int): Tokens to spend on case study content per request
+        max_output_tokens (int): Output tokens for the final answer
+        map_output_tokens (int): Output tokens for every chunk summary
+        max_workers (int): Parallel map calls
+        final_complete (callable): Same signature as complete, used for the last call only
+                                   (e.g. to stream the answer into the UI); defaults to complete
+
+    Returns:
+        dict: {'text': final answer, 'mode': 'direct' or 'map-reduce', 'stages': [...], 'packing': {...},
+               'omitted': numbers (1-based) of the case studies left out because their chunk summary failed}
+    """
+    stages = []
+    context_tokens = MODEL_CONTEXT_TOKENS.get(model, 16385)
+    prompt_tokens = count_tokens(prompt, model)
+    input_budget = max(1000, min(input_budget, context_tokens - max_output_tokens - prompt_tokens - 500))
+
+    start = time.perf_counter()
+    with tracing.span("prompt.pack", documents=len(case_studies)) as span:
+        packing = pack_case_studies(case_studies, model, input_budget)
+        stats = packing['stats']
+        span.set(original_tokens=stats['original_tokens'], packed_tokens=stats['packed_tokens'])
+    stages.append({
+        'stage': 'pack',
+        'calls': 0,
+        'input_tokens': stats['original_tokens'],
+        'output_tokens': stats['packed_tokens'],
+        'latency_s': time.perf_counter() - start,
+    })
+
+    use_map_reduce = (len(case_studies) > MAP_REDUCE_MIN_DOCUMENTS
+                      or stats['tokens_after_boilerplate'] > 2 * input_budget)
+
+    if not use_map_reduce:
+        content = format_case_studies(case_studies, packing['bodies'])
+        final_content = f"{content}\n\n{prompt}"
+        omitted = []
+    else:
+        # No single document may take more than half of a chunk
+        token_counts = packing['token_counts']
+        document_budget = input_budget // 2
+        bodies = [fit_to_budget(body, count, document_budget, model)
+                  for body, count in zip(packing['full_bodies'], token_counts)]
+        chunks = chunk_documents([min(count, document_budget) for count in token_counts], input_budget)
+
+        def summarize(chunk):
+            content = format_case_studies([case_studies[i] for i in chunk], [bodies[i] for i in chunk])
+            try:
+                return complete(f"{content}\n\n{MAP_PROMPT}", map_output_tokens, MAP_PROMPT)
+            except Exception as e:
+                logging.error(f"Summary of case studies {chunk[0] + 1}-{chunk[-1] + 1} failed: {e}")
+                return e
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Bound to this context so the map calls are traced as part of the current run
+            results = list(executor.map(tracing.wrap(summarize), chunks))
+        failures = [result for result in results if isinstance(result, Exception)]
+        if len(failures) == len(results):
+            raise failures[0]
+        omitted = [i + 1 for chunk, result in zip(chunks, results) if isinstance(result, Exception) for i in chunk]
+        chunks, summaries = zip(*[(chunk, result) for chunk, result in zip(chunks, results)
+                                  if not isinstance(result, Exception)])
+        stages.append({
+            'stage': 'map',
+            'calls': len(results),
+            'input_tokens': sum(s.get('prompt_tokens') or 0 for s in summaries),
+            'output_tokens': sum(s.get('completion_tokens') or 0 for s in summaries),
+            'latency_s': time.perf_counter() - start,
+        })
+
+        parts = ["Here are summaries of the case studies I found:\n\n"]
+        if omitted:
+            parts.append(f"Note: case studies {', '.join(map(str, omitted))} of {len(case_studies)} could not be "
+                         f"summarized and are not included here.\n\n")
+        for i, (chunk, summary) in enumerate(zip(chunks, summaries), 1):
+            parts.append(f"--- Summary {i} (case studies {chunk[0] + 1}-{chunk[-1] + 1}) ---\n")
+            parts.append(f"{summary['text']}\n\n")
+        final_content = f"{''.join(parts)}\n\n{prompt}"
+
+    start = time.perf_counter()
+    result = (final_complete or complete)(final_content, max_output_tokens, prompt)
+    stages.append({
+        'stage': 'reduce' if use_map_reduce else 'answer',
+        'calls': 1,
+        'input_tokens': result.get('prompt_tokens') or count_tokens(final_content, model),
+        'output_tokens': result.get('completion_tokens') or 0,
+        'latency_s': time.perf_counter() - start,
+    })
+
+    return {
+        'text': result['text'],
+        'mode': 'map-reduce' if use_map_reduce else 'direct',
+        'stages': stages,
+        'packing': stats,
+        'omitted': omitted,
+    }
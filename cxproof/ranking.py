@@ -0,0 +1,144 @@
+"""
+Relevance ranking of candidate case study URLs before any page is fetched.
+
+Sitemaps list candidates in no useful order: overview and pagination pages, tag
+pages, translations and stories from ten years ago come first as often as not.
+Every candidate gets a score from what the sitemap already tells about it, and
+pages are checked and extracted best first:
+
+- path shape: one slug below a case study section (/customers/acme-cuts-costs)
+  is a story; a path ending in the section, pagination, tag and category pages
+  are listings; very deep paths rarely are stories,
+- slug: stories have a slug of several words, often with numbers ("40-percent");
+  numeric ids, single words and files (.pdf) are weaker,
+- locale: a non-English locale segment (/de/, /fr-fr/) fails the language check,
+- <lastmod>: recent stories are preferred, with a half-life of RECENCY_HALF_LIFE_DAYS,
+- <priority>: the site's own ranking, where present.
+"""
+import re
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+
+# Feature weights, in score points
+WEIGHTS = {
+    'story_shape': 3.0,
+    'listing': -6.0,
+    'deep_path': -1.0,
+    'slug_words': 1.5,
+    'slug_number': 0.5,
+    'weak_slug': -1.5,
+    'file': -3.0,
+    'foreign_locale': -5.0,
+    'strong_keyword': 1.0,
+    'recency': 2.0,
+    'priority': 1.0,
+}
+
+RECENCY_HALF_LIFE_DAYS = 2 * 365
+
+# Path segments of listing pages below a case study section
+LISTING_SEGMENTS = frozenset({"page", "tag", "tags", "category", "categories", "topic", "topics", "industry",
+                              "industries", "filter", "region", "product", "products", "author", "feed", "all"})
+
+STRONG_KEYWORDS = ("case-stud", "success-stor", "customer-stor", "client-stor")
+
+_LOCALE = re.compile(r"^[a-z]{2}([-_][a-z]{2})?$")
+_ENGLISH_LOCALE = re.compile(r"^(en([-_][a-z]{2})?|us|uk|gb|au|ca|ie|nz)$")
+_NUMBER = re.compile(r"\d")
+_FILE = re.compile(r"\.(pdf|docx?|pptx?|xlsx?|zip|jpe?g|png|mp4)$")
+
+
+def _parse_lastmod(lastmod):
+    """A <lastmod> (W3C datetime, possibly just a date) as an aware datetime, or None."""
+    if not lastmod:
+        return None
+    try:
+        parsed = datetime.fromisoformat(lastmod.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def score_url(url, keywords, lastmod=None, priority=None, now=None):
+    """
+    Relevance score of a candidate case study URL; higher is better.
+
+    Args:
+        url (str): Candidate URL
+        keywords (list): Case study keywords (section names such as "customers")
+        lastmod (str): <lastmod> of the URL in its sitemap, if any
+        priority (str): <priority> of the URL in its sitemap, if any
+        now (datetime): Reference time for the recency (default: now)
+
+    Returns:
+        float: Score
+    """
+    path = urlparse(url).path.lower()
+    segments = [segment for segment in path.split("/") if segment]
+    keywords = {keyword.lower() for keyword in keywords}
+    score = 0.0
+
+    # Locale segments do not count for the path shape
+    if segments and _LOCALE.match(segments[0]):
+        if not _ENGLISH_LOCALE.match(segments[0]):
+            score += WEIGHTS['foreign_locale']
+        segments = segments[1:]
+
+    section = next((i for i, segment in enumerate(segments) if segment in keywords), None)
+    below = segments[section + 1:] if section is not None else segments[-1:]
+    if section is not None and not below:
+        score += WEIGHTS['listing']
+    elif any(segment in LISTING_SEGMENTS for segment in below[:-1]) or (below and below[0] in LISTING_SEGMENTS):
+        score += WEIGHTS['listing']
+    elif section is not None and len(below) == 1:
+        score += WEIGHTS['story_shape']
+    if len(segments) > 4:
+        score += WEIGHTS['deep_path']
+
+    slug = segments[-1] if segments else ""
+    if _FILE.search(slug):
+        score += WEIGHTS['file']
+    words = [word for word in re.split(r"[-_.]+", slug) if word]
+    if len(words) >= 3:
+        score += WEIGHTS['slug_words'] * min(1.0, len(words) / 5)
+        if _NUMBER.search(slug):
+            score += WEIGHTS['slug_number']
+    elif not words or slug.isdigit() or len(words) == 1:
+        score += WEIGHTS['weak_slug']
+
+    if any(keyword in path for keyword in STRONG_KEYWORDS):
+        score += WEIGHTS['strong_keyword']
+
+    modified = _parse_lastmod(lastmod)
+    if modified is not None:
+        age_days = max(0.0, ((now or datetime.now(timezone.utc)) - modified).total_seconds() / 86400)
+        score += WEIGHTS['recency'] * 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+    else:
+        # Unknown age: as good as a story of one half-life
+        score += WEIGHTS['recency'] * 0.5
+
+    try:
+        score += WEIGHTS['priority'] * min(1.0, max(0.0, float(priority)))
+    except (TypeError, ValueError):
+        score += WEIGHTS['priority'] * 0.5
+
+    return score
+
+
+def rank_candidates(candidates, keywords, now=None):
+    """
+    Order candidates by descending score; candidates with equal scores keep their sitemap order.
+
+    Args:
+        candidates (list): (url, lastmod, priority) tuples
+        keywords (list): Case study keywords
+
+    Returns:
+        list: (score, url) tuples, best first
+    """
+    now = now or datetime.now(timezone.utc)
+    scored = [(score_url(url, keywords, lastmod, priority, now), i, url)
+              for i, (url, lastmod, priority) in enumerate(candidates)]
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [(score, url) for score, _, url in scored]
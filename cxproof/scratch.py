@@ -0,0 +1,138 @@
+"""
+Scoped scratch space for temporary files.
+
+Every request gets its own directory that is removed when the request ends,
+whether it succeeded or not, so screenshots and their sections never pile up
+on disk. Each scratch space has a size quota, and the bytes currently in use
+across all live scratch spaces of the process can be reported:
+
+    with scratch_space() as scratch:
+        path = scratch.path("screenshot.png")
+        ...
+        scratch.check_quota()
+"""
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from cxproof.config import get_setting
+
+
+PREFIX = "cxproof-scratch-"
+
+# Leftover scratch directories (e.g. of a killed process) older than this are removed
+STALE_AFTER = 3600
+
+_active = set()
+_lock = threading.Lock()
+_stale_checked = False
+
+
+class ScratchQuotaExceeded(Exception):
+    """Raised when a scratch space grows beyond its quota."""
+
+
+class ScratchSpace:
+    """A temporary directory with a size quota."""
+
+    def __init__(self, directory, quota_bytes):
+        self.directory = directory
+        self.quota_bytes = quota_bytes
+        self.peak_bytes = 0
+
+    def path(self, name):
+        """Path of a file inside the scratch space."""
+        return os.path.join(self.directory, os.path.basename(name))
+
+    def bytes_in_use(self):
+        """Total size of the files in the scratch space."""
+        total = 0
+        for entry in os.scandir(self.directory):
+            try:
+                total += entry.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def check_quota(self):
+        """
+        Raise ScratchQuotaExceeded if the scratch space is over its quota.
+
+        Returns:
+            int: Bytes in use
+        """
+        used = self.bytes_in_use()
+        self.peak_bytes = max(self.peak_bytes, used)
+        if self.quota_bytes and used > self.quota_bytes:
+            raise ScratchQuotaExceeded(
+                f"Scratch space uses {used / 1e6:.1f} MB, over its quota of {self.quota_bytes / 1e6:.1f} MB")
+        return used
+
+
+def _scratch_root():
+    root = get_setting('scratch_root') or tempfile.gettempdir()
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+def _remove_stale(root):
+    """Remove scratch directories left behind by processes that did not exit cleanly."""
+    global _stale_checked
+    with _lock:
+        if _stale_checked:
+            return
+        _stale_checked = True
+    cutoff = time.time() - STALE_AFTER
+    for entry in os.scandir(root):
+        try:
+            if entry.name.startswith(PREFIX) and entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                logging.info(f"Removed stale scratch directory {entry.path}")
+        except OSError:
+            pass
+
+
+@contextmanager
+def scratch_space(quota_bytes=None):
+    """
+    Create a scratch directory that is removed with everything in it on exit.
+
+    Args:
+        quota_bytes (int): Size limit; defaults to the scratch_quota_mb setting (0 for no limit)
+
+    Yields:
+        ScratchSpace: The scratch space
+    """
+    if quota_bytes is None:
+        quota_bytes = int(get_setting('scratch_quota_mb') * 1024 * 1024)
+    root = _scratch_root()
+    _remove_stale(root)
+
+    scratch = ScratchSpace(tempfile.mkdtemp(prefix=PREFIX, dir=root), quota_bytes)
+    with _lock:
+        _active.add(scratch)
+    try:
+        yield scratch
+    finally:
+        with _lock:
+            _active.discard(scratch)
+        shutil.rmtree(scratch.directory, ignore_errors=True)
+        logging.info(f"Scratch space released, peak usage {scratch.peak_bytes / 1e6:.1f} MB")
+
+
+def bytes_in_use():
+    """Bytes used by all live scratch spaces of the process."""
+    with _lock:
+        spaces = list(_active)
+    total = 0
+    for scratch in spaces:
+        try:
+            total += scratch.bytes_in_use()
+        except FileNotFoundError:
+            # Released while we were counting
+            pass
+    return total
@@ -0,0 +1,258 @@
+"""
+Full-page screenshot backends.
+
+take_screenshot only needs PNG bytes for a URL; where they come from is a
+backend: the ScreenshotOne API, or a local headless Chrome driven by Selenium
+that keeps a pool of warm browser instances so captures run in parallel
+without per-request API latency. The Selenium backend also loads file:// URLs,
+so it can be tried offline against local HTML files:
+
+    python -m cxproof.screenshot_backends file:///path/to/page.html -o page.png
+"""
+import argparse
+import base64
+import logging
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import streamlit as st
+
+from cxproof.config import get_setting
+
+
+class ScreenshotBackend:
+    """Interface of a screenshot backend."""
+
+    name = None
+
+    def capture(self, url):
+        """
+        Capture a full-page screenshot.
+
+        Args:
+            url (str): Page to capture
+
+        Returns:
+            bytes: PNG image of the whole page
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release the resources held by the backend."""
+
+
+class ScreenshotOneBackend(ScreenshotBackend):
+    """Captures through the ScreenshotOne API."""
+
+    name = "screenshotone"
+
+    def __init__(self, access_key, secret_key, timeout=30):
+        from screenshotone import Client
+
+        self.client = Client(access_key, secret_key)
+        self.timeout = timeout
+
+    def capture(self, url):
+        from screenshotone import TakeOptions
+
+        options = (
+            TakeOptions.url(url)
+            .format("png")
+            .full_page(True)
+            .block_cookie_banners(True)
+            .block_chats(True)
+            .timeout(int(self.timeout))
+        )
+        image = self.client.take(options)
+        screenshot_bytes = BytesIO()
+        shutil.copyfileobj(image, screenshot_bytes)
+        return screenshot_bytes.getvalue()
+
+
+class SeleniumBackend(ScreenshotBackend):
+    """
+    Captures with local headless Chrome instances.
+
+    Up to pool_size browsers are started on demand and reused between captures;
+    each capture borrows one, so up to pool_size captures run in parallel. A
+    browser that errors is replaced by a fresh one.
+    """
+
+    name = "selenium"
+
+    def __init__(self, pool_size=2, window_width=1280, window_height=1080, timeout=30):
+        self.pool_size = pool_size
+        self.window_width = window_width
+        self.window_height = window_height
+        self.timeout = timeout
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _start_driver(self):
+        from selenium import webdriver
+
+        options = webdriver.ChromeOptions()
+        options.add_argument("--headless=new")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--hide-scrollbars")
+        options.add_argument(f"--window-size={self.window_width},{self.window_height}")
+        driver = webdriver.Chrome(options=options)
+        driver.set_page_load_timeout(self.timeout)
+        return driver
+
+    def warm_up(self):
+        """Start every browser of the pool now instead of on first use."""
+        while True:
+            with self._lock:
+                if self._created >= self.pool_size:
+                    return
+                self._created += 1
+            try:
+                self._idle.put(self._start_driver())
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_start = self._created < self.pool_size
+            if can_start:
+                self._created += 1
+        if can_start:
+            try:
+                return self._start_driver()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get()
+
+    def _discard(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    def capture(self, url):
+        driver = self._acquire()
+        try:
+            driver.get(url)
+            deadline = time.monotonic() + self.timeout
+            while driver.execute_script("return document.readyState") != "complete":
+                if time.monotonic() > deadline:
+                    break
+                time.sleep(0.1)
+
+            # Scroll through the page so lazy-loaded content is rendered, then back to the top
+            driver.execute_script("""
+                const step = window.innerHeight;
+                for (let y = 0; y < document.body.scrollHeight; y += step) { window.scrollTo(0, y); }
+                window.scrollTo(0, 0);
+            """)
+
+            metrics = driver.execute_cdp_cmd("Page.getLayoutMetrics", {})
+            content = metrics.get("cssContentSize") or metrics["contentSize"]
+            screenshot = driver.execute_cdp_cmd("Page.captureScreenshot", {
+                "format": "png",
+                "captureBeyondViewport": True,
+                "clip": {
+                    "x": 0,
+                    "y": 0,
+                    "width": max(content["width"], self.window_width),
+                    "height": content["height"],
+                    "scale": 1,
+                },
+            })
+        except Exception:
+            # The browser may be in a bad state; replace it
+            self._discard(driver)
+            raise
+        else:
+            self._idle.put(driver)
+
+        return base64.b64decode(screenshot["data"])
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+BACKENDS = ("screenshotone", "selenium")
+
+
+@st.cache_resource(show_spinner=False)
+def get_screenshot_backend(name=None):
+    """
+    Return the process-wide screenshot backend.
+
+    Args:
+        name (str): "screenshotone" or "selenium"; defaults to the screenshot_backend setting
+
+    Returns:
+        ScreenshotBackend: The backend, shared across reruns and sessions
+    """
+    name = name or get_setting('screenshot_backend')
+    timeout = get_setting('screenshot_timeout')
+    if name == "screenshotone":
+        return ScreenshotOneBackend(st.secrets["SCREENSHOTONE_ACCESS_KEY"], st.secrets["SCREENSHOTONE_SECRET_KEY"],
+                                    timeout=timeout)
+    if name == "selenium":
+        return SeleniumBackend(pool_size=get_setting('selenium_pool_size'),
+                               window_width=get_setting('screenshot_width'), timeout=timeout)
+    raise ValueError(f"Unknown screenshot backend: {name}")
+
+
+def capture_many(backend, urls, max_workers=None):
+    """
+    Capture several pages in parallel.
+
+    Returns:
+        list: PNG bytes, or the exception raised, for every URL in order
+    """
+    def capture(url):
+        try:
+            return backend.capture(url)
+        except Exception as e:
+            logging.error(f"Capture of {url} failed: {e}")
+            return e
+
+    with ThreadPoolExecutor(max_workers=max_workers or getattr(backend, 'pool_size', 4)) as executor:
+        return list(executor.map(capture, urls))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Capture a full-page screenshot.")
+    parser.add_argument("url", help="Page to capture (http(s):// or file://)")
+    parser.add_argument("--backend", choices=BACKENDS, default="selenium")
+    parser.add_argument("-o", "--output", default="screenshot.png")
+    args = parser.parse_args(argv)
+
+    backend = get_screenshot_backend(args.backend)
+    try:
+        start = time.perf_counter()
+        png = backend.capture(args.url)
+        with open(args.output, "wb") as f:
+            f.write(png)
+        print(f"Saved {len(png)} bytes to {args.output} in {time.perf_counter() - start:.2f}s")
+    finally:
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Normalization of page text, with precompiled patterns and as few passes as possible.
+
+clean_content() tidies extracted case study text; language_sample() prepares the
+text a language is detected from. Both run for every candidate page, and pages
+of large sites carry hundreds of kilobytes of text.
+
+language_sample() takes the page strings lazily (e.g. soup.strings) and stops as
+soon as it has enough text, so only the start of a page is ever normalized.
+"""
+import re
+
+
+# Runs of two or more whitespace characters. A single pass with this pattern gives the same
+# result as first reducing runs of 3+ newlines to two and then collapsing whitespace runs, since
+# the reduced newline runs are whitespace runs themselves
+_WHITESPACE_RUN = re.compile(r'\s{2,}')
+
+_TOKEN = re.compile(r'\S+')
+_URL = re.compile(r'https?://\S+')
+_PUNCTUATION = re.compile(r'[^\w\s]+')
+
+# Characters of text a language is detected from
+LANGUAGE_SAMPLE_SIZE = 2000
+
+
+def clean_content(text):
+    """
+    Clean up extracted content: whitespace runs become one space, and the ends are stripped.
+
+    Args:
+        text (str): Raw extracted text
+
+    Returns:
+        str: Cleaned text
+    """
+    return _WHITESPACE_RUN.sub(' ', text).strip()
+
+
+def language_sample(strings, size=LANGUAGE_SAMPLE_SIZE):
+    """
+    The first size characters of a text as words without URLs and punctuation, for language detection.
+
+    Args:
+        strings: The text, or an iterable of its strings (such as soup.strings), read only as far as needed
+        size (int): Characters of sample
+
+    Returns:
+        str: Words separated by single spaces, at most size characters
+    """
+    if isinstance(strings, str):
+        strings = (strings,)
+
+    words = []
+    length = 0
+    for string in strings:
+        for match in _TOKEN.finditer(string):
+            token = match.group()
+            if "://" in token:
+                token = _URL.sub('', token)
+            if not token.isalnum():
+                token = _PUNCTUATION.sub('', token)
+            if token:
+                words.append(token)
+                length += len(token) + 1
+                if length > size:
+                    return " ".join(words)[:size]
+    return " ".join(words)
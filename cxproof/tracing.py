@@ -0,0 +1,325 @@
+"""
+Lightweight tracing of the scraper stages.
+
+Every I/O and parse stage runs in a span that records its duration and attributes
+such as bytes transferred, cache hits and token counts:
+
+    with tracing.span("sitemap.fetch", url=sitemap_url) as span:
+        response = scraper.get(sitemap_url)
+        span.set(bytes=len(response.content), status=response.status_code)
+
+Spans nest through a context variable. The spans of one run (a background task, a
+job, a button click) are collected by tracing.trace(), which the debug panel draws
+as a waterfall:
+
+    with tracing.trace("find_case_studies") as run:
+        ...
+    run.totals()
+
+Finished spans also update process-wide metrics: a duration histogram per span
+name and the sums of their numeric attributes. They are served in the Prometheus
+text format when tracing_prometheus_port is set (and on /metrics of the job API),
+and finished runs are appended to <data_dir>/traces.jsonl when tracing_json_log
+is on.
+"""
+import contextvars
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cxproof.config import data_path, get_setting
+
+
+# Upper bounds in seconds of the duration histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Spans kept per run; the rest only count towards the metrics
+MAX_SPANS_PER_TRACE = 5000
+
+# Numeric attributes that identify rather than measure, and are not summed
+NOT_SUMMED = frozenset({'status', 'strategy'})
+
+_current_span = contextvars.ContextVar("cxproof_span", default=None)
+_current_trace = contextvars.ContextVar("cxproof_trace", default=None)
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+_exporter_lock = threading.Lock()
+_prometheus_server = None
+
+
+class Span:
+    """One timed stage, with its attributes."""
+
+    __slots__ = ("name", "attributes", "parent", "depth", "start", "end", "thread")
+
+    def __init__(self, name, attributes, parent):
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent else 0
+        self.start = time.perf_counter()
+        self.end = None
+        self.thread = threading.current_thread().name
+
+    @property
+    def duration(self):
+        return (self.end or time.perf_counter()) - self.start
+
+    def set(self, **attributes):
+        """Set attributes, e.g. span.set(bytes=len(body), status=200)."""
+        self.attributes.update(attributes)
+
+    def add(self, name, value=1):
+        """Add to a numeric attribute, e.g. span.add("cache_hits")."""
+        self.attributes[name] = self.attributes.get(name, 0) + value
+
+
+class Trace:
+    """The spans of one run."""
+
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.end = None
+        self.spans = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    @property
+    def duration(self):
+        return (self.end or time.perf_counter()) - self.start
+
+    def _add(self, span):
+        with self._lock:
+            if len(self.spans) < MAX_SPANS_PER_TRACE:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    def totals(self):
+        """
+        Per span name: number of spans, total seconds and sums of the numeric attributes.
+
+        Returns:
+            dict: {span name: {'count', 'seconds', <attribute>: sum...}} in order of first start
+        """
+        totals = {}
+        for span in sorted(self.spans, key=lambda s: s.start):
+            entry = totals.setdefault(span.name, {'count': 0, 'seconds': 0.0})
+            entry['count'] += 1
+            entry['seconds'] += span.duration
+            for key, value in _numeric(span.attributes):
+                entry[key] = entry.get(key, 0) + value
+        return totals
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'started_at': self.started_at,
+            'duration_s': self.duration,
+            'dropped_spans': self.dropped,
+            'spans': [
+                {
+                    'name': span.name,
+                    'offset_s': span.start - self.start,
+                    'duration_s': span.duration,
+                    'depth': span.depth,
+                    'thread': span.thread,
+                    'attributes': span.attributes,
+                }
+                for span in sorted(self.spans, key=lambda s: s.start)
+            ],
+        }
+
+
+def _numeric(attributes):
+    """(name, value) of the attributes that can be summed; booleans count as 0/1."""
+    for key, value in attributes.items():
+        if isinstance(value, (bool, int, float)) and key not in NOT_SUMMED:
+            yield key, float(value)
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a stage as a span of the current run.
+
+    Args:
+        name (str): Stage name, dotted by component (e.g. "sitemap.parse")
+        **attributes: Initial attributes; more can be set on the yielded Span
+
+    Yields:
+        Span: The running span
+    """
+    current = Span(name, attributes, _current_span.get())
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.attributes['error'] = type(e).__name__
+        raise
+    finally:
+        current.end = time.perf_counter()
+        _current_span.reset(token)
+        _finish(current)
+
+
+def _finish(finished):
+    run = _current_trace.get()
+    if run is not None:
+        run._add(finished)
+
+    duration = finished.duration
+    with _metrics_lock:
+        entry = _metrics.setdefault(finished.name, {
+            'count': 0, 'errors': 0, 'seconds': 0.0, 'buckets': [0] * len(BUCKETS), 'sums': {},
+        })
+        entry['count'] += 1
+        entry['seconds'] += duration
+        entry['errors'] += 'error' in finished.attributes
+        for i, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                entry['buckets'][i] += 1
+        for key, value in _numeric(finished.attributes):
+            entry['sums'][key] = entry['sums'].get(key, 0.0) + value
+
+
+@contextmanager
+def trace(name, **attributes):
+    """
+    Collect the spans of a run, under a root span of that name.
+
+    Finished runs are appended to the JSON log when tracing_json_log is on.
+
+    Args:
+        name (str): Name of the run (e.g. the background task or job type)
+        **attributes: Attributes of the root span
+
+    Yields:
+        Trace: The run; its spans are complete once the block has ended
+    """
+    _start_prometheus_server()
+    run = Trace(name)
+    token = _current_trace.set(run)
+    try:
+        with span(name, **attributes):
+            yield run
+    finally:
+        _current_trace.reset(token)
+        run.end = time.perf_counter()
+        logging.info(f"Run {name} took {run.duration:.2f}s over {len(run.spans)} spans")
+        if get_setting('tracing_json_log'):
+            _write_json_log(run)
+
+
+def current_trace():
+    """The run being traced in this context, or None."""
+    return _current_trace.get()
+
+
+def wrap(fn):
+    """Bind fn to the current context, so spans it records in a worker thread join the current run."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time, so every call runs in its own copy
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+
+def _write_json_log(run):
+    try:
+        with open(data_path('traces.jsonl'), 'a') as f:
+            f.write(json.dumps(run.to_dict(), default=str) + "\n")
+    except OSError as e:
+        logging.warning(f"Could not write trace {run.id}: {e}")
+
+
+# Metrics export
+
+def metrics():
+    """Snapshot of the process-wide metrics per span name."""
+    with _metrics_lock:
+        return {name: dict(entry, buckets=list(entry['buckets']), sums=dict(entry['sums']))
+                for name, entry in _metrics.items()}
+
+
+def _metric_name(attribute):
+    return "cxproof_" + re.sub(r"[^a-zA-Z0-9_]", "_", attribute) + "_total"
+
+
+def prometheus_text():
+    """The metrics in the Prometheus text exposition format."""
+    snapshot = metrics()
+    lines = [
+        "# HELP cxproof_span_duration_seconds Duration of the scraper stages.",
+        "# TYPE cxproof_span_duration_seconds histogram",
+    ]
+    for name, entry in sorted(snapshot.items()):
+        for bound, count in zip(BUCKETS, entry['buckets']):
+            lines.append(f'cxproof_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+        lines.append(f'cxproof_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {entry["count"]}')
+        lines.append(f'cxproof_span_duration_seconds_sum{{span="{name}"}} {entry["seconds"]}')
+        lines.append(f'cxproof_span_duration_seconds_count{{span="{name}"}} {entry["count"]}')
+
+    lines.append("# HELP cxproof_span_errors_total Stages that ended with an exception.")
+    lines.append("# TYPE cxproof_span_errors_total counter")
+    for name, entry in sorted(snapshot.items()):
+        lines.append(f'cxproof_span_errors_total{{span="{name}"}} {entry["errors"]}')
+
+    # One counter per numeric attribute (bytes, cache_hit, prompt_tokens...), labelled by stage
+    attributes = sorted({key for entry in snapshot.values() for key in entry['sums']})
+    for attribute in attributes:
+        metric = _metric_name(attribute)
+        lines.append(f"# HELP {metric} Sum of the {attribute} attribute of the scraper stages.")
+        lines.append(f"# TYPE {metric} counter")
+        for name, entry in sorted(snapshot.items()):
+            if attribute in entry['sums']:
+                lines.append(f'{metric}{{span="{name}"}} {entry["sums"][attribute]}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _start_prometheus_server():
+    """Serve /metrics on tracing_prometheus_port, once per process."""
+    global _prometheus_server
+    port = get_setting('tracing_prometheus_port')
+    if not port or _prometheus_server is not None:
+        return
+    with _exporter_lock:
+        if _prometheus_server is not None:
+            return
+        host = get_setting('tracing_prometheus_host')
+        try:
+            _prometheus_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            # E.g. another app process already serves the port; keep tracing without it
+            logging.warning(f"Could not serve metrics on {host}:{port}: {e}")
+            _prometheus_server = False
+            return
+        threading.Thread(target=_prometheus_server.serve_forever, name="metrics", daemon=True).start()
+        logging.info(f"Serving Prometheus metrics on http://{host}:{port}/metrics")
@@ -0,0 +1,146 @@
+"""
+Parsing and merging of the per-section results of the screenshot analysis.
+"""
+import json
+import re
+from dataclasses import asdict, dataclass, field
+
+
+# Structured output schema matching the default product info prompt
+PRODUCT_TEXT_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "product_text",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "product_raw_text": {"type": "string"}
+            },
+            "required": ["product_raw_text"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# Sentences sharing at least this fraction of word shingles count as duplicates
+DUPLICATE_THRESHOLD = 0.8
+
+_CODE_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$')
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+_WORD = re.compile(r'\w+')
+
+
+@dataclass
+class SectionResult:
+    """Result of the AI analysis of one screenshot section."""
+    section: int
+    image_url: str
+    result: str = ""
+    text: str = ""
+    metrics: dict = field(default_factory=dict)
+    route: str = "vision"
+    error: str = None
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def parse_section_output(result_text):
+    """
+    Parse a section answer once.
+
+    JSON answers (optionally wrapped in a code fence) yield their product_raw_text;
+    anything else is used as plain text.
+
+    Returns:
+        str: The product text of the section
+    """
+    stripped = _CODE_FENCE.sub('', result_text.strip())
+    if not stripped.startswith('{'):
+        return result_text
+
+    try:
+        result_json = json.loads(stripped)
+    except json.JSONDecodeError:
+        return result_text
+
+    if not isinstance(result_json, dict):
+        return result_text
+    return result_json.get("product_raw_text") or ""
+
+
+def _shingles(sentence, size=3):
+    words = _WORD.findall(sentence.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def remove_near_duplicates(texts, threshold=DUPLICATE_THRESHOLD):
+    """
+    Drop sentences that already appeared (nearly) verbatim in an earlier section.
+
+    Overlapping screenshot sections often repeat the same lines; sentences are
+    compared on their word 3-shingles, using an inverted index so only sentences
+    that share a shingle are compared. Sentences repeated within one section (such
+    as the same feature listed for several plans) are kept.
+
+    Args:
+        texts (list): Section texts in page order
+        threshold (float): Share of a sentence's shingles found in an earlier sentence to drop it
+
+    Returns:
+        tuple: (list of texts without the repeated sentences, number of sentences removed)
+    """
+    kept_shingles = []
+    index = {}
+    removed = 0
+    result = []
+
+    for text in texts:
+        lines = []
+        # Indexed once the section is done, so only earlier sections are compared with
+        section_shingles = []
+        for line in text.splitlines():
+            kept = []
+            for sentence in _SENTENCE_SPLIT.split(line):
+                if not sentence.strip():
+                    continue
+                shingles = _shingles(sentence)
+                if not shingles:
+                    kept.append(sentence)
+                    continue
+
+                candidates = set()
+                for shingle in shingles:
+                    candidates.update(index.get(shingle, ()))
+                if any(len(shingles & kept_shingles[c]) / len(shingles) >= threshold for c in candidates):
+                    removed += 1
+                    continue
+
+                kept.append(sentence)
+                section_shingles.append(shingles)
+            if kept:
+                lines.append(" ".join(kept))
+
+        for shingles in section_shingles:
+            position = len(kept_shingles)
+            kept_shingles.append(shingles)
+            for shingle in shingles:
+                index.setdefault(shingle, []).append(position)
+        result.append("\n".join(lines))
+
+    return result, removed
+
+
+def combine_sections(section_results):
+    """
+    Merge the product texts of all sections into one text.
+
+    Returns:
+        tuple: (combined text, number of duplicate sentences removed)
+    """
+    texts = [record.text for record in section_results if not record.error and record.text]
+    texts, removed = remove_near_duplicates(texts)
+    return "\n\n".join(text for text in texts if text), removed